@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Benchmark: NPPES Scan Throughput
+=================================
+Generates a synthetic NPPES-shaped CSV (same 330-column layout, all fields
+quoted, ~1% community pharmacies, a sprinkling of multi-line quoted
+addresses) and measures rows/sec for three scan strategies:
+
+  dictreader  - legacy csv.DictReader loop (pre-nppes_scanner behavior)
+  projected   - nppes_scanner.scan_pharmacies over csv.reader
+  prefilter   - nppes_scanner.scan_pharmacies(prefilter=True), byte-level
+                3336C0003X test before any decoding/CSV parsing
+
+All three must emit the same NPIs; the script exits non-zero otherwise.
+
+Usage:
+  python3 bench_nppes_prefilter.py
+  python3 bench_nppes_prefilter.py --rows 1000000 --keep /tmp/npidata_synth.csv
+"""
+
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+from nppes_scanner import COLUMNS, COMMUNITY_TAXONOMY, TAXONOMY_COLUMNS, scan_pharmacies
+
+
+OTHER_TAXONOMIES = [
+    '207Q00000X', '363L00000X', '261QP2300X', '207R00000X',
+    '3336L0003X', '3336S0011X', '152W00000X', '225100000X',
+]
+NAMES = [
+    'MAIN STREET DRUG', 'CVS PHARMACY INC', 'SMITH FAMILY PHARMACY',
+    'COUNTY HOSPITAL PHARMACY', 'HOMETOWN RX LLC', 'WALGREEN CO',
+]
+STATES = ['KY', 'OH', 'TX', 'CA', 'NY', 'FL', 'PR', 'GA']
+
+
+def nppes_header() -> list[str]:
+    """330-column header with the real NPPES names for the columns we read."""
+    header = list(COLUMNS.values())
+    for i, tax_col in enumerate(TAXONOMY_COLUMNS, start=1):
+        header += [tax_col, f'Provider License Number_{i}',
+                   f'Provider License Number State Code_{i}',
+                   f'Healthcare Provider Primary Taxonomy Switch_{i}']
+    i = 1
+    while len(header) < 330:
+        header.append(f'Filler Column_{i}')
+        i += 1
+    return header
+
+
+def make_synthetic(path: str, n_rows: int, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    header = nppes_header()
+    pos = {h: i for i, h in enumerate(header)}
+    tax_pos = [pos[c] for c in TAXONOMY_COLUMNS]
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(header)
+        for k in range(n_rows):
+            row = [''] * len(header)
+            pharmacy = rng.random() < 0.01
+            org = pharmacy or rng.random() < 0.25
+            row[pos['NPI']] = str(1_000_000_000 + k)
+            row[pos['Entity Type Code']] = '2' if org else '1'
+            name = rng.choice(NAMES)
+            row[pos[COLUMNS['legal_name']]] = name if org else ''
+            row[pos[COLUMNS['other_name']]] = rng.choice(['', '<UNAVAIL>', name + ' #2'])
+            row[pos[COLUMNS['address_1']]] = f'{rng.randint(1, 9999)} MAIN ST'
+            if rng.random() < 0.005:
+                row[pos[COLUMNS['address_2']]] = 'STE 4\nBLDG B'
+            row[pos[COLUMNS['city']]] = 'LOUISVILLE'
+            row[pos[COLUMNS['state']]] = rng.choice(STATES)
+            row[pos[COLUMNS['zip']]] = f'{rng.randint(10000, 99999)}0000'
+            row[pos[COLUMNS['phone']]] = '5025551234'
+            row[pos[COLUMNS['enumeration_date']]] = '05/23/2005'
+            row[pos[COLUMNS['last_updated']]] = f'07/08/20{rng.randint(10, 25)}'
+            row[pos[COLUMNS['deactivation_code']]] = 'DT' if rng.random() < 0.02 else ''
+            row[pos[COLUMNS['owner_first']]] = 'JANE'
+            row[pos[COLUMNS['owner_last']]] = 'DOE'
+            slot = rng.randint(0, 2)
+            row[tax_pos[slot]] = COMMUNITY_TAXONOMY if pharmacy else rng.choice(OTHER_TAXONOMIES)
+            for j in range(len(header) - 40, len(header), 4):
+                row[j] = f'{rng.randint(100000, 999999)}'
+            writer.writerow(row)
+
+
+def legacy_dictreader(path: str) -> list[str]:
+    npis = []
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        for row in csv.DictReader(f):
+            if row.get('Entity Type Code', '') != '2':
+                continue
+            if row.get('NPI Deactivation Reason Code', '').strip():
+                continue
+            for i in range(1, 16):
+                if row.get(f'Healthcare Provider Taxonomy Code_{i}', '') == COMMUNITY_TAXONOMY:
+                    npis.append(row['NPI'].strip())
+                    break
+    return npis
+
+
+def projected(path: str) -> list[str]:
+    with open(path, 'r', newline='', encoding='utf-8', errors='replace') as f:
+        return [p['npi'] for p in scan_pharmacies(f, progress_every=0)]
+
+
+def prefiltered(path: str) -> list[str]:
+    with open(path, 'rb') as fb:
+        return [p['npi'] for p in scan_pharmacies(fb, progress_every=0, prefilter=True)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark NPPES scan strategies')
+    parser.add_argument('--rows', type=int, default=300_000, help='Synthetic row count')
+    parser.add_argument('--keep', default=None, help='Write the synthetic file here and keep it')
+    args = parser.parse_args()
+
+    path = args.keep or os.path.join(tempfile.mkdtemp(), 'npidata_pfile_synthetic.csv')
+    print(f"Generating {args.rows:,} synthetic NPPES rows -> {path}")
+    make_synthetic(path, args.rows)
+    size_mb = os.path.getsize(path) / 1e6
+    print(f"  {size_mb:,.0f} MB")
+
+    results = {}
+    print(f"\n{'Strategy':<12} {'Seconds':>8} {'Rows/sec':>12} {'MB/s':>8} {'Matches':>8}")
+    print('-' * 52)
+    for name, fn in [('dictreader', legacy_dictreader), ('projected', projected),
+                     ('prefilter', prefiltered)]:
+        start = time.perf_counter()
+        npis = fn(path)
+        elapsed = time.perf_counter() - start
+        results[name] = npis
+        print(f"{name:<12} {elapsed:>8.2f} {args.rows / elapsed:>12,.0f} "
+              f"{size_mb / elapsed:>8.1f} {len(npis):>8,}")
+
+    if not args.keep:
+        os.remove(path)
+
+    baseline = results['dictreader']
+    if any(npis != baseline for npis in results.values()):
+        print("\nERROR: strategies disagree on matched NPIs")
+        sys.exit(1)
+    print("\nAll strategies matched the same NPIs.")
+
+
+if __name__ == '__main__':
+    main()
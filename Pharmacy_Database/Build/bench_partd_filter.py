@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Part D GLP-1 Filter Throughput
+==========================================
+Generates a synthetic CSV shaped like the CMS Part D Prescribers by
+Provider and Drug file (same 22 columns, ~1.2% GLP-1 rows, a few
+prescribers whose names contain a GLP-1 keyword, ~0.1% of rows with a
+quoted newline in Prscrbr_Type) and measures MB/s for three filter
+strategies over the same 1MB chunks a streamed download delivers:
+
+  legacy   - decode + split each chunk, upper-case every line, loop the
+             keyword lists with `in`, csv.reader(io.StringIO(line))
+             (pre-partd_filter download_and_filter_csv behavior; drops
+             records that span lines)
+  csv      - csv.reader over the whole decoded stream, is_glp1 per row
+             (the reference result)
+  bytes    - partd_filter.Glp1LineFilter: quote-aware record split,
+             bytes.upper + bytes.find per needle over the whole chunk,
+             parse only candidate records
+
+bytes must return the same records as csv; the script exits non-zero
+otherwise.
+The default file is ~180MB; --rows 40000000 approximates the real ~5GB.
+
+Usage:
+  python3 bench_partd_filter.py
+  python3 bench_partd_filter.py --rows 5000000 --keep /tmp/partd_synth.csv
+"""
+
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+from partd_filter import GLP1_BRANDS_UPPER, GLP1_GENERICS, Glp1LineFilter, is_glp1, parse_glp1_lines
+
+
+HEADER = [
+    'Prscrbr_NPI', 'Prscrbr_Last_Org_Name', 'Prscrbr_First_Name', 'Prscrbr_City',
+    'Prscrbr_State_Abrvtn', 'Prscrbr_State_FIPS', 'Prscrbr_Type', 'Prscrbr_Type_Src',
+    'Brnd_Name', 'Gnrc_Name', 'Tot_Clms', 'Tot_30day_Fills', 'Tot_Day_Suply',
+    'Tot_Drug_Cst', 'Tot_Benes', 'GE65_Sprsn_Flag', 'GE65_Tot_Clms',
+    'GE65_Tot_30day_Fills', 'GE65_Tot_Drug_Cst', 'GE65_Tot_Day_Suply',
+    'GE65_Bene_Sprsn_Flag', 'GE65_Tot_Benes',
+]
+OTHER_DRUGS = [
+    ('Lisinopril', 'Lisinopril'), ('Atorvastatin Calcium', 'Atorvastatin Calcium'),
+    ('Metformin Hcl', 'Metformin Hcl'), ('Eliquis', 'Apixaban'),
+    ('Jardiance', 'Empagliflozin'), ('Sandostatin', 'Octreotide Acetate'),
+    ('Levothyroxine Sodium', 'Levothyroxine Sodium'), ('Forteo', 'Teriparatide'),
+]
+GLP1_DRUGS = [
+    ('Ozempic', 'Semaglutide'), ('Rybelsus', 'Semaglutide'), ('Trulicity', 'Dulaglutide'),
+    ('Mounjaro', 'Tirzepatide'), ('Victoza 3-Pak', 'Liraglutide'),
+    ('Bydureon Bcise', 'Exenatide Microspheres'), ('Byetta', 'Exenatide'),
+]
+CITIES = ['Louisville', 'Saint Louis', 'New York', 'Austin', 'Winston-Salem']
+TYPES = ['Internal Medicine', 'Family Practice', 'Nurse Practitioner', '"Endocrinology, Diabetes & Metabolism"']
+MULTILINE_TYPE = '"Endocrinology,\nDiabetes & ""Metabolism"""'
+
+
+def make_synthetic(path: str, n_rows: int, seed: int = 42) -> None:
+    rng = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        f.write(','.join(HEADER) + '\n')
+        for k in range(n_rows):
+            brand, generic = rng.choice(GLP1_DRUGS) if rng.random() < 0.012 else rng.choice(OTHER_DRUGS)
+            last = 'Byetta' if rng.random() < 0.0005 else 'Smith'
+            f.write(','.join([
+                str(1_000_000_000 + k // 8), last, rng.choice(['John', 'Mary Ann']),
+                rng.choice(CITIES), 'KY', '21',
+                MULTILINE_TYPE if rng.random() < 0.001 else rng.choice(TYPES), 'S', brand, generic,
+                str(rng.randint(11, 400)), f'{rng.randint(11, 400)}.5', str(rng.randint(300, 9000)),
+                f'{rng.random() * 9000:.2f}', str(rng.randint(11, 50)) if rng.random() < 0.7 else '',
+                '', '', '', '', '', '#', '',
+            ]) + '\n')
+
+
+def iter_chunks(path: str, size: int = 1024 * 1024):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def legacy(path: str) -> list[dict]:
+    brands = GLP1_BRANDS_UPPER
+    generics_upper = [g.upper() for g in GLP1_GENERICS]
+    records = []
+    header = None
+    line_buffer = ''
+    for chunk in iter_chunks(path):
+        text = line_buffer + chunk.decode('utf-8', errors='replace')
+        lines = text.split('\n')
+        line_buffer = lines[-1]
+        for line in lines[:-1]:
+            line = line.strip()
+            if not line:
+                continue
+            if header is None:
+                header = line.split(',')
+                gnrc_idx, brnd_idx = header.index('Gnrc_Name'), header.index('Brnd_Name')
+                continue
+            line_upper = line.upper()
+            if not any(b in line_upper for b in brands) and not any(g in line_upper for g in generics_upper):
+                continue
+            row_vals = next(csv.reader(io.StringIO(line)))
+            if len(row_vals) < len(header):
+                continue
+            if is_glp1(row_vals[gnrc_idx], row_vals[brnd_idx]):
+                records.append(dict(zip(header, row_vals)))
+    return records
+
+
+def csv_reference(path: str) -> list[dict]:
+    records = []
+    with open(path, 'r', newline='', encoding='utf-8', errors='replace') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        gnrc_idx, brnd_idx = header.index('Gnrc_Name'), header.index('Brnd_Name')
+        for row_vals in reader:
+            if len(row_vals) >= len(header) and is_glp1(row_vals[gnrc_idx], row_vals[brnd_idx]):
+                records.append(dict(zip(header, row_vals)))
+    return records
+
+
+def byte_filter(path: str) -> list[dict]:
+    flt = Glp1LineFilter()
+    records = []
+    for chunk in iter_chunks(path):
+        records.extend(parse_glp1_lines(flt.feed(chunk), flt.header))
+    records.extend(parse_glp1_lines(flt.flush(), flt.header))
+    return records
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark Part D GLP-1 filter strategies')
+    parser.add_argument('--rows', type=int, default=1_500_000, help='Synthetic row count')
+    parser.add_argument('--keep', default=None, help='Write the synthetic file here and keep it')
+    args = parser.parse_args()
+
+    path = args.keep or os.path.join(tempfile.mkdtemp(), 'partd_synthetic.csv')
+    print(f"Generating {args.rows:,} synthetic Part D rows -> {path}")
+    make_synthetic(path, args.rows)
+    size_mb = os.path.getsize(path) / 1e6
+    print(f"  {size_mb:,.0f} MB")
+
+    # Warm the page cache so both strategies read from memory
+    for _ in iter_chunks(path):
+        pass
+
+    results = {}
+    print(f"\n{'Strategy':<10} {'Seconds':>8} {'MB/s':>8} {'Records':>9}")
+    print('-' * 38)
+    for name, fn in [('legacy', legacy), ('csv', csv_reference), ('bytes', byte_filter)]:
+        start = time.perf_counter()
+        records = fn(path)
+        elapsed = time.perf_counter() - start
+        results[name] = records
+        print(f"{name:<10} {elapsed:>8.2f} {size_mb / elapsed:>8.1f} {len(records):>9,}")
+
+    if not args.keep:
+        os.remove(path)
+
+    if results['bytes'] != results['csv']:
+        print("\nERROR: bytes filter disagrees with the csv reference")
+        sys.exit(1)
+    missed = len(results['csv']) - len(results['legacy'])
+    print(f"\nbytes matches the csv reference; legacy missed {missed} multi-line record(s).")
+
+
+if __name__ == '__main__':
+    main()
@@ -10,12 +10,28 @@ Output: State_Outreach_Lists_Verified/ALL_VERIFIED_DEDUPED.csv (34,632 rows)
         State_Outreach_Lists_Verified/ALL_VERIFIED_CLEAN.csv (33,185 rows)
 
 Pipeline stages:
-  1. Address-based dedup: normalize street addresses, group co-located NPIs,
-     keep one winner per physical location (-4,979)
+  1. Address-based dedup: normalize street addresses (usps_address: USPS
+     suffix / directional / unit tables), block on state + ZIP5 +
+     house number, link pairs by street similarity (or weaker similarity plus
+     a matching phone), union-find the links, keep one winner per physical
+     location (-4,979 with the original exact-match grouping)
+ 1b. Co-location graph (opt-in, off by default): union NPIs sharing a
+     location phone or authorized official within a ZIP5 (hashed keys, one
+     pass), keep one winner per component (--colocation-signals phone |
+     phone,owner). With phone it merges another ~3,500 verified rows, so
+     the counts above are for runs without it.
   2. Remove institutional: hospitals, health centers, VA, FQHCs, health systems (-711)
   3. Remove specialty/compounding taxonomy (-464)
   4. Remove chains that slipped past initial independent filter (-89)
   5. Remove non-pharmacy clinics (-183)
+  Stages 2-5 run as one classification pass (KeywordClassifier: every
+  keyword family matched in a single scan of the uppercased name); each
+  removed row is tagged with the first stage that applies and written to
+  ALL_VERIFIED_REMOVED.csv with a removal_reason column.
+  Stage 1 keys include the state and stage 1b keys the ZIP5, so --workers N
+  runs stages 1-5 per state (states sharing a ZIP5 run together) in a
+  process pool and merges the results in the usual (state, city, name)
+  order; output is identical to a single-process run.
 
 Background:
   Multiple NPI registrations can exist per physical pharmacy location (owner NPI +
@@ -33,73 +49,110 @@ Note on reproducibility:
   coverage differences. The scoring engine (score_pharmacies.py) reproduces exact
   scores when run on the committed clean file.
 
+  The stage 2-5 keyword/taxonomy lists are read from a versioned data file
+  (reference_data/dedup_rules.json, --rules). Every run writes:
+    ALL_VERIFIED_MANIFEST.json   rules version + SHA-256, input/output SHA-256s,
+                                 co-location signals, per-stage counts
+    ALL_VERIFIED_CLEAN_DIFF.csv  NPIs added / removed vs the previous clean file
+                                 (--previous, default: the one being replaced),
+                                 removals tagged institutional / specialty /
+                                 chain / clinic / duplicate / not_in_input
+  so a rerun is reviewed from the diff instead of the full 33K-row file.
+
 Usage:
   python3 dedup_pharmacies.py
   python3 dedup_pharmacies.py --verified /path/to/verified.csv --qualified /path/to/qualified.csv
+  python3 dedup_pharmacies.py --workers 8
+  python3 dedup_pharmacies.py --colocation-signals phone
+  python3 dedup_pharmacies.py --rules my_rules.json --previous old/ALL_VERIFIED_CLEAN.csv
 """
 
 import csv
+import hashlib
+import heapq
+import json
 import os
-import re
 import sys
 import argparse
 from pathlib import Path
 from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 
+from record_linkage import UnionFind, normalize_phone, split_address, street_components_agree, street_similarity
+from usps_address import normalize_street, parse_address
 
-# --- Stage 1: Address Normalization and Dedup ---
 
-# Suite/unit patterns to strip
-SUITE_PATTERN = re.compile(
-    r'\b(STE|SUITE|UNIT|APT|APARTMENT|RM|ROOM|FL|FLOOR|BLDG|BUILDING|#)\s*\.?\s*\w*\s*$',
-    re.IGNORECASE
-)
+Row = dict[str, str]
 
-# Address abbreviation normalization
-ABBREV_MAP = {
-    'STREET': 'ST', 'AVENUE': 'AVE', 'BOULEVARD': 'BLVD', 'DRIVE': 'DR',
-    'ROAD': 'RD', 'LANE': 'LN', 'COURT': 'CT', 'PLACE': 'PL',
-    'CIRCLE': 'CIR', 'HIGHWAY': 'HWY', 'PARKWAY': 'PKWY', 'TERRACE': 'TER',
-    'NORTH': 'N', 'SOUTH': 'S', 'EAST': 'E', 'WEST': 'W',
-    'NORTHWEST': 'NW', 'NORTHEAST': 'NE', 'SOUTHWEST': 'SW', 'SOUTHEAST': 'SE',
-}
 
+# --- Stage 1: Address Normalization and Dedup ---
 
 def normalize_address(addr: str) -> str:
-    """Normalize a street address for dedup grouping."""
-    if not addr:
-        return ''
-    addr = addr.upper().strip()
-    # Strip suite/unit suffixes
-    addr = SUITE_PATTERN.sub('', addr).strip()
-    addr = addr.rstrip(',').strip()
-    # Standardize abbreviations
-    words = addr.split()
-    words = [ABBREV_MAP.get(w.rstrip('.'), w.rstrip('.')) for w in words]
-    return ' '.join(words)
+    """Normalize a street address for dedup grouping (USPS form, secondary unit dropped)."""
+    return normalize_street(addr or '')
 
 
-def pick_winner(group: list[Row]) -> Row:
+def _state_key(r: Row) -> str:
+    """State as used in the stage 1 grouping keys."""
+    return (r.get('state', '') or '').upper().strip()
+
+
+def _output_order(r: Row) -> tuple[str, str, str]:
+    """Sort key of every stage's output."""
+    return (r.get('state', ''), r.get('city', ''), r.get('display_name', ''))
+
+
+def pick_winner(group: list[Row], classifier: 'RowClassifier | None' = None) -> Row:
     """Pick the best NPI from a group of co-located pharmacies.
 
     Priority: owner-priority NPIs first, then longer names (more specific),
-    then lowest NPI (oldest registration).
+    then lowest NPI (oldest registration). With a `classifier`, members
+    that stages 2-5 keep rank ahead of all of these, so a clinic or chain
+    row never absorbs the independent it shares a location with.
     """
-    def sort_key(r: Row) -> tuple[int, int, str]:
+    def sort_key(r: Row) -> tuple[int, int, int, str]:
         name = r.get('display_name', '') or ''
         owner = r.get('owner_name', '') or ''
+        removed = 1 if classifier and classifier.removal_reason(r) else 0
         # Prefer entries with owner info
         has_owner = 1 if owner.strip() else 0
-        return (-has_owner, -len(name), r.get('npi', ''))
+        return (removed, -has_owner, -len(name), r.get('npi', ''))
 
     return sorted(group, key=sort_key)[0]
 
 
-Row = dict[str, str]
-
-
-def stage1_address_dedup(verified_rows: list[Row], qualified_rows: list[Row]) -> list[Row]:
-    """Deduplicate by normalized street address + city + state + zip."""
+# Stage 1 pair thresholds (street_similarity of the street names within a
+# state + ZIP5 + house number block, once directionals and suffix agree)
+STREET_MATCH = 0.85             # link on the street alone
+STREET_MATCH_WITH_PHONE = 0.6   # link when the location phones also match
+
+
+def stage1_address_dedup(verified_rows: list[Row], qualified_rows: list[Row],
+                         stats: Counter | None = None,
+                         classifier: 'RowClassifier | None' = None) -> list[Row]:
+    """Cluster co-located NPIs by address and keep one winner per location.
+
+    Record linkage rather than exact keys, so "123 N MAIN ST" and
+    "123 North Main Street Ste 4B" land together:
+      - block on (state, ZIP5, house number) of the normalized address
+      - parse both addresses (usps_address.parse_address); the pre- and
+        post-directionals and the suffix must match exactly, so
+        "100 N MAIN ST" / "100 S MAIN ST" or "12 PARK AVE" /
+        "12 PARK AVE S" never link. With matching phones a component
+        missing on one side ("123 MAIN ST" / "123 N MAIN ST") is allowed.
+      - score the street names with street_similarity; link at
+        STREET_MATCH, or at STREET_MATCH_WITH_PHONE if the phones match
+      - rows with no house number block on the exact normalized
+        (address, city, state, zip) key instead
+      - union-find turns links into clusters; pick_winner per cluster,
+        preferring rows the stages 2-5 `classifier` keeps (default:
+        default_classifier()), as stage 1b does
+    If `stats` is given it receives link counts by kind (exact, fuzzy,
+    fuzzy+phone) and the number of rows merged away.
+    """
+    if stats is None:
+        stats = Counter()
     # Build address lookup from qualified file (has street addresses)
     addr_by_npi = {}
     for r in qualified_rows:
@@ -108,8 +161,9 @@ def stage1_address_dedup(verified_rows: list[Row], qualified_rows: list[Row]) ->
             'address_2': r.get('address_2', ''),
         }
 
-    # Group by normalized location
-    groups = defaultdict(list)
+    # Block by location
+    located = []
+    blocks = defaultdict(list)
     no_address = []
     for r in verified_rows:
         addr_info = addr_by_npi.get(r['npi'])
@@ -118,142 +172,450 @@ def stage1_address_dedup(verified_rows: list[Row], qualified_rows: list[Row]) ->
             continue
 
         norm_addr = normalize_address(addr_info['address_1'])
+        parsed = parse_address(addr_info['address_1'])
         city = (r.get('city', '') or '').upper().strip()
-        state = (r.get('state', '') or '').upper().strip()
+        state = _state_key(r)
         zip5 = (r.get('zip', '') or '').strip()[:5]
-
-        key = (norm_addr, city, state, zip5)
-        groups[key].append(r)
-
-    # Pick winner per group
+        house, _ = split_address(norm_addr)
+
+        i = len(located)
+        located.append(r)
+        if house:
+            blocks['house', state, zip5, house].append((i, parsed, normalize_phone(r.get('phone', ''))))
+        else:
+            blocks['exact', norm_addr, city, state, zip5].append((i, parsed, ''))
+
+    # Score pairs within each block and link
+    uf = UnionFind(len(located))
+    for key, members in blocks.items():
+        if len(members) < 2:
+            continue
+        if key[0] == 'exact':
+            for i, _, _ in members[1:]:
+                if uf.union(members[0][0], i):
+                    stats['exact'] += 1
+            continue
+        for x, (i, addr_i, phone_i) in enumerate(members):
+            for j, addr_j, phone_j in members[x + 1:]:
+                if uf.find(i) == uf.find(j):
+                    continue
+                same_phone = bool(phone_i) and phone_i == phone_j
+                sim = street_similarity(addr_i.street, addr_j.street)
+                if street_components_agree(addr_i, addr_j):
+                    if sim == 1.0:
+                        kind = 'exact'
+                    elif sim >= STREET_MATCH:
+                        kind = 'fuzzy'
+                    elif sim >= STREET_MATCH_WITH_PHONE and same_phone:
+                        kind = 'fuzzy+phone'
+                    else:
+                        continue
+                elif (same_phone and sim >= STREET_MATCH_WITH_PHONE
+                      and street_components_agree(addr_i, addr_j, allow_missing=True)):
+                    kind = 'fuzzy+phone'
+                else:
+                    continue
+                uf.union(i, j)
+                stats[kind] += 1
+
+    # Pick winner per cluster
+    classifier = classifier or default_classifier()
     deduped = []
-    for key, group in groups.items():
-        deduped.append(pick_winner(group))
+    for members in uf.components():
+        deduped.append(pick_winner([located[i] for i in members], classifier))
+    stats['merged'] += len(located) - len(deduped)
 
     # Add back any without addresses (keep them)
     deduped.extend(no_address)
 
     # Sort by state, city, name for consistent output
-    deduped.sort(key=lambda r: (r.get('state', ''), r.get('city', ''), r.get('display_name', '')))
+    deduped.sort(key=_output_order)
 
     return deduped
 
 
-# --- Stage 2: Institutional Removal ---
-
-INSTITUTIONAL_KEYWORDS = [
-    'HOSPITAL', 'MEDICAL CENTER', 'HEALTH CENTER', 'HEALTH CENTRES',
-    'VA MEDICAL', 'VA HEALTH', 'VETERANS AFFAIRS', 'VETERANS ADMIN',
-    'FQHC', 'COMMUNITY HEALTH', 'NEIGHBORHOOD HEALTH',
-    'INDIAN HEALTH SERVICE', 'IHS ',
-    'HEALTH SYSTEM', 'HEALTH CARE SERVICES', 'HEALTHCARE SYSTEM',
-    'BEHAVIORAL HEALTH', 'MENTAL HEALTH',
-    'REHABILITATION CENTER', 'REHAB CENTER',
-    'NURSING HOME', 'NURSING FACILITY',
-    'CORRECTIONAL', 'DETENTION',
-    'ONCOLOGY PHARMACY SERVICE', 'INFUSION CENTER',
-    'FAMILY HEALTH CENTER', 'RURAL HEALTH',
-    'FARM WORKERS CLINIC', 'MIGRANT HEALTH',
-    'CLINICA SIERRA VISTA', 'CLINICA DE SALUD',
-    'NYU LANGONE', 'CLEVELAND CLINIC', 'GEISINGER CLINIC',
-    'MAYO CLINIC', 'CEDARS-SINAI',
-    'SETON FAMILY OF', 'SENTARA ', 'NORTON HOSPITALS',
-    'INOVA HEALTH', 'MULTICARE HEALTH',
-    'METROHEALTH', 'LOVELACE HEALTH',
-    'DULUTH CLINIC', 'MARSHFIELD CLINIC',
-    'SEA MAR COMMUNITY', 'REGENESIS',
-    'LEON MEDICAL CENTER', 'SUN LIFE FAMILY',
-    'KATAHDIN VALLEY', 'CANYONLANDS COMMUNITY',
-    'ADVANCE COMMUNITY HEALTH',
-    'PHARMACY4HUMANITY',
-    'EL RIO SANTA CRUZ', 'PENOBSCOT COMMUNITY',
-    'WINN COMMUNITY HEALTH', 'MOREHOUSE COMMUNITY',
-    'STEPHEN F AUSTIN COMMUNITY', 'CAN COMMUNITY HEALTH',
-    'HEART OF FLORIDA HEALTH', 'GULF HEALTH',
-    'TAMPA FAMILY HEALTH', 'GREATER LAWRENCE FAMILY HEALTH',
-    'ST. JOHN\'S COMMUNITY HEALTH', 'CHEROKEE HEALTH',
-]
-
-
-def _get_name(r: Row) -> str:
-    """Get uppercased display name from a row."""
-    return (r.get('display_name', '') or '').upper()
+# --- Stage 1b: Phone / Owner Co-location Graph ---
 
+COLOCATION_SIGNALS = ('phone', 'owner')
+# Stage 1b is opt-in so the committed deliverables keep their documented
+# counts; phone alone merges ~3,500 more verified rows. Owner is the
+# looser signal: 1,014 of 1,790 owner + ZIP groups in the verified list
+# have different location phones, i.e. one owner running separate stores.
+DEFAULT_COLOCATION_SIGNALS = ()
 
-def _has_keyword(r: Row, keywords: list[str]) -> bool:
-    """Check if row's display name contains any keyword."""
-    name = _get_name(r)
-    return any(kw in name for kw in keywords)
 
+def _owner_key(name: str) -> str:
+    return ' '.join((name or '').upper().replace('.', ' ').replace(',', ' ').split())
 
-def stage2_remove_institutional(rows: list[Row]) -> list[Row]:
-    """Remove hospitals, health centers, VA facilities, FQHCs, health systems."""
-    return [r for r in rows if not _has_keyword(r, INSTITUTIONAL_KEYWORDS)]
 
+def stage1b_colocation_dedup(rows: list[Row], signals=DEFAULT_COLOCATION_SIGNALS,
+                             report: Counter | None = None,
+                             classifier: 'RowClassifier | None' = None) -> list[Row]:
+    """Merge NPIs that share a location phone or authorized official within a ZIP.
 
-# --- Stage 3: Specialty Taxonomy Removal ---
+    Each row emits hashed keys (zip5, phone) and (zip5, owner name); the
+    first row seen with a key is the anchor and every later row with that
+    key is unioned to it, so components come out of one pass with no
+    pairwise comparison. pick_winner chooses one row per component,
+    preferring rows the stages 2-5 `classifier` keeps (default:
+    default_classifier()); a shared phone often links an independent to
+    a clinic or FQHC pharmacy that stage 2 or 5 would then drop.
+    If `report` is given it receives, per signal, the number of merged
+    components that signal contributed a link to ('phone', 'owner',
+    'owner+phone' for components linked by both) and 'merged' rows.
+    """
+    uf = UnionFind(len(rows))
+    anchors = {}
+    merges = []
+    for i, r in enumerate(rows):
+        zip5 = (r.get('zip', '') or '').strip()[:5]
+        if not zip5:
+            continue
+        keys = []
+        if 'phone' in signals:
+            phone = normalize_phone(r.get('phone', ''))
+            if phone:
+                keys.append(('phone', zip5, phone))
+        if 'owner' in signals:
+            owner = _owner_key(r.get('owner_name', ''))
+            if owner:
+                keys.append(('owner', zip5, owner))
+        for key in keys:
+            anchor = anchors.setdefault(key, i)
+            if anchor != i and uf.union(anchor, i):
+                merges.append((anchor, key[0]))
+
+    component_signals = defaultdict(set)
+    for anchor, signal in merges:
+        component_signals[uf.find(anchor)].add(signal)
+
+    classifier = classifier or default_classifier()
+    deduped = [pick_winner([rows[i] for i in members], classifier) for members in uf.components()]
+    deduped.sort(key=_output_order)
+
+    if report is not None:
+        for used in component_signals.values():
+            report['+'.join(sorted(used))] += 1
+        report['merged'] += len(rows) - len(deduped)
+    return deduped
 
-SPECIALTY_TAXONOMIES = [
-    'Compounding Pharmacy',
-    'Nuclear Pharmacy',
-    'Specialty Pharmacy',
-    'Home Infusion Therapy Pharmacy',
-    'Long Term Care Pharmacy',
-]
 
+# --- Stages 2-5: Rules ---
 
-def stage3_remove_specialty(rows: list[Row]) -> list[Row]:
-    """Remove pharmacies with specialty/compounding taxonomy codes."""
-    def has_specialty(r: Row) -> bool:
+# Keyword / taxonomy lists for stages 2-5 live in a versioned data file so a
+# rerun records exactly which rules produced it (see write_manifest).
+RULES_PATH = Path(__file__).resolve().parent / 'reference_data' / 'dedup_rules.json'
+RULE_LISTS = ['institutional', 'specialty_taxonomies', 'chain', 'convenience', 'clinic']
+
+
+def file_sha256(path) -> str:
+    """Hex SHA-256 of a file, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_rules(path=RULES_PATH) -> dict:
+    """Load and check the stages 2-5 rules file.
+
+    Returns the JSON object plus 'path' and 'sha256'. Raises ValueError if
+    the version or a keyword list is missing.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        rules = json.load(f)
+    if not rules.get('version'):
+        raise ValueError(f"{path}: missing 'version'")
+    for name in RULE_LISTS:
+        if not isinstance(rules.get(name), list) or not all(isinstance(kw, str) and kw for kw in rules[name]):
+            raise ValueError(f"{path}: '{name}' must be a list of non-empty strings")
+    rules['path'] = str(path)
+    rules['sha256'] = file_sha256(path)
+    return rules
+
+
+# --- Stages 2-5 in one pass ---
+
+class KeywordClassifier:
+    """Multi-pattern substring matcher over named keyword families.
+
+    Every keyword is indexed by its first three characters. A text is
+    scanned once, position by position, and only the keywords sharing the
+    trigram at that position are verified with str.startswith, so the
+    cost follows the length of the name rather than the number of
+    keywords. Matching is plain substring (same as `kw in name`).
+    """
+
+    def __init__(self, families: list[tuple[str, list[str]]]):
+        self.families = [family for family, _ in families]
+        self.by_trigram = defaultdict(list)
+        self.short = []
+        for family, keywords in families:
+            for kw in keywords:
+                if len(kw) >= 3:
+                    self.by_trigram[kw[:3]].append((kw, family))
+                else:
+                    self.short.append((kw, family))
+        self.by_trigram = dict(self.by_trigram)
+
+    def matches(self, text: str) -> set[str]:
+        """Families with at least one keyword in `text`."""
+        found = {family for kw, family in self.short if kw in text}
+        get = self.by_trigram.get
+        for i in range(len(text) - 2):
+            candidates = get(text[i:i + 3])
+            if candidates:
+                for kw, family in candidates:
+                    if family not in found and text.startswith(kw, i):
+                        found.add(family)
+        return found
+
+
+# Removal reasons in stage order (2-5); a row is tagged with the first that applies
+REMOVAL_REASONS = ['institutional', 'specialty', 'chain', 'clinic']
+
+
+class RowClassifier:
+    """Stages 2-5 for one rules file: row -> removal reason."""
+
+    def __init__(self, rules: dict):
+        self.version = rules['version']
+        self.specialty_taxonomies = list(rules['specialty_taxonomies'])
+        self.names = KeywordClassifier([
+            ('institutional', rules['institutional']),          # stage 2
+            ('chain', rules['chain'] + rules['convenience']),    # stage 4
+            ('clinic', rules['clinic']),                         # stage 5
+        ])
+
+    def has_specialty(self, r: Row) -> bool:
         tax = r.get('primary_taxonomy_desc', '') or ''
-        return any(t in tax for t in SPECIALTY_TAXONOMIES)
-    return [r for r in rows if not has_specialty(r)]
+        return any(t in tax for t in self.specialty_taxonomies)
+
+    def removal_reason(self, r: Row) -> str:
+        """Stage (by REMOVAL_REASONS name) that removes this row, or '' if it is kept.
+
+        Uppercases the name once and matches every name family in a single
+        scan; the taxonomy check (stage 3) is slotted in stage order.
+        """
+        found = self.names.matches(_upper_name(r))
+        if self.has_specialty(r):
+            found.add('specialty')
+        for reason in REMOVAL_REASONS:
+            if reason in found:
+                return reason
+        return ''
 
+    def removes(self, r: Row, reason: str) -> bool:
+        if reason == 'specialty':
+            return self.has_specialty(r)
+        return reason in self.names.matches(_upper_name(r))
 
-# --- Stage 4: Chain Removal ---
 
-CHAIN_KEYWORDS = [
-    'CVS', 'WALGREENS', 'WALMART', 'RITE AID', 'RITE-AID',
-    'COSTCO', 'KROGER', 'PUBLIX', 'H-E-B', 'HEB ',
-    'ALBERTSONS', 'SAFEWAY', 'SUPERMARKET',
-    'ROSAUERS', 'WINN-DIXIE', 'WINN DIXIE',
-    'HAGGEN', 'APEX DRUG STORES', 'PDS I MICHIGAN',
-    'K & B MISSISSIPPI',
-]
+def _upper_name(r: Row) -> str:
+    return (r.get('display_name', '') or '').upper()
 
-CONVENIENCE_KEYWORDS = [
-    'KWICKMART', 'KWIKMART', 'QUICKMART', 'FRANKMART',
-]
 
+_default_classifier = None
 
-def stage4_remove_chains(rows: list[Row]) -> list[Row]:
-    """Remove chain pharmacies and convenience store pharmacies."""
-    all_kw = CHAIN_KEYWORDS + CONVENIENCE_KEYWORDS
-    return [r for r in rows if not _has_keyword(r, all_kw)]
 
+def default_classifier() -> RowClassifier:
+    """RowClassifier for RULES_PATH, loaded on first use."""
+    global _default_classifier
+    if _default_classifier is None:
+        _default_classifier = RowClassifier(load_rules())
+    return _default_classifier
 
-# --- Stage 5: Non-Pharmacy Clinic Removal ---
 
-CLINIC_KEYWORDS = [
-    'CLINIC,', 'CLINIC ', 'CLINICS,', 'CLINICS ',
-    'MEDICAL GROUP', 'PHYSICIANS GROUP',
-    'ASSOCIATES MD', 'ASSOCIATES, MD',
-    'FAMILY PRACTICE', 'FAMILY MEDICINE',
-    'PEDIATRIC', 'URGENT CARE',
-    'INTERNAL MEDICINE', 'PRIMARY CARE',
-    'IHS PHARMACY', 'IREDELL',
-]
+def removal_reason(r: Row, classifier: RowClassifier | None = None) -> str:
+    return (classifier or default_classifier()).removal_reason(r)
 
 
-def stage5_remove_clinics(rows: list[Row]) -> list[Row]:
+def stage2_remove_institutional(rows: list[Row], classifier: RowClassifier | None = None) -> list[Row]:
+    """Remove hospitals, health centers, VA facilities, FQHCs, health systems."""
+    classifier = classifier or default_classifier()
+    return [r for r in rows if not classifier.removes(r, 'institutional')]
+
+
+def stage3_remove_specialty(rows: list[Row], classifier: RowClassifier | None = None) -> list[Row]:
+    """Remove pharmacies with specialty/compounding taxonomy codes."""
+    classifier = classifier or default_classifier()
+    return [r for r in rows if not classifier.removes(r, 'specialty')]
+
+
+def stage4_remove_chains(rows: list[Row], classifier: RowClassifier | None = None) -> list[Row]:
+    """Remove chain pharmacies and convenience store pharmacies."""
+    classifier = classifier or default_classifier()
+    return [r for r in rows if not classifier.removes(r, 'chain')]
+
+
+def stage5_remove_clinics(rows: list[Row], classifier: RowClassifier | None = None) -> list[Row]:
     """Remove non-pharmacy clinic entities."""
-    return [r for r in rows if not _has_keyword(r, CLINIC_KEYWORDS)]
+    classifier = classifier or default_classifier()
+    return [r for r in rows if not classifier.removes(r, 'clinic')]
+
+
+# --- Manifest and Diff ---
+
+def read_npis(path) -> dict[str, Row]:
+    """NPI -> row of a previous output file ({} if it does not exist)."""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', newline='') as f:
+        return {r['npi']: r for r in csv.DictReader(f)}
+
+
+DIFF_FIELDS = ['npi', 'change', 'reason', 'display_name', 'city', 'state']
+
+
+def diff_clean(previous: dict[str, Row], clean: list[Row], verified: list[Row],
+               deduped: list[Row], removed: list[Row]) -> list[Row]:
+    """Added / removed NPIs between a previous clean file and this run.
+
+    Removed NPIs carry why this run dropped them: their stage 2-5
+    removal_reason, 'duplicate' (merged away in stage 1/1b), or
+    'not_in_input' (absent from the verified input). Added NPIs carry
+    'kept' (they pass every stage under the current rules).
+    """
+    clean_npis = {r['npi'] for r in clean}
+    verified_npis = {r['npi'] for r in verified}
+    deduped_npis = {r['npi'] for r in deduped}
+    reason_by_npi = {r['npi']: r['removal_reason'] for r in removed}
+
+    diff = []
+    for r in clean:
+        if r['npi'] not in previous:
+            diff.append({**r, 'change': 'added', 'reason': 'kept'})
+    for npi, r in previous.items():
+        if npi in clean_npis:
+            continue
+        if npi not in verified_npis:
+            reason = 'not_in_input'
+        elif npi not in deduped_npis:
+            reason = 'duplicate'
+        else:
+            reason = reason_by_npi.get(npi, '')
+        diff.append({**r, 'change': 'removed', 'reason': reason})
+    diff.sort(key=lambda r: (r['change'], r.get('state', ''), r['reason'], r['npi']))
+    return [{name: r.get(name, '') for name in DIFF_FIELDS} for r in diff]
+
+
+def write_manifest(path, rules: dict, inputs: dict, stage_counts: dict,
+                   colocation_signals, outputs: dict) -> None:
+    """Record what produced this run: rules version/hash, input hashes, counts, output hashes."""
+    manifest = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'rules': {'version': rules['version'], 'path': rules['path'], 'sha256': rules['sha256']},
+        'colocation_signals': list(colocation_signals),
+        'inputs': {name: {'path': str(p), 'sha256': file_sha256(p)} for name, p in inputs.items()},
+        'stage_counts': stage_counts,
+        'outputs': {name: {'path': str(p), 'sha256': file_sha256(p)} for name, p in outputs.items()},
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+        f.write('\n')
+
+
+# --- State-partitioned execution ---
+
+def run_pipeline(verified: list[Row], qualified: list[Row], colocation_signals, rules: dict) -> dict:
+    """Stages 1-5 on one set of rows (the national list or one state).
+
+    Returns the stage 1 row count, link / co-location stats, the deduped
+    rows (after stage 1b), the clean rows and the removed rows tagged with
+    removal_reason, each in _output_order.
+    """
+    classifier = RowClassifier(rules)
+    link_stats = Counter()
+    stage1 = stage1_address_dedup(verified, qualified, link_stats, classifier)
+    stage1_count = len(stage1)
+    colocation = Counter()
+    if colocation_signals:
+        stage1 = stage1b_colocation_dedup(stage1, colocation_signals, colocation, classifier)
+
+    clean = []
+    removed = []
+    for r in stage1:
+        reason = classifier.removal_reason(r)
+        if reason:
+            removed.append({**r, 'removal_reason': reason})
+        else:
+            clean.append(r)
+    return {'stage1_count': stage1_count, 'link_stats': link_stats, 'colocation': colocation,
+            'deduped': stage1, 'clean': clean, 'removed': removed}
+
+
+def _run_partition(task):
+    return run_pipeline(*task)
+
+
+def run_partitioned(verified: list[Row], qualified: list[Row], colocation_signals, rules: dict,
+                    workers: int) -> dict:
+    """run_pipeline per state in a process pool, merged back in _output_order.
+
+    Every stage 1 grouping key includes the state; stage 1b keys on ZIP5,
+    so states that share a ZIP5 (misfiled rows, e.g. a CO ZIP under CA)
+    are unioned into one partition. Stages 2-5 are per-row, so no cluster
+    crosses a partition. Each partition's outputs are sorted by
+    _output_order, and rows that tie on it share a state and hence a
+    partition, so heapq.merge reproduces the single-process output
+    exactly. Largest partitions are submitted first to balance the pool.
+    """
+    by_state = defaultdict(list)
+    for r in verified:
+        by_state[_state_key(r)].append(r)
+    states = list(by_state)
+    state_idx = {st: i for i, st in enumerate(states)}
+    uf = UnionFind(len(states))
+    zip_state = {}
+    for r in verified:
+        zip5 = (r.get('zip', '') or '').strip()[:5]
+        if zip5:
+            uf.union(zip_state.setdefault(zip5, state_idx[_state_key(r)]), state_idx[_state_key(r)])
+
+    # Partition rows keep their input order (stage 1 winners and ties depend on it)
+    part_of = {st: uf.find(state_idx[st]) for st in states}
+    partitions = defaultdict(list)
+    for r in verified:
+        partitions[part_of[_state_key(r)]].append(r)
+    qualified_by_part = defaultdict(list)
+    part_by_npi = {r['npi']: part for part, rows in partitions.items() for r in rows}
+    for r in qualified:
+        part = part_by_npi.get(r['npi'])
+        if part is not None:
+            qualified_by_part[part].append(r)
+
+    order = sorted(partitions, key=lambda part: -len(partitions[part]))
+    tasks = [(partitions[part], qualified_by_part[part], colocation_signals, rules) for part in order]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_run_partition, tasks))
+
+    merged = {'stage1_count': sum(res['stage1_count'] for res in results),
+              'link_stats': sum((res['link_stats'] for res in results), Counter()),
+              'colocation': sum((res['colocation'] for res in results), Counter())}
+    for name in ('deduped', 'clean', 'removed'):
+        merged[name] = list(heapq.merge(*(res[name] for res in results), key=_output_order))
+    return merged
 
 
 # --- Main ---
 
-def dedup_pharmacies(verified_path: str, qualified_path: str, output_dir: str) -> list[Row]:
-    """Run full 5-stage dedup pipeline."""
+def dedup_pharmacies(verified_path: str, qualified_path: str, output_dir: str,
+                     colocation_signals=DEFAULT_COLOCATION_SIGNALS, rules: dict | None = None,
+                     previous_path: str | None = None, workers: int = 1) -> list[Row]:
+    """Run full 5-stage dedup pipeline.
+
+    `rules` is a load_rules() result (default: RULES_PATH). The clean output
+    is diffed against `previous_path` (default: the clean file already in
+    `output_dir`, read before it is overwritten). With workers > 1 the
+    pipeline runs per state in a process pool (run_partitioned); the
+    outputs are identical.
+    """
+    if rules is None:
+        rules = load_rules()
+    clean_path = os.path.join(output_dir, 'ALL_VERIFIED_CLEAN.csv')
+    previous_path = previous_path or clean_path
+    previous = read_npis(previous_path)
 
     # Read inputs
     with open(verified_path, 'r') as f:
@@ -263,11 +625,32 @@ def dedup_pharmacies(verified_path: str, qualified_path: str, output_dir: str) -
 
     print(f"Input: {len(verified):,} verified pharmacies")
     print(f"Address source: {len(qualified):,} qualified pharmacies")
+    print(f"Rules: {rules['path']} (version {rules['version']})")
+
+    if workers > 1:
+        print(f"Partitioned by state across {workers} workers")
+        result = run_partitioned(verified, qualified, colocation_signals, rules, workers)
+    else:
+        result = run_pipeline(verified, qualified, colocation_signals, rules)
+    stage1 = result['deduped']
+    stage5 = result['clean']
+    removed = result['removed']
 
     # Stage 1: Address dedup
-    stage1 = stage1_address_dedup(verified, qualified)
-    s1_removed = len(verified) - len(stage1)
-    print(f"\nStage 1 (address dedup): {len(verified):,} -> {len(stage1):,} (-{s1_removed:,})")
+    link_stats = result['link_stats']
+    s1_count = result['stage1_count']
+    print(f"\nStage 1 (address dedup): {len(verified):,} -> {s1_count:,} (-{len(verified) - s1_count:,})")
+    print(f"  Links: {link_stats['exact']:,} exact street, {link_stats['fuzzy']:,} fuzzy street, "
+          f"{link_stats['fuzzy+phone']:,} fuzzy street + phone")
+
+    # Stage 1b: Phone / owner co-location
+    if colocation_signals:
+        colocation = result['colocation']
+        print(f"Stage 1b (co-location: {'+'.join(colocation_signals)}): {s1_count:,} -> {len(stage1):,} "
+              f"(-{colocation['merged']:,})")
+        for signal in ('phone', 'owner', 'owner+phone'):
+            if colocation[signal]:
+                print(f"  Components linked by {signal}: {colocation[signal]:,}")
 
     # Write deduped intermediate
     deduped_path = os.path.join(output_dir, 'ALL_VERIFIED_DEDUPED.csv')
@@ -278,34 +661,64 @@ def dedup_pharmacies(verified_path: str, qualified_path: str, output_dir: str) -
         writer.writerows(stage1)
     print(f"  Wrote {deduped_path}")
 
-    # Stage 2: Remove institutional
-    stage2 = stage2_remove_institutional(stage1)
-    s2_removed = len(stage1) - len(stage2)
-    print(f"\nStage 2 (institutional): {len(stage1):,} -> {len(stage2):,} (-{s2_removed:,})")
-
-    # Stage 3: Remove specialty taxonomy
-    stage3 = stage3_remove_specialty(stage2)
-    s3_removed = len(stage2) - len(stage3)
-    print(f"Stage 3 (specialty/compounding): {len(stage2):,} -> {len(stage3):,} (-{s3_removed:,})")
-
-    # Stage 4: Remove chains
-    stage4 = stage4_remove_chains(stage3)
-    s4_removed = len(stage3) - len(stage4)
-    print(f"Stage 4 (chains): {len(stage3):,} -> {len(stage4):,} (-{s4_removed:,})")
-
-    # Stage 5: Remove clinics
-    stage5 = stage5_remove_clinics(stage4)
-    s5_removed = len(stage4) - len(stage5)
-    print(f"Stage 5 (clinics): {len(stage4):,} -> {len(stage5):,} (-{s5_removed:,})")
+    # Stages 2-5: one classification pass; each removed row is tagged with its stage
+    reasons = Counter(r['removal_reason'] for r in removed)
+
+    remaining = len(stage1)
+    print()
+    for label, reason in [('Stage 2 (institutional)', 'institutional'),
+                          ('Stage 3 (specialty/compounding)', 'specialty'),
+                          ('Stage 4 (chains)', 'chain'),
+                          ('Stage 5 (clinics)', 'clinic')]:
+        after = remaining - reasons[reason]
+        print(f"{label}: {remaining:,} -> {after:,} (-{reasons[reason]:,})")
+        remaining = after
+
+    removed_path = os.path.join(output_dir, 'ALL_VERIFIED_REMOVED.csv')
+    with open(removed_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(fieldnames) + ['removal_reason'])
+        writer.writeheader()
+        writer.writerows(removed)
+    print(f"  Wrote {removed_path} (removed rows by reason)")
 
     # Write clean output
-    clean_path = os.path.join(output_dir, 'ALL_VERIFIED_CLEAN.csv')
     with open(clean_path, 'w', newline='') as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
         writer.writerows(stage5)
     print(f"\nWrote {clean_path}")
 
+    # Diff against the previous clean file
+    diff_path = os.path.join(output_dir, 'ALL_VERIFIED_CLEAN_DIFF.csv')
+    diff = diff_clean(previous, stage5, verified, stage1, removed)
+    with open(diff_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=DIFF_FIELDS)
+        writer.writeheader()
+        writer.writerows(diff)
+    if previous:
+        changes = Counter((r['change'], r['reason']) for r in diff)
+        added = sum(n for (change, _), n in changes.items() if change == 'added')
+        print(f"Diff vs {previous_path}: +{added:,} / -{len(diff) - added:,} NPIs")
+        for (change, reason), n in sorted(changes.items()):
+            if change == 'removed':
+                print(f"  removed ({reason}): {n:,}")
+    else:
+        print(f"No previous clean file at {previous_path}; every NPI listed as added")
+    print(f"  Wrote {diff_path}")
+
+    # Manifest: rules version and input/output hashes
+    manifest_path = os.path.join(output_dir, 'ALL_VERIFIED_MANIFEST.json')
+    stage_counts = {'input': len(verified), 'deduped': len(stage1),
+                    **{reason: reasons[reason] for reason in REMOVAL_REASONS}, 'clean': len(stage5)}
+    write_manifest(
+        manifest_path, rules,
+        inputs={'verified': verified_path, 'qualified': qualified_path},
+        stage_counts=stage_counts,
+        colocation_signals=colocation_signals,
+        outputs={'deduped': deduped_path, 'removed': removed_path, 'clean': clean_path, 'diff': diff_path},
+    )
+    print(f"  Wrote {manifest_path}")
+
     # Summary stats
     print("\n--- Summary ---")
     print(f"Original:  {len(verified):>7,}")
@@ -331,8 +744,22 @@ if __name__ == '__main__':
     parser.add_argument('--verified', default=None, help='Path to verified pharmacies CSV')
     parser.add_argument('--qualified', default=None, help='Path to qualified pharmacies CSV (for addresses)')
     parser.add_argument('--output-dir', default=None, help='Output directory')
+    parser.add_argument('--colocation-signals', default=','.join(DEFAULT_COLOCATION_SIGNALS) or 'none',
+                        help="Stage 1b signals: comma list of phone,owner, or 'none' to skip (default: none)")
+    parser.add_argument('--rules', default=str(RULES_PATH),
+                        help='Stages 2-5 keyword/taxonomy rules JSON (default: reference_data/dedup_rules.json)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Run the pipeline per state in N worker processes (default: 1, single process)')
+    parser.add_argument('--previous', default=None,
+                        help='Previous clean CSV to diff against (default: existing ALL_VERIFIED_CLEAN.csv in output dir)')
     args = parser.parse_args()
 
+    signals = () if args.colocation_signals == 'none' else tuple(args.colocation_signals.split(','))
+    unknown = [s for s in signals if s not in COLOCATION_SIGNALS]
+    if unknown:
+        print(f"ERROR: Unknown co-location signal(s): {', '.join(unknown)}")
+        sys.exit(1)
+
     repo_root = Path(__file__).resolve().parent.parent.parent
     verified_path = args.verified or repo_root / 'State_Outreach_Lists_Verified' / 'ALL_VERIFIED_PHARMACIES.csv'
     qualified_path = (
@@ -349,5 +776,12 @@ if __name__ == '__main__':
         print(f"ERROR: Qualified file not found: {qualified_path}")
         sys.exit(1)
 
+    try:
+        rules = load_rules(args.rules)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: Cannot load rules: {e}")
+        sys.exit(1)
+
     os.makedirs(output_dir, exist_ok=True)
-    dedup_pharmacies(str(verified_path), str(qualified_path), str(output_dir))
+    dedup_pharmacies(str(verified_path), str(qualified_path), str(output_dir), signals, rules, args.previous,
+                     args.workers)
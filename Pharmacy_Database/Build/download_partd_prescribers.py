@@ -3,7 +3,8 @@
 Download and Filter CMS Part D Prescribers by Provider and Drug
 ================================================================
 Downloads the full Part D CSV (~5GB) via streaming, filters for GLP-1
-drugs line-by-line (never loads full file into memory), and produces
+drugs with a byte-level prefilter (partd_filter.py; never loads the full
+file into memory), and produces
 ZIP-level + state drug-mix aggregations.
 
 Also downloads the Geography+Drug dataset (state-level, much smaller)
@@ -17,16 +18,35 @@ Output:
   reference_data/partd_glp1_by_zip.csv
   reference_data/partd_glp1_drug_mix.csv
 
+Prescribers are placed at their NPPES practice-location ZIP by NPI
+(npi_zip_index.py). The index is built from the NPPES file on first use
+and reused until that file changes. Rows with an NPI not in NPPES are
+reported and left out of the ZIP file.
+
+The filtered GLP-1 rows are cached as typed columns (partd_cache.py;
+Parquet, or CSV without pyarrow) holding only the aggregation fields.
+The cache is reused while the CSV URL and its ETag are unchanged; a HEAD
+request checks the ETag on each run.
+
+The download runs in its own thread feeding a bounded chunk queue, so
+network stalls and filtering overlap instead of adding up.
+
+Interrupted downloads resume: dropped connections are retried with HTTP
+Range requests, and progress (byte offset + GLP-1 rows so far) is
+checkpointed every --checkpoint-mb MB, so rerunning after a crash picks up
+at the last checkpoint (partd_download.py).
+
 Usage:
   python3 download_partd_prescribers.py
   python3 download_partd_prescribers.py --force
+  python3 download_partd_prescribers.py --force --restart   # ignore checkpoint
+  python3 download_partd_prescribers.py --nppes /path/to/nppes_feb2026.zip
 
-Dependencies: requests
+Dependencies: requests, pyarrow (optional; typed cache)
 """
 
 import argparse
 import csv
-import io
 import json
 import os
 import sys
@@ -40,6 +60,13 @@ except ImportError:
     print("ERROR: 'requests' package required. pip install requests")
     sys.exit(1)
 
+import partd_cache
+from npi_zip_index import INDEX_FILENAME as NPI_INDEX_FILENAME
+from npi_zip_index import ensure_index, lookup_zips
+from partd_download import Checkpoint, Pipeline, RangeStream, SourceChanged
+from partd_filter import Glp1LineFilter, parse_glp1_lines
+from partd_filter import drug_key as _drug_key
+
 
 # --- Configuration ---
 
@@ -58,211 +85,175 @@ GEO_DRUG_API = (
     '3463648b-1971-478d-84ca-80cadc758153/data'
 )
 
-GLP1_GENERICS = {
-    'semaglutide', 'tirzepatide', 'liraglutide',
-    'dulaglutide', 'exenatide',
-}
-
-GLP1_BRANDS_UPPER = {
-    'OZEMPIC', 'WEGOVY', 'RYBELSUS',
-    'MOUNJARO', 'ZEPBOUND',
-    'VICTOZA', 'SAXENDA',
-    'TRULICITY',
-    'BYETTA', 'BYDUREON',
-}
-
 ZIP_OUTPUT = REFERENCE_DIR / 'partd_glp1_by_zip.csv'
 DRUG_MIX_OUTPUT = REFERENCE_DIR / 'partd_glp1_drug_mix.csv'
-RAW_CACHE = REFERENCE_DIR / 'partd_glp1_raw_cache.csv'
+# Typed GLP-1 record cache (partd_cache.py), keyed on CSV_URL + ETag
+RAW_CACHE = REFERENCE_DIR / 'partd_glp1_raw_cache.parquet'
+# Full-width CSV cache written by earlier versions; converted once if found
+LEGACY_RAW_CACHE = REFERENCE_DIR / 'partd_glp1_raw_cache.csv'
+# Download progress is checkpointed every N MB (partd_glp1_raw_cache.ckpt.json / .partial.csv)
+DEFAULT_CHECKPOINT_MB = 64
 GEO_CACHE = REFERENCE_DIR / 'partd_glp1_geo_cache.json'
 
+# NPPES dissemination file (same place extract_independent_pharmacies.py reads
+# it); the NPI -> practice ZIP index is built next to it
+NPPES_PATH = Path(__file__).resolve().parent.parent / 'nppes_feb2026.zip'
+
+
+# --- Prescriber NPI -> practice ZIP ---
+
+def _prepare_npi_index(nppes_path, index_path) -> str:
+    """Path of the NPPES practice-location index (npi_zip_index.py); exits if unavailable.
+
+    The index is built from NPPES on first use (and when the NPPES file
+    changes); later runs only read it. Called before the Part D download
+    so a missing NPPES file fails fast.
+    """
+    index = ensure_index(nppes_path, index_path)
+    if index is None:
+        print(f"ERROR: No NPI -> ZIP index at {index_path} and NPPES file not found: {nppes_path}")
+        print("  Pass --nppes (dissemination ZIP or npidata CSV) or --npi-index.")
+        sys.exit(1)
+    return index
 
-def _drug_key(generic_name: str) -> str:
-    gn = generic_name.strip().lower()
-    for drug in GLP1_GENERICS:
-        if drug in gn:
-            return drug
-    return ''
-
-
-def _is_glp1(gnrc_name: str, brnd_name: str) -> bool:
-    """Fast check if a record is a GLP-1 drug."""
-    gn = gnrc_name.strip().lower()
-    for drug in GLP1_GENERICS:
-        if drug in gn:
-            return True
-    bn = brnd_name.strip().upper()
-    for brand in GLP1_BRANDS_UPPER:
-        if brand in bn:
-            return True
-    return False
-
-
-# --- City-to-ZIP lookup ---
-
-def _build_city_state_to_zip() -> dict[str, str]:
-    """Build city+state -> ZIP lookup from our pharmacy database."""
-    # Script: RetailMyMeds/Pharmacy_Database/Build/ -> parent^3 = RetailMyMeds/
-    rmm_root = Path(__file__).resolve().parent.parent.parent
-    clean_csv = rmm_root / 'State_Outreach_Lists_Verified' / 'ALL_VERIFIED_CLEAN.csv'
-
-    city_zip: dict[str, str] = {}
-    if clean_csv.exists():
-        with open(clean_csv, 'r', newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                city = row.get('city', '').strip().upper()
-                state = row.get('state', '').strip().upper()
-                zip5 = str(row.get('zip', '')).strip()[:5]
-                if city and state and zip5:
-                    key = f"{city}|{state}"
-                    if key not in city_zip:
-                        city_zip[key] = zip5
-
-    print(f"  City->ZIP lookup: {len(city_zip):,} city-state pairs")
-    return city_zip
+
+def _resolve_prescriber_zips(npis, index) -> dict[str, tuple[str, str]]:
+    """NPI -> (zip5, state) for the prescriber NPIs found in the index."""
+    npi_zip = lookup_zips(index, npis)
+    print(f"  NPI->ZIP index: {len(npi_zip):,} of {len(npis):,} prescriber NPIs found")
+    return npi_zip
 
 
 # --- Streaming CSV download + filter ---
 
-def download_and_filter_csv(force: bool = False) -> list[dict]:
+def _source_validator(url: str) -> str | None:
+    """Current ETag (else Last-Modified) of `url`, '' if it sends neither, None if unreachable."""
+    try:
+        resp = requests.head(url, allow_redirects=True, timeout=30)
+        resp.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        print(f"  NOTE: could not check the Part D CSV version ({e})")
+        return None
+    return resp.headers.get('ETag') or resp.headers.get('Last-Modified') or ''
+
+
+def _load_cached_records(url: str) -> dict[str, list] | None:
+    """Typed GLP-1 columns from RAW_CACHE if it matches the current source, else None."""
+    validator = _source_validator(url)
+    cols = partd_cache.load(RAW_CACHE, url, validator)
+    if cols is None and LEGACY_RAW_CACHE.exists() and not partd_cache.exists(RAW_CACHE):
+        print(f"Converting legacy cache {LEGACY_RAW_CACHE.name} (assumed current; --force re-downloads)")
+        with open(LEGACY_RAW_CACHE, 'r', newline='', encoding='utf-8') as f:
+            cols = partd_cache.to_columns(list(csv.DictReader(f)))
+        partd_cache.save(RAW_CACHE, cols, url, validator)
+    return cols
+
+
+def download_and_filter_csv(force: bool = False, url: str = CSV_URL,
+                            checkpoint_mb: int = DEFAULT_CHECKPOINT_MB,
+                            restart: bool = False) -> dict[str, list]:
     """Stream-download the full Part D CSV and filter for GLP-1 drugs.
 
-    Streams line-by-line so we never hold 5GB in memory.
-    Caches the filtered GLP-1 records (~50-100K rows) to a local CSV.
+    Streams chunk-by-chunk so we never hold 5GB in memory.
+    Caches the filtered GLP-1 records (~50-100K rows) as typed columns
+    (partd_cache.COLUMNS) and returns them in that form.
+
+    Dropped connections resume in-process with HTTP Range requests
+    (partd_download.RangeStream). Every `checkpoint_mb` MB the processed
+    byte offset and the GLP-1 rows so far are checkpointed next to
+    RAW_CACHE, so an interrupted run picks up where it stopped when
+    rerun (unless `restart`).
     """
-    if RAW_CACHE.exists() and not force:
-        print(f"Loading cached GLP-1 records from {RAW_CACHE}")
-        records = []
-        with open(RAW_CACHE, 'r', newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                records.append(row)
-        print(f"  {len(records):,} records from cache")
-        return records
+    if not force:
+        start = time.perf_counter()
+        cols = _load_cached_records(url)
+        if cols is not None:
+            print(f"Loaded {len(cols['npi']):,} cached GLP-1 records "
+                  f"in {(time.perf_counter() - start) * 1000:.0f} ms")
+            return cols
 
     os.makedirs(REFERENCE_DIR, exist_ok=True)
     print(f"Streaming Part D CSV from CMS (~5GB)...")
-    print(f"  URL: {CSV_URL}")
-
-    resp = requests.get(CSV_URL, stream=True, timeout=60)
-    resp.raise_for_status()
-
-    total_size = int(resp.headers.get('content-length', 0))
-    if total_size:
-        print(f"  File size: {total_size / 1e9:.1f} GB")
-
-    # Stream through the response, parse CSV line-by-line
-    glp1_records = []
-    header = None
-    lines_processed = 0
-    bytes_processed = 0
+    print(f"  URL: {url}")
+
+    ckpt = Checkpoint(RAW_CACHE.with_suffix(''))
+    if restart:
+        ckpt.clear()
+    state, glp1_records = ckpt.load(url)
+    if state:
+        print(f"  Resuming from checkpoint at {state['offset'] / 1e9:.2f} GB "
+              f"({state['lines']:,} lines, {state['rows']:,} GLP-1 records)")
+        flt = Glp1LineFilter(header=state['header'], lines=state['lines'], start=state['offset'])
+        stream = RangeStream(url, start=state['offset'], validator=state['validator'], total=state['total'])
+    else:
+        flt = Glp1LineFilter()
+        stream = RangeStream(url)
+
+    # A download thread fills a bounded chunk queue while this loop filters;
+    # the byte-level filter hands back only GLP-1 candidate lines, which are
+    # then CSV-parsed
+    pipe = Pipeline(stream)
+    checkpoint_bytes = checkpoint_mb * 1024 * 1024
+    saved_offset = flt.offset
+    saved_rows = len(glp1_records)
     last_report = time.time()
+    try:
+        for chunk in pipe:
+            if not flt.bytes and stream.total:
+                print(f"  File size: {stream.total / 1e9:.1f} GB")
 
-    # Buffer for incomplete lines
-    line_buffer = ''
+            candidates = flt.feed(chunk)
+            if flt.header is not None and 'Gnrc_Name' not in flt.header:
+                print(f"  ERROR: Gnrc_Name column not found. Columns: {flt.header}")
+                sys.exit(1)
+            glp1_records.extend(parse_glp1_lines(candidates, flt.header))
 
-    for chunk in resp.iter_content(chunk_size=1024 * 1024):  # 1MB chunks
-        if not chunk:
-            continue
-
-        bytes_processed += len(chunk)
-        text = line_buffer + chunk.decode('utf-8', errors='replace')
-        lines = text.split('\n')
-
-        # Last element may be incomplete -- save for next chunk
-        line_buffer = lines[-1]
-        lines = lines[:-1]
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-
-            if header is None:
-                header = line.split(',')
-                # Find column indices
-                col_map = {col: i for i, col in enumerate(header)}
-                gnrc_idx = col_map.get('Gnrc_Name', -1)
-                brnd_idx = col_map.get('Brnd_Name', -1)
-                if gnrc_idx == -1:
-                    print(f"  ERROR: Gnrc_Name column not found. Columns: {header}")
-                    resp.close()
-                    sys.exit(1)
-                continue
-
-            lines_processed += 1
-
-            # Fast pre-filter: check if line contains any GLP-1 keyword
-            line_upper = line.upper()
-            has_glp1 = False
-            for brand in GLP1_BRANDS_UPPER:
-                if brand in line_upper:
-                    has_glp1 = True
-                    break
-            if not has_glp1:
-                for gen in GLP1_GENERICS:
-                    if gen.upper() in line_upper:
-                        has_glp1 = True
-                        break
-            if not has_glp1:
-                continue
-
-            # Parse the CSV row properly
-            try:
-                row_vals = next(csv.reader(io.StringIO(line)))
-            except StopIteration:
-                continue
-
-            if len(row_vals) < len(header):
-                continue
-
-            gnrc = row_vals[gnrc_idx] if gnrc_idx < len(row_vals) else ''
-            brnd = row_vals[brnd_idx] if brnd_idx < len(row_vals) else ''
-
-            if _is_glp1(gnrc, brnd):
-                row_dict = dict(zip(header, row_vals))
-                glp1_records.append(row_dict)
+            if checkpoint_bytes and flt.header and flt.offset - saved_offset >= checkpoint_bytes:
+                ckpt.save(url, stream, flt.offset, flt.header, flt.lines, glp1_records[saved_rows:])
+                saved_offset, saved_rows = flt.offset, len(glp1_records)
 
             # Progress report every 30s
             now = time.time()
             if now - last_report > 30:
-                pct = (bytes_processed / total_size * 100) if total_size else 0
-                print(f"  {bytes_processed / 1e9:.1f} GB ({pct:.0f}%), "
-                      f"{lines_processed:,} lines, "
+                pct = (flt.offset / stream.total * 100) if stream.total else 0
+                print(f"  {flt.offset / 1e9:.1f} GB ({pct:.0f}%), "
+                      f"{flt.lines:,} lines, "
                       f"{len(glp1_records):,} GLP-1 records", flush=True)
+                print(f"    {pipe.summary()}", flush=True)
                 last_report = now
+    except SourceChanged as e:
+        ckpt.clear()
+        if restart:
+            print(f"ERROR: Part D CSV changed during download: {e}")
+            sys.exit(1)
+        print(f"  NOTE: Part D CSV changed since the checkpoint ({e}); starting over")
+        return download_and_filter_csv(True, url, checkpoint_mb, restart=True)
+    except requests.exceptions.RequestException as e:
+        if flt.header:
+            ckpt.save(url, stream, flt.offset, flt.header, flt.lines, glp1_records[saved_rows:])
+        print(f"ERROR: Download interrupted at {flt.offset / 1e9:.2f} GB: {e}")
+        print("  Progress is checkpointed; rerun to resume.")
+        sys.exit(1)
 
     # Process any remaining buffer
-    if line_buffer.strip() and header:
-        line_upper = line_buffer.upper()
-        for brand in GLP1_BRANDS_UPPER:
-            if brand in line_upper:
-                try:
-                    row_vals = next(csv.reader(io.StringIO(line_buffer.strip())))
-                    if len(row_vals) >= len(header):
-                        gnrc = row_vals[gnrc_idx]
-                        brnd = row_vals[brnd_idx]
-                        if _is_glp1(gnrc, brnd):
-                            glp1_records.append(dict(zip(header, row_vals)))
-                except StopIteration:
-                    pass
-                break
-
-    resp.close()
+    glp1_records.extend(parse_glp1_lines(flt.flush(), flt.header))
+    header = flt.header
+    lines_processed = flt.lines
+    if stream.reconnects:
+        print(f"  Resumed {stream.reconnects} dropped connection(s) with range requests")
+    print(f"  Pipeline: {pipe.summary()}")
 
     print(f"\n  Processed {lines_processed:,} lines total")
     print(f"  Found {len(glp1_records):,} GLP-1 prescriber records")
 
     # Cache filtered records
+    cols = partd_cache.to_columns(glp1_records)
     if glp1_records and header:
-        with open(RAW_CACHE, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=header)
-            writer.writeheader()
-            writer.writerows(glp1_records)
-        print(f"  Cached to {RAW_CACHE}")
+        cache_file = partd_cache.save(RAW_CACHE, cols, url, stream.validator)
+        print(f"  Cached to {cache_file}")
+    ckpt.clear()
 
-    return glp1_records
+    return cols
 
 
 # --- Geography+Drug download ---
@@ -320,9 +311,15 @@ def download_geo_drug(force: bool = False) -> list[dict]:
 # --- Aggregation ---
 
 def aggregate_by_zip(
-    records: list[dict], city_zip: dict[str, str],
+    records: dict[str, list], npi_zip: dict[str, tuple[str, str]],
 ) -> None:
-    """Aggregate to ZIP-level via city+state matching."""
+    """Aggregate to ZIP-level at each prescriber's practice ZIP.
+
+    `records` are typed GLP-1 columns (partd_cache.COLUMNS); `npi_zip` is
+    NPI -> (zip5, state) from NPPES. A ZIP carried by the Part D file
+    itself wins. Rows whose NPI resolves to no ZIP are left out of the
+    ZIP file and reported.
+    """
     print("\nAggregating to ZIP level...")
 
     zip_data: dict[str, dict] = defaultdict(lambda: {
@@ -333,31 +330,29 @@ def aggregate_by_zip(
         'exenatide_claims': 0,
     })
 
+    source_zip = 0
     matched = 0
-    unmatched = 0
+    unresolved = 0
+    unresolved_claims = 0
 
-    for rec in records:
-        state = rec.get('Prscrbr_State_Abrvtn', '').strip().upper()
-        city = rec.get('Prscrbr_City', '').strip().upper()
-        generic = rec.get('Gnrc_Name', '')
+    rows = zip(records['npi'], records['zip'], records['generic'],
+               records['claims'], records['cost'], records['benes'])
+    for npi, zip5, generic, claims, cost, benes in rows:
         drug = _drug_key(generic)
         if not drug:
             continue
+        claims, cost, benes = claims or 0, cost or 0.0, benes or 0
 
-        try:
-            claims = int(float(rec.get('Tot_Clms', 0) or 0))
-            cost = float(rec.get('Tot_Drug_Cst', 0) or 0)
-            benes = int(float(rec.get('Tot_Benes', 0) or 0))
-        except (ValueError, TypeError):
-            continue
-
-        key = f"{city}|{state}"
-        zip5 = city_zip.get(key, '')
-        if not zip5:
-            zip5 = f"{state}000"
-            unmatched += 1
-        else:
+        zip5 = zip5[:5]
+        if zip5:
+            source_zip += 1
+        elif npi in npi_zip:
+            zip5 = npi_zip[npi][0]
             matched += 1
+        else:
+            unresolved += 1
+            unresolved_claims += claims
+            continue
 
         z = zip_data[zip5]
         z['total_claims'] += claims
@@ -383,8 +378,12 @@ def aggregate_by_zip(
         writer.writerows(rows)
 
     total_claims = sum(z['total_claims'] for z in zip_data.values())
+    all_claims = total_claims + unresolved_claims
     print(f"  Wrote {len(rows):,} ZIP records to {ZIP_OUTPUT}")
-    print(f"  City->ZIP matched: {matched:,}, state-level: {unmatched:,}")
+    if source_zip:
+        print(f"  Part D ZIP: {source_zip:,}")
+    print(f"  NPI->ZIP matched: {matched:,}, unresolved: {unresolved:,} "
+          f"({unresolved_claims:,} claims, {unresolved_claims / all_claims * 100 if all_claims else 0:.2f}%)")
     print(f"  Total claims: {total_claims:,}")
 
 
@@ -469,18 +468,44 @@ def main() -> None:
         '--force', action='store_true',
         help='Force re-download (ignore cache)',
     )
+    parser.add_argument(
+        '--csv-url', default=CSV_URL,
+        help='Part D CSV URL (default: CMS; e.g. a local mirror)',
+    )
+    parser.add_argument(
+        '--checkpoint-mb', type=int, default=DEFAULT_CHECKPOINT_MB,
+        help=f'Checkpoint download progress every N MB (default: {DEFAULT_CHECKPOINT_MB}; 0 disables)',
+    )
+    parser.add_argument(
+        '--restart', action='store_true',
+        help='Discard any download checkpoint and start from byte zero',
+    )
+    parser.add_argument(
+        '--nppes', default=str(NPPES_PATH),
+        help='NPPES dissemination ZIP or npidata CSV for prescriber practice ZIPs',
+    )
+    parser.add_argument(
+        '--npi-index', default=None,
+        help=f'NPI -> ZIP index path (default: {NPI_INDEX_FILENAME} next to the NPPES file)',
+    )
     args = parser.parse_args()
-
-    city_zip = _build_city_state_to_zip()
+    npi_index = args.npi_index or str(Path(args.nppes).resolve().parent / NPI_INDEX_FILENAME)
+    # Resolve the NPI -> ZIP index up front: no point downloading ~5GB
+    # if the prescribers cannot be placed afterwards
+    npi_index = _prepare_npi_index(args.nppes, npi_index)
 
     # Step 1: Stream-download full CSV, filter for GLP-1
-    records = download_and_filter_csv(force=args.force)
-    if not records:
+    records = download_and_filter_csv(
+        force=args.force, url=args.csv_url,
+        checkpoint_mb=args.checkpoint_mb, restart=args.restart,
+    )
+    if not records['npi']:
         print("ERROR: No GLP-1 records found.")
         sys.exit(1)
 
-    # Step 2: Aggregate to ZIP
-    aggregate_by_zip(records, city_zip)
+    # Step 2: Aggregate to ZIP at each prescriber's NPPES practice ZIP
+    npi_zip = _resolve_prescriber_zips(set(records['npi']), npi_index)
+    aggregate_by_zip(records, npi_zip)
 
     # Step 3: Geography data for drug mix
     geo = download_geo_drug(force=args.force)
@@ -496,23 +521,20 @@ def main() -> None:
     print(f"  {DRUG_MIX_OUTPUT}")
 
 
-def _fallback_drug_mix(records: list[dict]) -> None:
-    """Build drug mix from provider records if geo fails."""
+def _fallback_drug_mix(records: dict[str, list]) -> None:
+    """Build drug mix from provider records (typed columns) if geo fails."""
     state_drug: dict[str, dict[str, dict]] = defaultdict(
         lambda: defaultdict(lambda: {'claims': 0, 'cost': 0.0})
     )
     state_totals: dict[str, int] = defaultdict(int)
 
-    for rec in records:
-        state = rec.get('Prscrbr_State_Abrvtn', '').strip().upper()
-        drug = _drug_key(rec.get('Gnrc_Name', ''))
+    for state, generic, claims, cost in zip(records['state'], records['generic'],
+                                            records['claims'], records['cost']):
+        state = state.upper()
+        drug = _drug_key(generic)
         if not drug or not state or len(state) != 2:
             continue
-        try:
-            claims = int(float(rec.get('Tot_Clms', 0) or 0))
-            cost = float(rec.get('Tot_Drug_Cst', 0) or 0)
-        except (ValueError, TypeError):
-            continue
+        claims, cost = claims or 0, cost or 0.0
         state_drug[state][drug]['claims'] += claims
         state_drug[state][drug]['cost'] += cost
         state_totals[state] += claims
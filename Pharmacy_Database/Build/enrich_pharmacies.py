@@ -3,11 +3,32 @@
 Enrich Independent Pharmacy Database
 =====================================
 Takes the base independent_pharmacies_usa_feb2026.csv and adds:
-1. estimated_status  - Active/Likely Active/Uncertain/Likely Closed
+1. estimated_status  - Active/Likely Active/Uncertain/Likely Closed, from
+                       the latest of last update / certification /
+                       enumeration date vs an as-of date (pharmacy_status.py)
 2. owner_name        - From NPPES Authorized Official fields
 3. owner_title       - From NPPES Authorized Official fields
 4. owner_phone       - From NPPES Authorized Official fields
 
+Owner fields are looked up by NPI in the outputs of
+extract_independent_pharmacies.py, fastest first:
+  1. nppes_pharmacy_snapshot.parquet (columnar; only the npi and owner
+     columns are read, then hash-joined to our NPIs; needs pyarrow)
+  2. nppes_community_pharmacies.csv (scan file, NPI-keyed dict)
+  3. a projected scan of the full NPPES file (neither file present)
+Either file makes enrichment a seconds-long join that can be rerun after
+each dedup change without touching NPPES.
+
+Coverage metrics (status x owner presence x state) are written next to
+the CSV as qualified_independent_pharmacies_feb2026_summary.json.
+
+Status transitions against the previous qualified output (by NPI) are
+written to status_transitions.csv on every run for churn tracking.
+
+With --delta, the previous qualified output is refreshed from an NPPES
+weekly/monthly incremental file (keyed by NPI, newest Last Update Date
+wins, deactivations dropped) instead of rescanning anything.
+
 NOTE on Rx volume and GLP-1 data:
 CMS Part D public use files (Prescriber PUF, Prescriber by Drug) are keyed
 to PRESCRIBER NPIs (doctors), not PHARMACY/DISPENSER NPIs. Pharmacy-level
@@ -21,36 +42,33 @@ either: (a) NCPDP DataQ subscription, or (b) CMS PDE Data Use Agreement.
 Output: qualified_independent_pharmacies_feb2026.csv
 """
 
+import argparse
 import csv
 import os
+import sys
 import zipfile
-import glob
 from datetime import datetime
 
+import pandas as pd
+
+import nppes_snapshot
+import pharmacy_status
+from enrichment_summary import summarize, write_summary
+from extract_independent_pharmacies import classify_pharmacy
+from nppes_scanner import (
+    OWNER_FIELDS, PHARMACY_FIELDS, SCAN_FILENAME, find_nppes_csv, iter_updates,
+    load_owner_index, open_nppes_source, open_nppes_zip, parse_nppes_date,
+    scan_pharmacies,
+)
+
 
 BASE_DIR = '/Users/matthewscott/Desktop/RetailMyMeds/Pharmacy_Database'
 INPUT_CSV = os.path.join(BASE_DIR, 'independent_pharmacies_usa_feb2026.csv')
 OUTPUT_CSV = os.path.join(BASE_DIR, 'qualified_independent_pharmacies_feb2026.csv')
 NPPES_ZIP = os.path.join(BASE_DIR, 'nppes_feb2026.zip')
-
-
-def compute_status(last_updated_str):
-    """Compute estimated operating status from last_updated date."""
-    if not last_updated_str:
-        return 'Likely Closed'
-    try:
-        year = int(last_updated_str.split('/')[-1])
-    except (ValueError, IndexError):
-        return 'Likely Closed'
-
-    if year >= 2024:
-        return 'Active'
-    elif year >= 2020:
-        return 'Likely Active'
-    elif year >= 2015:
-        return 'Uncertain'
-    else:
-        return 'Likely Closed'
+SCAN_CSV = os.path.join(BASE_DIR, SCAN_FILENAME)
+SNAPSHOT = os.path.join(BASE_DIR, nppes_snapshot.SNAPSHOT_FILENAME)
+TRANSITIONS_CSV = os.path.join(BASE_DIR, 'status_transitions.csv')
 
 
 def load_base_pharmacies():
@@ -66,30 +84,185 @@ def load_base_pharmacies():
     return pharmacies
 
 
-def enrich_status(pharmacies):
-    """Add estimated_status column based on last_updated."""
-    print(f"\n[{now()}] Enrichment 1: Computing estimated_status...")
-    counts = {}
-    for npi, p in pharmacies.items():
-        status = compute_status(p.get('last_updated', ''))
+def enrich_status(pharmacies, as_of=pharmacy_status.DEFAULT_AS_OF, cutoffs=None, details=None):
+    """Add estimated_status, classified for the whole table at once.
+
+    The base CSV has no certification date, so it is joined by NPI from
+    `details` (a load_owners result including certification_date), else
+    from the snapshot / scan file (rows without one just use their
+    other dates).
+    """
+    print(f"\n[{now()}] Enrichment 1: Computing estimated_status (as of {as_of.isoformat()})...")
+    need = {npi for npi, p in pharmacies.items() if 'certification_date' not in p}
+    if need:
+        if details is None:
+            details = load_owners(need, ['certification_date'])
+        details = details or {}
+        for npi in need:
+            pharmacies[npi]['certification_date'] = details.get(npi, {}).get('certification_date', '')
+
+    df = pd.DataFrame.from_records(
+        [{c: p.get(c, '') for c in pharmacy_status.DATE_COLUMNS} for p in pharmacies.values()],
+        columns=pharmacy_status.DATE_COLUMNS,
+    )
+    statuses = pharmacy_status.classify_status(df, as_of=as_of, cutoffs=cutoffs)
+    for p, status in zip(pharmacies.values(), statuses):
         p['estimated_status'] = status
-        counts[status] = counts.get(status, 0) + 1
 
-    for status in ['Active', 'Likely Active', 'Uncertain', 'Likely Closed']:
+    counts = statuses.value_counts()
+    for status in pharmacy_status.STATUS_ORDER:
         print(f"  {status}: {counts.get(status, 0):,}")
 
 
-def enrich_owner_info(pharmacies):
-    """Extract Authorized Official fields from NPPES bulk file."""
+def report_status_transitions(pharmacies):
+    """Write status_transitions.csv: prior vs new estimated_status by NPI.
+
+    Must run before write_output replaces the previous qualified output.
+    """
+    if not os.path.exists(OUTPUT_CSV):
+        print("\n  No previous output; skipping status transitions")
+        return None
+    prior = pd.read_csv(OUTPUT_CSV, usecols=['npi', 'estimated_status'], dtype=str, keep_default_na=False)
+    prior = prior.drop_duplicates('npi').set_index('npi')['estimated_status']
+    current = pd.Series({npi: p['estimated_status'] for npi, p in pharmacies.items()}, dtype=object)
+
+    table = pharmacy_status.transitions(prior, current)
+    table.to_csv(TRANSITIONS_CSV, index=False)
+
+    changed = table[table['from_status'] != table['to_status']]
+    print(f"\n[{now()}] Status transitions vs previous output: {TRANSITIONS_CSV}")
+    if changed.empty:
+        print("  No changes")
+    for row in changed.itertuples(index=False):
+        print(f"  {row.from_status:<14} -> {row.to_status:<14} {row.count:>6,}")
+    return TRANSITIONS_CSV
+
+
+def load_owners(npi_set, fields=OWNER_FIELDS):
+    """NPI -> fields (owner by default) from the snapshot or scan file; None if neither exists."""
+    if os.path.exists(SNAPSHOT) and nppes_snapshot.available():
+        print(f"  Hash-joining {len(npi_set):,} NPIs against {os.path.basename(SNAPSHOT)}")
+        return nppes_snapshot.lookup_npis(SNAPSHOT, npi_set, fields)
+    if os.path.exists(SCAN_CSV):
+        print(f"  Joining against scan file {os.path.basename(SCAN_CSV)}")
+        return load_owner_index(SCAN_CSV, fields)
+    return None
+
+
+def enrich_owner_info(pharmacies, stream_zip=False, owners=None):
+    """Attach Authorized Official fields by NPI.
+
+    Uses `owners` if given (a load_owners result), else looks the NPIs up
+    in the snapshot or scan file written by extract_independent_pharmacies.py
+    (see load_owners), so a refresh reads NPPES only once. Falls back to a
+    single column-projected pass over the NPPES CSV when neither exists.
+    """
     print(f"\n[{now()}] Enrichment 2: Extracting owner info from NPPES...")
 
-    if not os.path.exists(NPPES_ZIP):
-        print("  WARNING: NPPES ZIP not found. Skipping owner enrichment.")
-        for p in pharmacies.values():
+    if owners is None:
+        owners = load_owners(set(pharmacies.keys()))
+    if owners is None:
+        owners = _scan_owner_info(set(pharmacies.keys()), stream_zip)
+        if owners is None:
+            owners = {}
+
+    matched = 0
+    for npi, p in pharmacies.items():
+        owner = owners.get(npi)
+        if owner:
+            p.update({k: owner[k] for k in OWNER_FIELDS})
+            matched += 1
+        else:
             p['owner_name'] = ''
             p['owner_title'] = ''
             p['owner_phone'] = ''
-        return
+
+    print(f"  Owner info matched: {matched:,} / {len(pharmacies):,}")
+
+
+def enrich_from_delta(pharmacies, delta_path):
+    """Refresh owner fields from the previous output plus an NPPES delta file.
+
+    Instead of rescanning NPPES: owner fields are carried over from the
+    previous qualified output (keyed by NPI), then rows in the weekly or
+    monthly incremental file overwrite them when their Last Update Date is
+    not older than ours. Deactivated NPIs, or NPIs no longer listed as
+    Type 2 community pharmacies, are dropped. Updated rows go back through
+    the territory / chain / non-independent filters (classify_pharmacy),
+    as a full extraction would, and are dropped unless still independent.
+    Anything still missing is filled from the scan file. Run enrich_status
+    afterwards, because last_updated may have changed.
+    """
+    print(f"\n[{now()}] Enrichment 2 (delta): Applying {os.path.basename(delta_path)}...")
+
+    prior = {}
+    if os.path.exists(OUTPUT_CSV):
+        with open(OUTPUT_CSV, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                prior[row['npi'].strip()] = row
+    print(f"  Previous output: {len(prior):,} pharmacies")
+
+    for npi, p in pharmacies.items():
+        if npi in prior:
+            for k in OWNER_FIELDS:
+                p[k] = prior[npi].get(k, '')
+
+    updated = removed = reclassified = stale = 0
+    with open_nppes_source(delta_path) as (name, f):
+        for npi, effective, status, row in iter_updates(f):
+            p = pharmacies.get(npi)
+            if p is None:
+                continue
+            held = parse_nppes_date(p.get('last_updated', ''))
+            if effective and held and effective < held:
+                stale += 1
+                continue
+            if status != 'active':
+                del pharmacies[npi]
+                removed += 1
+                continue
+            p.update({k: row[k] for k in PHARMACY_FIELDS + OWNER_FIELDS + ['certification_date']})
+            if classify_pharmacy(dict(row)) != 'independent':
+                del pharmacies[npi]
+                reclassified += 1
+                continue
+            updated += 1
+
+    missing = [npi for npi, p in pharmacies.items() if 'owner_name' not in p]
+    owners = (load_owners(set(missing)) if missing else None) or {}
+    for npi in missing:
+        pharmacies[npi].update(owners.get(npi, {k: '' for k in OWNER_FIELDS}))
+
+    print(f"  Updated from delta: {updated:,}")
+    print(f"  Removed (deactivated / no longer community pharmacy): {removed:,}")
+    print(f"  Removed (now territory / chain / non-independent): {reclassified:,}")
+    print(f"  Skipped (older than held record): {stale:,}")
+    print(f"  Owner filled from snapshot / scan file: {sum(npi in owners for npi in missing):,}"
+          f" of {len(missing):,} looked up")
+
+
+def _scan_owner_info(npi_set, stream_zip=False):
+    """Fallback: one projected pass over the NPPES CSV for owner fields.
+
+    With stream_zip=True the npidata member is read straight out of the
+    ZIP rather than extracted to nppes_extracted/ first.
+    """
+    if not os.path.exists(NPPES_ZIP):
+        print("  WARNING: NPPES ZIP not found. Skipping owner enrichment.")
+        return None
+
+    owners = {}
+    if stream_zip:
+        try:
+            with open_nppes_zip(NPPES_ZIP) as (member, f):
+                print(f"  Streaming {member} from ZIP for owner data...")
+                for p in scan_pharmacies(f, progress_every=1_000_000):
+                    if p['npi'] in npi_set:
+                        owners[p['npi']] = {k: p[k] for k in OWNER_FIELDS}
+        except FileNotFoundError:
+            print("  ERROR: Could not find NPPES CSV in ZIP!")
+            return None
+        return owners
 
     extract_dir = os.path.join(BASE_DIR, 'nppes_extracted')
     if not os.path.exists(extract_dir):
@@ -104,82 +277,14 @@ def enrich_owner_info(pharmacies):
     csv_path = find_nppes_csv(extract_dir)
     if not csv_path:
         print("  ERROR: Could not find NPPES CSV!")
-        for p in pharmacies.values():
-            p['owner_name'] = ''
-            p['owner_title'] = ''
-            p['owner_phone'] = ''
-        return
+        return None
 
     print(f"  Scanning {os.path.basename(csv_path)} for owner data...")
-    npi_set = set(pharmacies.keys())
-    matched = 0
-    total = 0
-
-    with open(csv_path, 'r', encoding='utf-8', errors='replace') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            total += 1
-            if total % 1_000_000 == 0:
-                print(f"  [{now()}] Scanned {total:,} rows..."
-                      f" ({matched:,} matched)")
-
-            npi = row.get('NPI', '').strip()
-            if npi not in npi_set:
-                continue
-
-            first = row.get('Authorized Official First Name', '').strip()
-            last = row.get('Authorized Official Last Name', '').strip()
-            title = row.get(
-                'Authorized Official Title or Position', ''
-            ).strip()
-            phone = row.get(
-                'Authorized Official Telephone Number', ''
-            ).strip()
-
-            if first or last:
-                name = f"{first} {last}".strip()
-            else:
-                name = ''
-
-            pharmacies[npi]['owner_name'] = name
-            pharmacies[npi]['owner_title'] = title
-            pharmacies[npi]['owner_phone'] = phone
-            matched += 1
-
-    # Fill blanks for any unmatched
-    for p in pharmacies.values():
-        if 'owner_name' not in p:
-            p['owner_name'] = ''
-            p['owner_title'] = ''
-            p['owner_phone'] = ''
-
-    print(f"  Owner info matched: {matched:,} / {len(pharmacies):,}")
-
-
-def find_nppes_csv(extract_dir):
-    """Find the main NPPES CSV file in the extracted directory."""
-    patterns = [
-        os.path.join(extract_dir, 'npidata_pfile_*.csv'),
-        os.path.join(
-            extract_dir,
-            'NPPES_Data_Dissemination_*',
-            'npidata_pfile_*.csv',
-        ),
-    ]
-    for pattern in patterns:
-        matches = glob.glob(pattern)
-        if matches:
-            matches.sort(
-                key=lambda f: os.path.getsize(f), reverse=True
-            )
-            return matches[0]
-    for f in glob.glob(
-        os.path.join(extract_dir, '**', '*.csv'), recursive=True
-    ):
-        size = os.path.getsize(f)
-        if size > 1_000_000_000:
-            return f
-    return None
+    with open(csv_path, 'r', newline='', encoding='utf-8', errors='replace') as f:
+        for p in scan_pharmacies(f, progress_every=1_000_000):
+            if p['npi'] in npi_set:
+                owners[p['npi']] = {k: p[k] for k in OWNER_FIELDS}
+    return owners
 
 
 def write_output(pharmacies):
@@ -219,36 +324,26 @@ def write_output(pharmacies):
     print(f"  Output: {OUTPUT_CSV}")
     print(f"  Records: {len(records):,}")
 
-    # Summary stats
-    status_counts = {}
-    has_owner = 0
-    for r in records:
-        st = r.get('estimated_status', '')
-        status_counts[st] = status_counts.get(st, 0) + 1
-        if r.get('owner_name', '').strip():
-            has_owner += 1
+    summary = summarize(records)
+    json_path = write_summary(summary, OUTPUT_CSV)
+    by_status = summary['by_status']
 
     print("\n  Summary:")
     print(f"  {'Status':<20} {'Count':>8}")
     print("  " + "-" * 30)
-    for status in ['Active', 'Likely Active', 'Uncertain', 'Likely Closed']:
-        print(f"  {status:<20} {status_counts.get(status, 0):>8,}")
+    for status in pharmacy_status.STATUS_ORDER:
+        print(f"  {status:<20} {by_status[status]['count']:>8,}")
     print("  " + "-" * 30)
-    print(f"  {'Total':<20} {len(records):>8,}")
-    print(f"  {'With owner name':<20} {has_owner:>8,}")
+    print(f"  {'Total':<20} {summary['count']:>8,}")
+    print(f"  {'With owner name':<20} {summary['with_owner']:>8,}")
 
     # Owner name coverage by status
     print("\n  Owner coverage by status:")
-    for status in ['Active', 'Likely Active', 'Uncertain', 'Likely Closed']:
-        total_st = status_counts.get(status, 0)
-        with_owner = sum(
-            1 for r in records
-            if r.get('estimated_status') == status
-            and r.get('owner_name', '').strip()
-        )
-        pct = (with_owner / total_st * 100) if total_st else 0
-        print(f"  {status:<20} {with_owner:>6,} / {total_st:>6,}"
-              f" ({pct:.1f}%)")
+    for status in pharmacy_status.STATUS_ORDER:
+        cell = by_status[status]
+        print(f"  {status:<20} {cell['with_owner']:>6,} / {cell['count']:>6,}"
+              f" ({cell['owner_pct']:.1f}%)")
+    print(f"\n  Summary JSON (status x owner x state): {json_path}")
 
 
 def now():
@@ -256,13 +351,39 @@ def now():
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Enrich independent pharmacy database')
+    parser.add_argument('--stream-zip', action='store_true',
+                        help='If NPPES must be rescanned, read it straight from the ZIP')
+    parser.add_argument('--delta', default=None,
+                        help='NPPES weekly/monthly incremental file (ZIP or CSV) to apply to the previous output')
+    parser.add_argument('--as-of', default=pharmacy_status.DEFAULT_AS_OF.isoformat(),
+                        help='Reference date for status cutoffs, YYYY-MM-DD (default: NPPES file date)')
+    parser.add_argument('--status-cutoffs', default=None,
+                        help='Years before --as-of for Active,Likely Active,Uncertain (default: 2,6,11)')
+    args = parser.parse_args()
+
+    try:
+        as_of = datetime.strptime(args.as_of, '%Y-%m-%d').date()
+        cutoffs = pharmacy_status.parse_cutoffs(args.status_cutoffs) if args.status_cutoffs else None
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
     print(f"[{now()}] Starting pharmacy enrichment pipeline...")
     print(f"  Input: {INPUT_CSV}")
     print(f"  Output: {OUTPUT_CSV}")
 
     pharmacies = load_base_pharmacies()
-    enrich_status(pharmacies)
-    enrich_owner_info(pharmacies)
+    if args.delta:
+        enrich_from_delta(pharmacies, args.delta)
+        enrich_status(pharmacies, as_of, cutoffs)
+    else:
+        # One join serves both steps: owner fields plus certification_date
+        print(f"\n[{now()}] Joining owner fields and certification dates by NPI...")
+        details = load_owners(set(pharmacies), OWNER_FIELDS + ['certification_date'])
+        enrich_status(pharmacies, as_of, cutoffs, details)
+        enrich_owner_info(pharmacies, stream_zip=args.stream_zip, owners=details)
+    report_status_transitions(pharmacies)
     write_output(pharmacies)
 
     print(f"\n[{now()}] Enrichment complete.")
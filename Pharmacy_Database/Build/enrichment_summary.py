@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Enrichment Summary Statistics
+==============================
+One-pass coverage metrics for the qualified pharmacy output.
+
+summarize() walks the records once, counting (state, estimated_status,
+has_owner) cells in a Counter, and rolls every reported metric up from
+those cells:
+  - totals and owner-name coverage
+  - per status: count, with_owner, owner coverage %
+  - per state: count, with_owner, and the same split by status
+
+write_summary() stores the result as JSON next to the CSV
+(qualified_..._summary.json), so enrichment quality can be charted across
+runs without re-reading the outputs.
+
+Usage:
+  from enrichment_summary import summarize, write_summary
+  summary = summarize(records)
+  write_summary(summary, output_csv)
+"""
+
+import json
+import os
+from collections import Counter
+from datetime import datetime
+
+from pharmacy_status import STATUS_ORDER
+
+
+def _pct(part, whole):
+    return round(part / whole * 100, 1) if whole else 0.0
+
+
+def _cell(count, with_owner):
+    return {'count': count, 'with_owner': with_owner, 'owner_pct': _pct(with_owner, count)}
+
+
+def summarize(records):
+    """Return a JSON-ready dict of status x owner presence x state metrics."""
+    cells = Counter(
+        (r.get('state', ''), r.get('estimated_status', ''), bool(r.get('owner_name', '').strip()))
+        for r in records
+    )
+
+    by_status = Counter()
+    by_status_owner = Counter()
+    by_state = {}
+    for (state, status, has_owner), count in cells.items():
+        by_status[status] += count
+        state_cells = by_state.setdefault(state, Counter())
+        state_cells[status] += count
+        if has_owner:
+            by_status_owner[status] += count
+            state_cells[status, 'owner'] += count
+
+    statuses = STATUS_ORDER + sorted(s for s in by_status if s not in STATUS_ORDER)
+    total = sum(by_status.values())
+    with_owner = sum(by_status_owner.values())
+
+    states = {}
+    for state in sorted(by_state):
+        state_cells = by_state[state]
+        state_statuses = [s for s in statuses if state_cells[s]]
+        state_total = sum(state_cells[s] for s in state_statuses)
+        state_owner = sum(state_cells[s, 'owner'] for s in state_statuses)
+        states[state] = {
+            **_cell(state_total, state_owner),
+            'by_status': {s: _cell(state_cells[s], state_cells[s, 'owner']) for s in state_statuses},
+        }
+
+    return {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        **_cell(total, with_owner),
+        'by_status': {s: _cell(by_status[s], by_status_owner[s]) for s in statuses},
+        'by_state': states,
+    }
+
+
+def summary_path(output_csv):
+    """qualified_x.csv -> qualified_x_summary.json"""
+    return os.path.splitext(output_csv)[0] + '_summary.json'
+
+
+def write_summary(summary, output_csv):
+    """Write `summary` as JSON next to `output_csv`; returns the path."""
+    path = summary_path(output_csv)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+        f.write('\n')
+    return path
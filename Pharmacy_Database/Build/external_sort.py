@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+External Sort CSV Writer
+=========================
+Bounded-memory sorted CSV output for the extraction pipeline.
+
+SortedCSVWriter accepts rows one at a time (like csv.DictWriter) and
+writes them to the output sorted by `key`. At most `buffer_rows` rows are
+held in memory: each full buffer is sorted and spilled to a run file in a
+temporary directory next to the output, and close() k-way merges the runs
+(heapq.merge) into the final CSV, at most MERGE_FAN_IN files at a time.
+If nothing was spilled the buffer is written directly.
+
+Both list.sort and heapq.merge are stable (merge favours earlier runs on
+ties), so the output is identical to sorting all rows in memory with the
+same key.
+
+Run files hold only `fieldnames` and are read back as strings, so `key`
+must depend on string-valued output columns only.
+
+Usage:
+  from external_sort import SortedCSVWriter
+  with SortedCSVWriter(path, fieldnames, key=lambda r: (r['state'], r['city'])) as w:
+      for row in rows:
+          w.writerow(row)
+"""
+
+import csv
+import heapq
+import os
+import shutil
+import tempfile
+
+
+DEFAULT_BUFFER_ROWS = 200_000
+# Max run files open in one merge; more runs are pre-merged in passes
+MERGE_FAN_IN = 64
+
+
+class SortedCSVWriter:
+    """csv.DictWriter-like writer whose output is sorted by `key`."""
+
+    def __init__(self, path, fieldnames, key, buffer_rows=DEFAULT_BUFFER_ROWS):
+        self.path = str(path)
+        self.fieldnames = list(fieldnames)
+        self.key = key
+        self.buffer_rows = max(1, buffer_rows)
+        self.rows = 0
+        self.spills = 0
+        self.runs = []
+        self._buffer = []
+        self._tmp_dir = None
+        self._run_seq = 0
+
+    def writerow(self, row):
+        self._buffer.append({name: row.get(name, '') for name in self.fieldnames})
+        self.rows += 1
+        if len(self._buffer) >= self.buffer_rows:
+            self._spill()
+
+    def writerows(self, rows):
+        for row in rows:
+            self.writerow(row)
+
+    def _new_run_path(self):
+        if self._tmp_dir is None:
+            self._tmp_dir = tempfile.mkdtemp(prefix='.sortruns_', dir=os.path.dirname(os.path.abspath(self.path)))
+        self._run_seq += 1
+        return os.path.join(self._tmp_dir, f'run_{self._run_seq:05d}.csv')
+
+    def _write_run(self, rows):
+        run_path = self._new_run_path()
+        with open(run_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+        return run_path
+
+    def _spill(self):
+        self._buffer.sort(key=self.key)
+        self.runs.append(self._write_run(self._buffer))
+        self.spills += 1
+        self._buffer = []
+
+    def _merged(self, run_paths):
+        return heapq.merge(*(self._iter_run(p) for p in run_paths), key=self.key)
+
+    def _reduce_runs(self):
+        """Pre-merge consecutive groups of runs until one merge can take them all.
+
+        Groups are consecutive, so ties still resolve in original order.
+        """
+        while len(self.runs) > MERGE_FAN_IN:
+            merged = []
+            for i in range(0, len(self.runs), MERGE_FAN_IN):
+                group = self.runs[i:i + MERGE_FAN_IN]
+                if len(group) == 1:
+                    merged.append(group[0])
+                    continue
+                merged.append(self._write_run(self._merged(group)))
+                for run_path in group:
+                    os.remove(run_path)
+            self.runs = merged
+
+    def _iter_run(self, run_path):
+        with open(run_path, 'r', newline='', encoding='utf-8') as f:
+            yield from csv.DictReader(f)
+
+    def close(self):
+        """Write the sorted output and remove the run files; returns the row count."""
+        try:
+            with open(self.path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+                writer.writeheader()
+                if not self.runs:
+                    self._buffer.sort(key=self.key)
+                    writer.writerows(self._buffer)
+                else:
+                    if self._buffer:
+                        self._spill()
+                    self._reduce_runs()
+                    writer.writerows(self._merged(self.runs))
+        finally:
+            self._buffer = []
+            self.discard()
+        return self.rows
+
+    def discard(self):
+        """Remove run files without writing output (used on error)."""
+        if self._tmp_dir is not None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
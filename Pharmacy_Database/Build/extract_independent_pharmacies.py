@@ -7,12 +7,31 @@ Taxonomy: 3336C0003X (Community/Retail Pharmacy)
 Entity Type: Type 2 (Organizations only)
 
 Methodology:
-1. Load full NPPES CSV (~9M records)
+1. Stream full NPPES CSV (~9M records) via nppes_scanner (column-projected)
 2. Filter to taxonomy code 3336C0003X (Community/Retail Pharmacy)
 3. Filter to Entity Type Code 2 (Organizations)
 4. Filter to active records only (NPI Deactivation Reason Code is blank)
-5. Exclude known chain pharmacy names via pattern matching
+5. Exclude known chain pharmacy names via pattern matching (RuleMatcher:
+   patterns indexed by literal prefix, one tokenization per name; the
+   rule that fired is written to the audit CSVs as matched_rule)
 6. Output: CSV with pharmacy name, NPI, address, city, state, zip, phone
+7. Side output: nppes_community_pharmacies.csv (every community pharmacy
+   row incl. Authorized Official fields) consumed by enrich_pharmacies.py
+8. Side output: nppes_pharmacy_snapshot.parquet, the same rows typed and
+   columnar (dates parsed, taxonomy list, classification); needs pyarrow
+9. Optional (--audit-taxonomies): pharmacies under LTC, specialty, mail
+   order and other 3336 codes go to other_taxonomy_pharmacies_audit.csv
+   with the taxonomy slot that matched; they never enter steps 5-8
+10. Side output: extraction_funnel.csv, per-state counts of rows dropped
+    at each filter (entity type, deactivated, taxonomy, territory, chain,
+    non-independent). Output and audit CSVs are written as rows are
+    classified through a spill-to-disk external sort (external_sort.py),
+    so memory stays flat however many rows pass the filters
+
+Incremental refresh (--delta): CMS publishes weekly incremental NPPES
+files in the same layout. Applying one updates the scan file by NPI
+(newer Last Update Date wins; deactivated or re-typed NPIs are removed)
+and re-derives the outputs without rescanning the full file.
 
 Chain Exclusion List:
 - National chains (CVS, Walgreens, Walmart, Rite Aid, etc.)
@@ -21,16 +40,36 @@ Chain Exclusion List:
 - Big box pharmacies (Costco, Target, etc.)
 - Mail order/specialty chains
 - Hospital/health system pharmacies (identified by naming patterns)
+
+Usage:
+  python3 extract_independent_pharmacies.py
+  python3 extract_independent_pharmacies.py --prefilter   # byte-level fast path
+  python3 extract_independent_pharmacies.py --prefilter --workers 8
+  python3 extract_independent_pharmacies.py --prefilter --stream-zip   # no extraction
+  python3 extract_independent_pharmacies.py --prefilter --audit-taxonomies
+  python3 extract_independent_pharmacies.py --delta NPPES_Data_Dissemination_Weekly.zip
 """
 
+import argparse
 import csv
 import re
 import os
 import sys
 import zipfile
-import glob
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
 from datetime import datetime
 
+from nppes_scanner import (
+    AUDIT_TAXONOMIES, COMMUNITY_TAXONOMY, PHARMACY_FIELDS, PREFILTERED_STATE, SCAN_DROP_REASONS, SCAN_FIELDS,
+    SCAN_FILENAME, TARGET_TAXONOMIES, find_nppes_csv, iter_range,
+    iter_updates, load_scan, open_nppes_source, open_nppes_zip, parse_nppes_date,
+    scan_pharmacies, split_ranges,
+)
+from external_sort import DEFAULT_BUFFER_ROWS, SortedCSVWriter
+from nppes_snapshot import open_writer as snapshot_writer
+
 # Known chain pharmacy patterns (case-insensitive)
 # These patterns match organization names that are NOT independent pharmacies
 CHAIN_PATTERNS = [
@@ -201,214 +240,408 @@ NON_INDEPENDENT_PATTERNS = [
     r'\bTELEPHARMACY\b',
 ]
 
-# Compile patterns for performance
-CHAIN_REGEX = [re.compile(p, re.IGNORECASE) for p in CHAIN_PATTERNS]
-NON_INDEP_REGEX = [re.compile(p, re.IGNORECASE) for p in NON_INDEPENDENT_PATTERNS]
+_WORD_RE = re.compile(r'\w+')
+_PREFIX_RE = re.compile(r'\\b([A-Za-z0-9]+)([?*{]?)')
+
+
+class RuleMatcher:
+    """Token-indexed matcher over an ordered list of name patterns.
+
+    Every pattern starts with \\b and a literal, so a match can only begin
+    at the start of a word whose text starts with that literal prefix.
+    Patterns are indexed by prefix; a name is split into words once and
+    only the patterns whose prefix starts one of its words are run. The
+    result is the first pattern in list order that matches, i.e. the rule
+    the old one-regex-at-a-time loop would have stopped on.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.regex = [re.compile(p, re.IGNORECASE) for p in self.patterns]
+        self.by_prefix = {}
+        self.always = []  # patterns without a usable literal prefix
+        for i, p in enumerate(self.patterns):
+            m = _PREFIX_RE.match(p)
+            prefix = m.group(1).upper() if m else ''
+            if m and m.group(2):
+                prefix = prefix[:-1]  # last char is optional (S?, \s*, ...)
+            if prefix:
+                self.by_prefix.setdefault(prefix, []).append(i)
+            else:
+                self.always.append(i)
+        self.prefix_lengths = sorted({len(k) for k in self.by_prefix})
+
+    def candidates(self, words):
+        """Indices of patterns that could match a name with these words."""
+        found = set(self.always)
+        for word in words:
+            n = len(word)
+            for length in self.prefix_lengths:
+                if length > n:
+                    break
+                hit = self.by_prefix.get(word[:length])
+                if hit:
+                    found.update(hit)
+        return sorted(found)
+
+    def first_match(self, name, words=None):
+        """Return the first pattern (in list order) matching name, or None."""
+        if not name or name.strip() == '<UNAVAIL>':
+            return None
+        if words is None:
+            words = name_words(name)
+        for i in self.candidates(words):
+            if self.regex[i].search(name):
+                return self.patterns[i]
+        return None
+
+
+def name_words(name):
+    """Uppercased word tokens of a name (shared by both matchers)."""
+    return _WORD_RE.findall(name.upper())
+
+
+CHAIN_MATCHER = RuleMatcher(CHAIN_PATTERNS)
+NON_INDEP_MATCHER = RuleMatcher(NON_INDEPENDENT_PATTERNS)
 
 
 def is_chain_pharmacy(org_name):
     """Return True if the organization name matches a known chain pattern."""
-    if not org_name or org_name.strip() == '<UNAVAIL>':
-        return False
-    for pattern in CHAIN_REGEX:
-        if pattern.search(org_name):
-            return True
-    return False
+    return CHAIN_MATCHER.first_match(org_name) is not None
 
 
 def is_non_independent(org_name):
     """Return True if the organization name indicates a non-independent pharmacy type."""
-    if not org_name or org_name.strip() == '<UNAVAIL>':
-        return False
-    for pattern in NON_INDEP_REGEX:
-        if pattern.search(org_name):
-            return True
-    return False
-
-
-def find_nppes_csv(extract_dir):
-    """Find the main NPPES CSV file in the extracted directory."""
-    patterns = [
-        os.path.join(extract_dir, 'npidata_pfile_*.csv'),
-        os.path.join(extract_dir, 'NPPES_Data_Dissemination_*', 'npidata_pfile_*.csv'),
+    return NON_INDEP_MATCHER.first_match(org_name) is not None
+
+
+# Filter 4: US states only (exclude territories, military, etc.)
+VALID_STATES = {
+    'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA',
+    'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MD',
+    'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ',
+    'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC',
+    'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY',
+    'DC',
+}
+
+
+def classify_pharmacy(pharmacy):
+    """Apply filters 4-6: 'territory', 'chain', 'non_independent' or 'independent'.
+
+    Rows matched on a non-community audit taxonomy (--audit-taxonomies)
+    are 'other_taxonomy' and never enter the community universe. Sets
+    pharmacy['matched_rule'] to the chain/non-independent pattern that
+    fired (blank otherwise) for the audit CSVs. Each name is tokenized
+    once and the tokens are shared by both matchers.
+    """
+    pharmacy['matched_rule'] = ''
+    if pharmacy.get('taxonomy_match', COMMUNITY_TAXONOMY) != COMMUNITY_TAXONOMY:
+        return 'other_taxonomy'
+    if pharmacy['state'] not in VALID_STATES:
+        return 'territory'
+
+    names = [(n, name_words(n)) for n in (pharmacy['legal_name'], pharmacy['dba_name']) if n]
+
+    # Filter 5: Chain pharmacies
+    for name, words in names:
+        rule = CHAIN_MATCHER.first_match(name, words)
+        if rule:
+            pharmacy['matched_rule'] = rule
+            return 'chain'
+
+    # Filter 6: Non-independent types (hospitals, govt, specialty, etc.)
+    for name, words in names:
+        rule = NON_INDEP_MATCHER.first_match(name, words)
+        if rule:
+            pharmacy['matched_rule'] = rule
+            return 'non_independent'
+
+    return 'independent'
+
+
+def _serial_stream(csv_path, counts, funnel, prefilter, zip_path=None, taxonomies=None):
+    """Yield (pharmacy, classification) from a single-process scan.
+
+    Reads `csv_path`, or the npidata member of `zip_path` when given.
+    """
+    if zip_path:
+        with open_nppes_zip(zip_path, binary=prefilter) as (member, f):
+            print(f"  Member: {member}")
+            for pharmacy in scan_pharmacies(f, counts, prefilter=prefilter, taxonomies=taxonomies, funnel=funnel):
+                yield pharmacy, classify_pharmacy(pharmacy)
+        return
+
+    if prefilter:
+        src = open(csv_path, 'rb')
+    else:
+        src = open(csv_path, 'r', newline='', encoding='utf-8', errors='replace')
+    with src as f:
+        for pharmacy in scan_pharmacies(f, counts, prefilter=prefilter, taxonomies=taxonomies, funnel=funnel):
+            yield pharmacy, classify_pharmacy(pharmacy)
+
+
+def _scan_chunk(task):
+    """Process-pool worker: scan and classify one byte range."""
+    csv_path, header, start, end, prefilter, taxonomies = task
+    lines = iter_range(csv_path, start, end, header)
+    if not prefilter:
+        lines = (line.decode('utf-8', errors='replace') for line in lines)
+    counts = {}
+    funnel = Counter()
+    results = [
+        (pharmacy, classify_pharmacy(pharmacy))
+        for pharmacy in scan_pharmacies(lines, counts, progress_every=0, prefilter=prefilter,
+                                        taxonomies=taxonomies, funnel=funnel)
     ]
-    for pattern in patterns:
-        matches = glob.glob(pattern)
-        if matches:
-            # Pick the largest file (skip _fileheader.csv variants)
-            matches.sort(key=lambda f: os.path.getsize(f), reverse=True)
-            return matches[0]
-    # Try any large CSV
-    for f in glob.glob(os.path.join(extract_dir, '**', '*.csv'), recursive=True):
-        size = os.path.getsize(f)
-        if size > 1_000_000_000:  # > 1GB = likely the main file
-            return f
-    return None
-
-
-def process_nppes(zip_path, output_dir):
-    """Extract and process NPPES data to identify independent pharmacies."""
+    return results, counts, funnel
+
+
+# Target byte size of one --workers chunk; bounds the results a chunk carries back
+PARALLEL_CHUNK_BYTES = 64 << 20
+
+
+def _parallel_stream(csv_path, counts, funnel, prefilter, workers, taxonomies=None):
+    """Yield (pharmacy, classification) from a process pool, in file order.
+
+    The CSV is split into record-aligned byte ranges of about
+    PARALLEL_CHUNK_BYTES (at least 4 per worker for load balance). Only
+    `workers` chunks are in flight at once and they are consumed in
+    submission order, so the parent holds at most `workers` chunks of
+    results however large the file is -- finished chunks cannot pile up
+    behind a slow earlier one.
+    """
+    n_chunks = max(workers * 4, os.path.getsize(csv_path) // PARALLEL_CHUNK_BYTES)
+    header, ranges = split_ranges(csv_path, n_chunks)
+    tasks = deque((csv_path, header, start, end, prefilter, taxonomies) for start, end in ranges)
+    n_tasks = len(tasks)
+    print(f"  Workers: {workers} ({n_tasks} chunks)")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque(pool.submit(_scan_chunk, tasks.popleft()) for _ in range(min(workers, n_tasks)))
+        for i in range(1, n_tasks + 1):
+            results, chunk_counts, chunk_funnel = pending.popleft().result()
+            if tasks:
+                pending.append(pool.submit(_scan_chunk, tasks.popleft()))
+            for key, value in chunk_counts.items():
+                counts[key] = counts.get(key, 0) + value
+            funnel.update(chunk_funnel)
+            print(f"  [{datetime.now().strftime('%H:%M:%S')}] Chunk {i}/{n_tasks} done "
+                  f"({counts['total_rows']:,} rows, {counts['pharmacy_rows']:,} community pharmacies)")
+            yield from results
+            del results
+
+
+def process_nppes(zip_path, output_dir, prefilter=False, workers=1, stream_zip=False,
+                  audit_taxonomies=False, buffer_rows=DEFAULT_BUFFER_ROWS):
+    """Extract and process NPPES data to identify independent pharmacies.
+
+    prefilter=True enables the scanner's byte-level fast path (records
+    lacking the 3336C0003X bytes are skipped before CSV parsing).
+    workers > 1 scans record-aligned byte ranges in a process pool; output
+    files are identical to the serial path.
+    stream_zip=True reads the npidata member directly from the ZIP and
+    never extracts it (serial only: chunking needs a seekable file).
+    audit_taxonomies=True also matches the AUDIT_TAXONOMIES codes (LTC,
+    specialty, ...) and writes those rows to other_taxonomy_pharmacies_audit.csv;
+    the community outputs are unchanged.
+    buffer_rows caps the rows each sorted output holds in memory before
+    spilling a run to disk (see external_sort.py).
+    """
 
     print(f"[{datetime.now().strftime('%H:%M:%S')}] Starting NPPES processing...")
     print(f"  Source: {zip_path}")
     print(f"  Output: {output_dir}")
 
-    extract_dir = os.path.join(output_dir, 'nppes_extracted')
-
-    # Step 1: Extract ZIP
-    if not os.path.exists(extract_dir):
-        print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Extracting ZIP file (~9GB when extracted)...")
-        os.makedirs(extract_dir, exist_ok=True)
-        with zipfile.ZipFile(zip_path, 'r') as zf:
-            # List contents
-            for info in zf.infolist():
-                print(f"  {info.filename} ({info.file_size / 1_000_000:.1f} MB)")
-            zf.extractall(extract_dir)
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] Extraction complete.")
-    else:
-        print(f"  Using previously extracted files in {extract_dir}")
-
-    # Step 2: Find the main CSV
-    csv_path = find_nppes_csv(extract_dir)
-    if not csv_path:
-        print("ERROR: Could not find NPPES CSV file!")
+    if stream_zip and workers > 1:
+        print("ERROR: --workers needs the extracted CSV (byte-range seeks); drop --stream-zip.")
         sys.exit(1)
-    print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Processing: {os.path.basename(csv_path)}")
-    print(f"  File size: {os.path.getsize(csv_path) / 1_000_000_000:.2f} GB")
-
-    # Step 3: Stream through the CSV, filtering for community/retail pharmacies
-    # Key columns we need (by header name):
-    # - NPI
-    # - Entity Type Code (2 = Organization)
-    # - Provider Organization Name (Legal Business Name)
-    # - Provider Other Organization Name
-    # - Provider First Line Business Practice Location Address
-    # - Provider Second Line Business Practice Location Address
-    # - Provider Business Practice Location Address City Name
-    # - Provider Business Practice Location Address State Name
-    # - Provider Business Practice Location Address Postal Code
-    # - Provider Business Practice Location Address Telephone Number
-    # - Healthcare Provider Taxonomy Code_1 (and _2 through _15)
-    # - NPI Deactivation Reason Code (blank = active)
-
-    chain_pharmacies = []
-    non_independent_pharmacies = []
-    independent_pharmacies = []
-
-    total_rows = 0
-    pharmacy_rows = 0
-
-    with open(csv_path, 'r', encoding='utf-8', errors='replace') as f:
-        reader = csv.DictReader(f)
-
-        for row in reader:
-            total_rows += 1
-
-            if total_rows % 500000 == 0:
-                print(f"  [{datetime.now().strftime('%H:%M:%S')}] Processed {total_rows:,} rows... "
-                      f"(found {pharmacy_rows:,} community pharmacies so far)")
-
-            # Filter 1: Organizations only (Entity Type Code = 2)
-            if row.get('Entity Type Code', '') != '2':
-                continue
-
-            # Filter 2: Active only (no deactivation reason)
-            if row.get('NPI Deactivation Reason Code', '').strip():
-                continue
-
-            # Filter 3: Has community/retail pharmacy taxonomy
-            is_community_pharmacy = False
-            for i in range(1, 16):
-                tax_col = f'Healthcare Provider Taxonomy Code_{i}'
-                if row.get(tax_col, '') == '3336C0003X':
-                    is_community_pharmacy = True
-                    break
-
-            if not is_community_pharmacy:
-                continue
-
-            pharmacy_rows += 1
-
-            # Extract location address
-            org_name = row.get('Provider Organization Name (Legal Business Name)', '').strip()
-            other_name = row.get('Provider Other Organization Name', '').strip()
-            # Use DBA name if available and not <UNAVAIL>, otherwise legal name
-            if other_name and other_name != '<UNAVAIL>':
-                display_name = other_name
-            else:
-                display_name = org_name
-                other_name = ''  # Clean up <UNAVAIL>
-
-            pharmacy = {
-                'npi': row.get('NPI', '').strip(),
-                'legal_name': org_name,
-                'dba_name': other_name,
-                'display_name': display_name,
-                'address_1': row.get('Provider First Line Business Practice Location Address', '').strip(),
-                'address_2': row.get('Provider Second Line Business Practice Location Address', '').strip(),
-                'city': row.get('Provider Business Practice Location Address City Name', '').strip(),
-                'state': row.get('Provider Business Practice Location Address State Name', '').strip(),
-                'zip': row.get('Provider Business Practice Location Address Postal Code', '').strip()[:5],
-                'phone': row.get('Provider Business Practice Location Address Telephone Number', '').strip(),
-                'enumeration_date': row.get('Provider Enumeration Date', '').strip(),
-                'last_updated': row.get('Last Update Date', '').strip(),
-            }
-
-            # Filter 4: US states only (exclude territories, military, etc.)
-            valid_states = {
-                'AL', 'AK', 'AZ', 'AR', 'CA', 'CO', 'CT', 'DE', 'FL', 'GA',
-                'HI', 'ID', 'IL', 'IN', 'IA', 'KS', 'KY', 'LA', 'ME', 'MD',
-                'MA', 'MI', 'MN', 'MS', 'MO', 'MT', 'NE', 'NV', 'NH', 'NJ',
-                'NM', 'NY', 'NC', 'ND', 'OH', 'OK', 'OR', 'PA', 'RI', 'SC',
-                'SD', 'TN', 'TX', 'UT', 'VT', 'VA', 'WA', 'WV', 'WI', 'WY',
-                'DC',
-            }
-            if pharmacy['state'] not in valid_states:
-                continue
 
-            # Filter 5: Chain pharmacies
-            if is_chain_pharmacy(org_name) or is_chain_pharmacy(other_name):
-                chain_pharmacies.append(pharmacy)
-                continue
-
-            # Filter 6: Non-independent types (hospitals, govt, specialty, etc.)
-            if is_non_independent(org_name) or is_non_independent(other_name):
-                non_independent_pharmacies.append(pharmacy)
-                continue
+    if stream_zip:
+        # Steps 1-2: no extraction; the member is located inside the archive
+        csv_path = None
+        print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Streaming directly from {os.path.basename(zip_path)}")
+    else:
+        extract_dir = os.path.join(output_dir, 'nppes_extracted')
+
+        # Step 1: Extract ZIP
+        if not os.path.exists(extract_dir):
+            print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Extracting ZIP file (~9GB when extracted)...")
+            os.makedirs(extract_dir, exist_ok=True)
+            with zipfile.ZipFile(zip_path, 'r') as zf:
+                # List contents
+                for info in zf.infolist():
+                    print(f"  {info.filename} ({info.file_size / 1_000_000:.1f} MB)")
+                zf.extractall(extract_dir)
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Extraction complete.")
+        else:
+            print(f"  Using previously extracted files in {extract_dir}")
+
+        # Step 2: Find the main CSV
+        csv_path = find_nppes_csv(extract_dir)
+        if not csv_path:
+            print("ERROR: Could not find NPPES CSV file!")
+            sys.exit(1)
+        print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Processing: {os.path.basename(csv_path)}")
+        print(f"  File size: {os.path.getsize(csv_path) / 1_000_000_000:.2f} GB")
+
+    # Step 3: Stream through the CSV, filtering for community/retail pharmacies.
+    # nppes_scanner projects only the columns we use (location, dates,
+    # deactivation, taxonomy slots, Authorized Official) by header index and
+    # applies the entity type / active / taxonomy filters. Every community
+    # pharmacy row (with owner fields) is persisted to SCAN_FILENAME so
+    # enrich_pharmacies.py does not need a second pass over NPPES.
+
+    counts = {'total_rows': 0, 'pharmacy_rows': 0, 'other_taxonomy_rows': 0}
+    funnel = Counter()
+
+    taxonomies = TARGET_TAXONOMIES
+    if audit_taxonomies:
+        taxonomies = {**TARGET_TAXONOMIES, **AUDIT_TAXONOMIES}
+        print(f"  Audit taxonomies: {', '.join(AUDIT_TAXONOMIES.values())}")
+    if prefilter:
+        print("  Byte-level taxonomy prefilter: on")
+    if workers > 1:
+        stream = _parallel_stream(csv_path, counts, funnel, prefilter, workers, taxonomies)
+    else:
+        stream = _serial_stream(csv_path, counts, funnel, prefilter,
+                                zip_path if stream_zip else None, taxonomies)
 
-            independent_pharmacies.append(pharmacy)
+    # Both paths yield (pharmacy, classification) in file order, so the
+    # outputs are identical either way.
+    print()
+    write_classified(stream, output_dir, funnel, audit_taxonomies, buffer_rows)
+    classified = reason_totals(funnel)
 
     print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Processing complete!")
-    print(f"  Total NPI records scanned: {total_rows:,}")
-    print(f"  Community/Retail Pharmacies (US, active): {pharmacy_rows:,}")
-    print(f"  Identified as chain: {len(chain_pharmacies):,}")
-    print(f"  Identified as non-independent (hospital/govt/specialty/etc): {len(non_independent_pharmacies):,}")
-    print(f"  Identified as independent: {len(independent_pharmacies):,}")
-
-    # Step 4: Write output files
-
-    # Independent pharmacies CSV
-    indep_path = os.path.join(output_dir, 'independent_pharmacies_usa_feb2026.csv')
-    fieldnames = ['npi', 'display_name', 'legal_name', 'dba_name',
-                  'address_1', 'address_2', 'city', 'state', 'zip', 'phone',
-                  'enumeration_date', 'last_updated']
-
-    # Sort by state, then city, then name
-    independent_pharmacies.sort(key=lambda x: (x['state'], x['city'], x['display_name']))
-
-    with open(indep_path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(independent_pharmacies)
+    print(f"  Total NPI records scanned: {counts['total_rows']:,}")
+    print(f"  Community/Retail Pharmacies (US, active): {counts['pharmacy_rows']:,}")
+    print(f"  Identified as chain: {classified['chain']:,}")
+    print(f"  Identified as non-independent (hospital/govt/specialty/etc): {classified['non_independent']:,}")
+    print(f"  Identified as independent: {classified['independent']:,}")
+
+    write_funnel(output_dir, funnel)
+    return write_outputs(output_dir, funnel)
+
+
+INDEPENDENT_FILENAME = 'independent_pharmacies_usa_feb2026.csv'
+
+# classification -> (output CSV, columns beyond PHARMACY_FIELDS, sort key)
+OUTPUT_FILES = {
+    'independent': (INDEPENDENT_FILENAME, [],
+                    lambda x: (x['state'], x['city'], x['display_name'])),
+    'chain': ('chain_pharmacies_excluded.csv', ['matched_rule'],
+              lambda x: (x['state'], x['display_name'])),
+    'non_independent': ('non_independent_excluded.csv', ['matched_rule'],
+                        lambda x: (x['state'], x['display_name'])),
+    'other_taxonomy': ('other_taxonomy_pharmacies_audit.csv',
+                       ['taxonomy_match', 'taxonomy_label', 'taxonomy_slot', 'taxonomy_codes'],
+                       lambda x: (x['taxonomy_label'], x['state'], x['display_name'])),
+}
+
+# Funnel columns, in filter order: scanner drops, then classify_pharmacy()
+FUNNEL_REASONS = SCAN_DROP_REASONS + ['other_taxonomy', 'territory', 'chain', 'non_independent', 'independent']
+
+
+def write_classified(stream, output_dir, funnel, audit_taxonomies=False, buffer_rows=DEFAULT_BUFFER_ROWS):
+    """Consume (pharmacy, classification) pairs in a single pass.
+
+    Community rows go to the scan file and the snapshot. Independent,
+    chain, non-independent and (with audit_taxonomies) other-taxonomy rows
+    go to their CSVs through SortedCSVWriter as they arrive: at most
+    `buffer_rows` rows per output are held in memory, the rest spill to
+    sorted run files that are merged on close. Every row is counted in
+    `funnel` under (state, classification).
+    """
+    classes = [c for c in OUTPUT_FILES if audit_taxonomies or c != 'other_taxonomy']
+    scan_path = os.path.join(output_dir, SCAN_FILENAME)
+
+    with ExitStack() as stack:
+        # Closed (or, on error, discarded with its .tmp file) by the stack
+        snapshot = snapshot_writer(output_dir)
+        if snapshot:
+            stack.enter_context(snapshot)
+        scan_f = stack.enter_context(open(scan_path, 'w', newline='', encoding='utf-8'))
+        scan_writer = csv.DictWriter(scan_f, fieldnames=SCAN_FIELDS, extrasaction='ignore')
+        scan_writer.writeheader()
+
+        writers = {}
+        for classification in classes:
+            filename, extra, key = OUTPUT_FILES[classification]
+            writers[classification] = stack.enter_context(SortedCSVWriter(
+                os.path.join(output_dir, filename), PHARMACY_FIELDS + extra, key, buffer_rows))
+
+        for pharmacy, classification in stream:
+            funnel[pharmacy['state'], classification] += 1
+            if classification in writers:
+                writers[classification].writerow(pharmacy)
+            if classification == 'other_taxonomy':
+                continue
+            scan_writer.writerow(pharmacy)
+            if snapshot:
+                snapshot.write(pharmacy, classification)
+
+    print(f"  Scan file (all community pharmacies + owner fields): {scan_path}")
+    if snapshot:
+        print(f"  Columnar snapshot: {snapshot.path} ({snapshot.rows:,} rows)")
+    for classification, writer in writers.items():
+        spilled = f", {writer.spills} sort runs" if writer.spills else ''
+        print(f"  {classification}: {writer.path} ({writer.rows:,} rows{spilled})")
+
+
+def reason_totals(funnel):
+    """Collapse a (state, reason) funnel to reason -> count."""
+    totals = dict.fromkeys(FUNNEL_REASONS, 0)
+    for (_, reason), count in funnel.items():
+        totals[reason] = totals.get(reason, 0) + count
+    return totals
+
+
+def write_funnel(output_dir, funnel):
+    """Write extraction_funnel.csv: rows per state at each filter.
+
+    A blank state holds malformed rows. With --prefilter, records the byte
+    prefilter rejected are never parsed and all land in one
+    '(prefiltered)' row under taxonomy, so the per-state entity_type,
+    deactivated and taxonomy columns count only records carrying a target
+    code and are not comparable with a run without --prefilter (the TOTAL
+    row and the later columns are).
+    """
+    path = os.path.join(output_dir, 'extraction_funnel.csv')
+    states = sorted({state for state, _ in funnel})
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['state'] + FUNNEL_REASONS + ['total'])
+        for st in states:
+            row = [funnel[st, reason] for reason in FUNNEL_REASONS]
+            writer.writerow([st] + row + [sum(row)])
+        totals = reason_totals(funnel)
+        writer.writerow(['TOTAL'] + [totals[reason] for reason in FUNNEL_REASONS] + [sum(totals.values())])
+
+    print(f"\n  Extraction funnel: {path}")
+    if funnel[PREFILTERED_STATE, 'taxonomy']:
+        print(f"    WARNING: {funnel[PREFILTERED_STATE, 'taxonomy']:,} records rejected by the byte prefilter are "
+              f"counted under state {PREFILTERED_STATE}; per-state entity_type/deactivated/taxonomy "
+              f"counts exclude them (run without --prefilter for the full per-state funnel)")
+    for reason in FUNNEL_REASONS:
+        if totals[reason]:
+            print(f"    {reason}: {totals[reason]:,}")
+    return path
+
+
+def write_outputs(output_dir, funnel):
+    """Step 4: report the independent CSV and write the state summary.
+
+    The independent CSV itself is written (sorted by state, city, name) by
+    write_classified; per-state counts come from the funnel.
+    """
+    indep_path = os.path.join(output_dir, INDEPENDENT_FILENAME)
+    state_counts = {state: count for (state, reason), count in funnel.items()
+                    if reason == 'independent' and count}
+    total = sum(state_counts.values())
 
     print(f"\n  Output: {indep_path}")
-    print(f"  Records: {len(independent_pharmacies):,}")
-
-    # State summary
-    state_counts = {}
-    for p in independent_pharmacies:
-        st = p['state']
-        state_counts[st] = state_counts.get(st, 0) + 1
+    print(f"  Records: {total:,}")
 
     summary_path = os.path.join(output_dir, 'state_summary.csv')
     with open(summary_path, 'w', newline='') as f:
@@ -422,37 +655,97 @@ def process_nppes(zip_path, output_dir):
     for st, count in sorted(state_counts.items(), key=lambda x: -x[1])[:10]:
         print(f"    {st}: {count:,}")
 
-    # Chain pharmacies (for reference/audit)
-    chain_path = os.path.join(output_dir, 'chain_pharmacies_excluded.csv')
-    chain_pharmacies.sort(key=lambda x: (x['state'], x['display_name']))
-    with open(chain_path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(chain_pharmacies)
+    return indep_path, total
+
 
-    print(f"\n  Chain exclusions: {chain_path}")
-    print(f"  Chain records: {len(chain_pharmacies):,}")
+def apply_nppes_delta(delta_path, output_dir, buffer_rows=DEFAULT_BUFFER_ROWS):
+    """Refresh a previous run from an NPPES weekly/monthly incremental file.
 
-    # Non-independent pharmacies (for reference/audit)
-    non_indep_path = os.path.join(output_dir, 'non_independent_excluded.csv')
-    non_independent_pharmacies.sort(key=lambda x: (x['state'], x['display_name']))
-    with open(non_indep_path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(non_independent_pharmacies)
+    The previous run's scan file (every community pharmacy with owner
+    fields) is the universe, keyed by NPI. Each delta row newer than what
+    we hold either replaces the row, adds a new pharmacy, or removes the
+    NPI (deactivated, or no longer a Type 2 community pharmacy). The
+    outputs are then re-derived by re-running filters 4-6 over the
+    universe, which is ~70K rows instead of a 9M-row scan.
+    """
+    scan_path = os.path.join(output_dir, SCAN_FILENAME)
+    if not os.path.exists(scan_path):
+        print(f"ERROR: {scan_path} not found. Run a full extraction first.")
+        sys.exit(1)
 
-    print(f"\n  Non-independent exclusions: {non_indep_path}")
-    print(f"  Non-independent records: {len(non_independent_pharmacies):,}")
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Applying NPPES delta...")
+    print(f"  Delta: {delta_path}")
+    universe = load_scan(scan_path)
+    print(f"  Previous universe: {len(universe):,} community pharmacies")
+
+    changes = {'added': 0, 'updated': 0, 'deactivated': 0, 'dropped': 0, 'stale': 0, 'ignored': 0}
+    with open_nppes_source(delta_path) as (name, f):
+        print(f"  Reading {name}")
+        for npi, effective, status, pharmacy in iter_updates(f):
+            prior = universe.get(npi)
+            if prior is None:
+                if status == 'active':
+                    universe[npi] = pharmacy
+                    changes['added'] += 1
+                else:
+                    changes['ignored'] += 1
+                continue
 
-    return indep_path, len(independent_pharmacies)
+            held = parse_nppes_date(prior.get('last_updated', ''))
+            if effective and held and effective < held:
+                changes['stale'] += 1
+                continue
+
+            if status == 'active':
+                universe[npi] = pharmacy
+                changes['updated'] += 1
+            else:
+                del universe[npi]
+                changes['deactivated' if status == 'deactivated' else 'dropped'] += 1
+
+    for key, count in changes.items():
+        print(f"  {key.capitalize()}: {count:,}")
+
+    print(f"  Updated universe: {len(universe):,} community pharmacies\n")
+
+    # Only filters 4-6 run here, so the funnel has no scanner drop counts
+    funnel = Counter()
+    stream = ((pharmacy, classify_pharmacy(pharmacy)) for pharmacy in universe.values())
+    write_classified(stream, output_dir, funnel, buffer_rows=buffer_rows)
+    write_funnel(output_dir, funnel)
+    return write_outputs(output_dir, funnel)
 
 
 if __name__ == '__main__':
-    base_dir = '/Users/matthewscott/Desktop/RetailMyMeds/Pharmacy_Database'
+    parser = argparse.ArgumentParser(description='Extract independent pharmacies from NPPES')
+    parser.add_argument('--base-dir', default='/Users/matthewscott/Desktop/RetailMyMeds/Pharmacy_Database',
+                        help='Directory holding nppes_feb2026.zip; outputs are written here')
+    parser.add_argument('--prefilter', action='store_true',
+                        help='Skip records lacking the 3336C0003X bytes before CSV parsing')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Scan the extracted CSV in N processes (default: 1, serial)')
+    parser.add_argument('--stream-zip', action='store_true',
+                        help='Read npidata straight from the ZIP instead of extracting it')
+    parser.add_argument('--audit-taxonomies', action='store_true',
+                        help='Also capture LTC/specialty/other pharmacy taxonomies to an audit CSV')
+    parser.add_argument('--sort-buffer-rows', type=int, default=DEFAULT_BUFFER_ROWS,
+                        help='Rows held in memory per sorted output before spilling to disk')
+    parser.add_argument('--delta', default=None,
+                        help='Apply an NPPES weekly/monthly incremental file (ZIP or CSV) to the previous run')
+    args = parser.parse_args()
+
+    base_dir = args.base_dir
+
+    if args.delta:
+        apply_nppes_delta(args.delta, base_dir, buffer_rows=args.sort_buffer_rows)
+        sys.exit(0)
+
     zip_path = os.path.join(base_dir, 'nppes_feb2026.zip')
 
     if not os.path.exists(zip_path):
         print(f"ERROR: {zip_path} not found. Download it first.")
         sys.exit(1)
 
-    process_nppes(zip_path, base_dir)
+    process_nppes(zip_path, base_dir, prefilter=args.prefilter, workers=args.workers,
+                  stream_zip=args.stream_zip, audit_taxonomies=args.audit_taxonomies,
+                  buffer_rows=args.sort_buffer_rows)
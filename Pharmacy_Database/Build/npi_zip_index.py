@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+NPI Practice-ZIP Index
+=======================
+Persisted NPI -> practice-location ZIP5 / state index over the whole
+NPPES file (every entity type, active or deactivated), so Part D
+prescribers are placed at their own practice ZIP by an NPI join instead
+of a city-name guess (download_partd_prescribers.py).
+
+Building the index is one projected pass over NPPES (~9M rows; the ZIP
+member is streamed, see nppes_scanner.open_nppes_source). It is written
+as Parquet (npi, zip5, state) with the source file's name, size and
+mtime in the schema metadata. Lookups read it memory-mapped and hash-join
+the wanted NPIs (pyarrow.compute.is_in), so NPPES is rescanned only when
+the dissemination file changes. Without pyarrow the index is a CSV of
+the same columns, streamed against the NPI set.
+
+Usage:
+  python3 npi_zip_index.py ../nppes_feb2026.zip
+  python3 npi_zip_index.py ../nppes_feb2026.zip --index /tmp/npi_zip.parquet
+
+  from npi_zip_index import ensure_index, lookup_zips
+  index = ensure_index(nppes_path, index_path)
+  zips = lookup_zips(index, npis)          # npi -> (zip5, state)
+
+Dependencies: pyarrow (optional; without it the index is a CSV)
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+from nppes_scanner import COLUMNS, now, open_nppes_source
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pc = None
+    pq = None
+
+
+INDEX_FILENAME = 'nppes_npi_zip_index.parquet'
+INDEX_FIELDS = ['npi', 'zip5', 'state']
+INDEX_VERSION = '1'
+
+
+def available() -> bool:
+    """True if pyarrow is installed (Parquet index)."""
+    return pa is not None
+
+
+def _csv_path(index_path) -> str:
+    return os.path.splitext(str(index_path))[0] + '.csv'
+
+
+def source_key(nppes_path) -> dict:
+    """Identity of an NPPES file as stored in the index metadata."""
+    st = os.stat(nppes_path)
+    return {
+        'version': INDEX_VERSION, 'source': os.path.basename(nppes_path),
+        'size': st.st_size, 'mtime': int(st.st_mtime),
+    }
+
+
+def iter_npi_zips(f, progress_every=1_000_000):
+    """(npi, zip5, state) for every NPPES row with a 5-digit practice ZIP."""
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    pos = {name.strip(): i for i, name in enumerate(header)}
+    missing = [COLUMNS[k] for k in ('npi', 'zip', 'state') if COLUMNS[k] not in pos]
+    if missing:
+        raise ValueError(f"NPPES header missing columns: {missing}")
+    npi_i, zip_i, state_i = pos[COLUMNS['npi']], pos[COLUMNS['zip']], pos[COLUMNS['state']]
+    width = max(npi_i, zip_i, state_i)
+
+    for n, row in enumerate(reader, 1):
+        if progress_every and n % progress_every == 0:
+            print(f"  [{now()}] Indexed {n:,} rows...", flush=True)
+        if len(row) <= width:
+            continue
+        zip5 = row[zip_i].strip()[:5]
+        if len(zip5) == 5 and zip5.isdigit():
+            yield row[npi_i].strip(), zip5, row[state_i].strip().upper()
+
+
+def build_index(nppes_path, index_path, batch_rows: int = 500_000) -> str:
+    """Scan NPPES once and write the index (atomically); returns the file written."""
+    meta = source_key(nppes_path)
+    print(f"[{now()}] Building NPI -> practice ZIP index from {os.path.basename(nppes_path)}...")
+    rows = 0
+    with open_nppes_source(nppes_path) as (_name, f):
+        if available():
+            path = str(index_path)
+            schema = pa.schema([pa.field(name, pa.string()) for name in INDEX_FIELDS])
+            schema = schema.with_metadata({'npi_zip_index': json.dumps(meta)})
+            tmp = path + '.tmp'
+            with pq.ParquetWriter(tmp, schema, compression='zstd') as writer:
+                batch = []
+                for record in iter_npi_zips(f):
+                    batch.append(record)
+                    if len(batch) >= batch_rows:
+                        writer.write_batch(pa.record_batch(list(map(list, zip(*batch))), schema=schema))
+                        rows += len(batch)
+                        batch = []
+                if batch:
+                    writer.write_batch(pa.record_batch(list(map(list, zip(*batch))), schema=schema))
+                    rows += len(batch)
+        else:
+            path = _csv_path(index_path)
+            tmp = path + '.tmp'
+            with open(tmp, 'w', newline='', encoding='utf-8') as out:
+                writer = csv.writer(out)
+                writer.writerow(INDEX_FIELDS)
+                for record in iter_npi_zips(f):
+                    writer.writerow(record)
+                    rows += 1
+            with open(path + '.meta.json', 'w', encoding='utf-8') as mf:
+                json.dump(meta, mf, indent=2)
+    os.replace(tmp, path)
+    print(f"  [{now()}] Indexed {rows:,} NPIs -> {path}")
+    return path
+
+
+def read_meta(index_path) -> tuple[dict | None, str]:
+    """(metadata, file) of an existing index, preferring Parquet; (None, '') if none."""
+    path = str(index_path)
+    if available() and os.path.exists(path):
+        raw = pq.read_schema(path).metadata or {}
+        return json.loads(raw.get(b'npi_zip_index', b'{}')), path
+    csv_path = _csv_path(path)
+    if os.path.exists(csv_path) and os.path.exists(csv_path + '.meta.json'):
+        with open(csv_path + '.meta.json', 'r', encoding='utf-8') as f:
+            return json.load(f), csv_path
+    return None, ''
+
+
+def ensure_index(nppes_path, index_path) -> str | None:
+    """Index file for `nppes_path`, building it if missing or stale.
+
+    If the NPPES file is absent an existing index is used as is; returns
+    None when there is neither.
+    """
+    meta, path = read_meta(index_path)
+    if not nppes_path or not os.path.exists(nppes_path):
+        if meta:
+            print(f"  NOTE: NPPES file not found; using existing index {os.path.basename(path)} "
+                  f"(built from {meta.get('source')})")
+            return path
+        return None
+    if meta == source_key(nppes_path):
+        return path
+    if meta:
+        print(f"  NOTE: {os.path.basename(path)} was built from {meta.get('source')}; rebuilding")
+    return build_index(nppes_path, index_path)
+
+
+def lookup_zips(index_path, npis) -> dict[str, tuple[str, str]]:
+    """NPI -> (zip5, state) for the NPIs in `npis` found in the index."""
+    index_path = str(index_path)
+    if index_path.endswith('.parquet'):
+        table = pq.read_table(index_path, memory_map=True)
+        wanted = pa.array(sorted(npis), type=pa.string())
+        columns = table.filter(pc.is_in(table['npi'], value_set=wanted)).to_pydict()
+        return dict(zip(columns['npi'], zip(columns['zip5'], columns['state'])))
+
+    npis = set(npis)
+    found = {}
+    with open(index_path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for npi, zip5, state in reader:
+            if npi in npis:
+                found[npi] = (zip5, state)
+    return found
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Build the NPPES NPI -> practice ZIP index')
+    parser.add_argument('nppes', help='NPPES dissemination ZIP or npidata CSV')
+    parser.add_argument('--index', default=None,
+                        help=f'Index path (default: {INDEX_FILENAME} next to the NPPES file)')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if the index is current')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.nppes):
+        print(f"ERROR: NPPES file not found: {args.nppes}")
+        sys.exit(1)
+    index = args.index or os.path.join(os.path.dirname(os.path.abspath(args.nppes)), INDEX_FILENAME)
+    if args.force:
+        build_index(args.nppes, index)
+    else:
+        print(f"Index: {ensure_index(args.nppes, index)}")
+
+
+if __name__ == '__main__':
+    main()
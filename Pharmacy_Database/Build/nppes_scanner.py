@@ -0,0 +1,571 @@
+#!/usr/bin/env python3
+"""
+NPPES Scanner
+==============
+Single-pass, column-projected reader for the NPPES npidata_pfile CSV.
+
+The dissemination file has ~330 columns and ~9M rows. Both the extractor
+(extract_independent_pharmacies.py) and the owner enrichment
+(enrich_pharmacies.py) need the same ~30 of them, so this module resolves
+those columns to header indices once and walks the file with csv.reader,
+never building a 330-key dict per row.
+
+Each emitted pharmacy row carries the location fields used by the
+extractor plus the Authorized Official (owner) fields used by enrichment.
+The extractor persists every community pharmacy row it sees to
+SCAN_FILENAME, and enrichment joins against that file instead of scanning
+NPPES a second time.
+
+Fast path (prefilter=True) reads the file as bytes and drops every record
+that does not contain the literal taxonomy code before decoding or CSV
+parsing; quoted multi-line records are reassembled first so the result is
+identical to the full parse. See bench_nppes_prefilter.py for throughput.
+
+Taxonomy matching resolves the 15 taxonomy slot columns once from the
+header and tests each slot against a code -> priority dict, so the target
+set (TARGET_TAXONOMIES, optionally AUDIT_TAXONOMIES for LTC/specialty/etc.)
+can grow without adding per-row work. Rows record the slot that matched.
+
+iter_updates() reads the CMS weekly/monthly incremental files (same
+layout) and reports each NPI as active, deactivated or no longer a
+community pharmacy, for refreshing a previous run without a full scan.
+
+open_nppes_zip() streams the npidata member directly out of the
+dissemination ZIP, so a fresh run needs neither the ~9GB extraction nor
+the disk space for it.
+
+Usage:
+  from nppes_scanner import find_nppes_csv, scan_pharmacies
+  with open(csv_path, newline='', encoding='utf-8', errors='replace') as f:
+      for pharmacy in scan_pharmacies(f):
+          ...
+  with open(csv_path, 'rb') as fb:
+      for pharmacy in scan_pharmacies(fb, prefilter=True):
+          ...
+  with open_nppes_zip(zip_path) as (member, f):
+      for pharmacy in scan_pharmacies(f):
+          ...
+"""
+
+import csv
+import fnmatch
+import glob
+import io
+import os
+import re
+import zipfile
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime
+
+
+# --- Configuration ---
+
+COMMUNITY_TAXONOMY = '3336C0003X'  # Community/Retail Pharmacy
+
+# Target taxonomy code -> label, in priority order: a row carrying several
+# targets is matched to the earliest one here, whatever slot it sits in.
+TARGET_TAXONOMIES = {COMMUNITY_TAXONOMY: 'community'}
+
+# Other pharmacy taxonomies worth keeping for audit (not part of the
+# community universe). Pass TARGET_TAXONOMIES | AUDIT_TAXONOMIES to
+# scan_pharmacies to emit them too.
+AUDIT_TAXONOMIES = {
+    '3336L0003X': 'long_term_care',
+    '3336S0011X': 'specialty',
+    '3336C0004X': 'compounding',
+    '3336H0001X': 'home_infusion',
+    '3336M0002X': 'mail_order',
+    '3336C0002X': 'clinic',
+    '3336I0012X': 'institutional',
+    '3336N0007X': 'nuclear',
+    '3336M0003X': 'managed_care',
+}
+
+# Written by the extractor, read by enrichment (same directory as the ZIP)
+SCAN_FILENAME = 'nppes_community_pharmacies.csv'
+
+# Output field -> NPPES header name
+COLUMNS = {
+    'npi': 'NPI',
+    'entity_type': 'Entity Type Code',
+    'legal_name': 'Provider Organization Name (Legal Business Name)',
+    'other_name': 'Provider Other Organization Name',
+    'address_1': 'Provider First Line Business Practice Location Address',
+    'address_2': 'Provider Second Line Business Practice Location Address',
+    'city': 'Provider Business Practice Location Address City Name',
+    'state': 'Provider Business Practice Location Address State Name',
+    'zip': 'Provider Business Practice Location Address Postal Code',
+    'phone': 'Provider Business Practice Location Address Telephone Number',
+    'enumeration_date': 'Provider Enumeration Date',
+    'last_updated': 'Last Update Date',
+    'certification_date': 'Certification Date',
+    'deactivation_code': 'NPI Deactivation Reason Code',
+    'deactivation_date': 'NPI Deactivation Date',
+    'owner_first': 'Authorized Official First Name',
+    'owner_last': 'Authorized Official Last Name',
+    'owner_title': 'Authorized Official Title or Position',
+    'owner_phone': 'Authorized Official Telephone Number',
+}
+
+TAXONOMY_COLUMNS = [
+    f'Healthcare Provider Taxonomy Code_{i}' for i in range(1, 16)
+]
+
+# Fields on every emitted pharmacy row
+PHARMACY_FIELDS = [
+    'npi', 'display_name', 'legal_name', 'dba_name',
+    'address_1', 'address_2', 'city', 'state', 'zip', 'phone',
+    'enumeration_date', 'last_updated',
+]
+OWNER_FIELDS = ['owner_name', 'owner_title', 'owner_phone']
+# Carried in the scan file / snapshot only (not in the extractor CSVs).
+# taxonomy_codes is the ';'-joined list of non-blank taxonomy slots.
+DETAIL_FIELDS = ['certification_date', 'taxonomy_codes', 'owner_first', 'owner_last']
+SCAN_FIELDS = PHARMACY_FIELDS + OWNER_FIELDS + DETAIL_FIELDS
+
+# Funnel reasons recorded by scan_pharmacies, in filter order
+SCAN_DROP_REASONS = ['malformed', 'entity_type', 'deactivated', 'taxonomy']
+# Funnel state for records the byte prefilter rejected unparsed (state unknown)
+PREFILTERED_STATE = '(prefiltered)'
+
+# A record starts at a newline followed by a (quoted) 10-digit NPI field.
+# Used to align byte-range chunks; an embedded newline inside a quoted
+# address is never followed by this shape.
+_RECORD_START = re.compile(rb'\n"?\d{10}"?,')
+
+
+def now():
+    return datetime.now().strftime('%H:%M:%S')
+
+
+def find_nppes_csv(extract_dir):
+    """Find the main NPPES CSV file in the extracted directory."""
+    patterns = [
+        os.path.join(extract_dir, 'npidata_pfile_*.csv'),
+        os.path.join(extract_dir, 'NPPES_Data_Dissemination_*', 'npidata_pfile_*.csv'),
+    ]
+    for pattern in patterns:
+        matches = glob.glob(pattern)
+        if matches:
+            # Pick the largest file (skip _fileheader.csv variants)
+            matches.sort(key=lambda f: os.path.getsize(f), reverse=True)
+            return matches[0]
+    # Try any large CSV
+    for f in glob.glob(os.path.join(extract_dir, '**', '*.csv'), recursive=True):
+        size = os.path.getsize(f)
+        if size > 1_000_000_000:  # > 1GB = likely the main file
+            return f
+    return None
+
+
+def find_nppes_member(zf):
+    """Pick the main npidata CSV inside an NPPES ZIP (same rules as find_nppes_csv)."""
+    files = [info for info in zf.infolist() if not info.is_dir()]
+    patterns = ['npidata_pfile_*.csv', 'NPPES_Data_Dissemination_*/npidata_pfile_*.csv']
+    for pattern in patterns:
+        matches = [info for info in files if fnmatch.fnmatchcase(info.filename, pattern)]
+        if matches:
+            # Pick the largest member (skip _fileheader.csv variants)
+            matches.sort(key=lambda info: info.file_size, reverse=True)
+            return matches[0].filename
+    # Try any large CSV
+    for info in files:
+        if info.filename.lower().endswith('.csv') and info.file_size > 1_000_000_000:
+            return info.filename
+    return None
+
+
+@contextmanager
+def open_nppes_zip(zip_path, binary=False):
+    """Stream the npidata member straight out of the ZIP (no extractall).
+
+    Yields (member_name, file). The file is binary when binary=True (for
+    the prefilter fast path), otherwise a UTF-8 text stream suitable for
+    scan_pharmacies. Raises FileNotFoundError if no npidata member exists.
+    """
+    with zipfile.ZipFile(zip_path, 'r') as zf:
+        member = find_nppes_member(zf)
+        if member is None:
+            raise FileNotFoundError(f"No npidata_pfile CSV inside {zip_path}")
+        with io.BufferedReader(zf.open(member), buffer_size=1 << 20) as raw:
+            if binary:
+                yield member, raw
+            else:
+                with io.TextIOWrapper(raw, encoding='utf-8', errors='replace', newline='') as f:
+                    yield member, f
+
+
+@contextmanager
+def open_nppes_source(path, binary=False):
+    """Open an NPPES CSV or ZIP (npidata member streamed); yields (name, file)."""
+    if zipfile.is_zipfile(path):
+        with open_nppes_zip(path, binary=binary) as (member, f):
+            yield member, f
+    elif binary:
+        with open(path, 'rb') as f:
+            yield os.path.basename(path), f
+    else:
+        with open(path, 'r', newline='', encoding='utf-8', errors='replace') as f:
+            yield os.path.basename(path), f
+
+
+def resolve_columns(header):
+    """Map COLUMNS to header indices; returns (col_idx, taxonomy_idx).
+
+    Raises ValueError if a required column is missing, so a schema change
+    in the dissemination file fails loudly instead of yielding blanks.
+    """
+    pos = {name.strip(): i for i, name in enumerate(header)}
+    missing = [h for h in COLUMNS.values() if h not in pos]
+    if missing:
+        raise ValueError(f"NPPES header missing columns: {missing}")
+    col_idx = {field: pos[h] for field, h in COLUMNS.items()}
+    taxonomy_idx = [pos[h] for h in TAXONOMY_COLUMNS if h in pos]
+    return col_idx, taxonomy_idx
+
+
+def build_pharmacy(row, col_idx, taxonomy_idx):
+    """Build a pharmacy dict (location, owner and detail fields) from a raw CSV row."""
+    def get(field):
+        return row[col_idx[field]].strip()
+
+    org_name = get('legal_name')
+    other_name = get('other_name')
+    # Use DBA name if available and not <UNAVAIL>, otherwise legal name
+    if other_name and other_name != '<UNAVAIL>':
+        display_name = other_name
+    else:
+        display_name = org_name
+        other_name = ''  # Clean up <UNAVAIL>
+
+    first = get('owner_first')
+    last = get('owner_last')
+
+    return {
+        'npi': get('npi'),
+        'legal_name': org_name,
+        'dba_name': other_name,
+        'display_name': display_name,
+        'address_1': get('address_1'),
+        'address_2': get('address_2'),
+        'city': get('city'),
+        'state': get('state'),
+        'zip': get('zip')[:5],
+        'phone': get('phone'),
+        'enumeration_date': get('enumeration_date'),
+        'last_updated': get('last_updated'),
+        'owner_name': f"{first} {last}".strip(),
+        'owner_title': get('owner_title'),
+        'owner_phone': get('owner_phone'),
+        'certification_date': get('certification_date'),
+        'taxonomy_codes': ';'.join(row[i].strip() for i in taxonomy_idx if row[i].strip()),
+        'owner_first': first,
+        'owner_last': last,
+    }
+
+
+def taxonomy_ranks(taxonomies):
+    """Code -> priority (0 = highest) for match_taxonomy()."""
+    return {code: rank for rank, code in enumerate(taxonomies)}
+
+
+def match_taxonomy(row, taxonomy_idx, ranks):
+    """Return (slot, code) of the highest-priority target taxonomy, or None.
+
+    slot is 1-based (Healthcare Provider Taxonomy Code_<slot>). One dict
+    lookup per slot regardless of how many targets are configured; stops
+    early once the top-priority code is seen.
+    """
+    best_rank = None
+    best = None
+    for slot, i in enumerate(taxonomy_idx, start=1):
+        rank = ranks.get(row[i])
+        if rank is not None and (best_rank is None or rank < best_rank):
+            best_rank = rank
+            best = (slot, row[i])
+            if rank == 0:
+                break
+    return best
+
+
+def _progress(counts, progress_every):
+    if progress_every and counts['total_rows'] % progress_every == 0:
+        print(f"  [{now()}] Processed {counts['total_rows']:,} rows... "
+              f"(found {counts['pharmacy_rows']:,} community pharmacies so far)")
+
+
+def _csv_rows(f, counts, progress_every):
+    """Header, then every data row of a text-mode NPPES stream."""
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    yield header
+    for row in reader:
+        counts['total_rows'] += 1
+        _progress(counts, progress_every)
+        yield row
+
+
+def _prefiltered_records(fb, needles, counts, progress_every):
+    """Decoded header, then only the raw records containing one of `needles`.
+
+    Works on a binary stream. A physical line with an odd number of quote
+    characters opens a quoted field that continues on the next line, so
+    lines are joined until the quote count is even again before the
+    needle test; multi-line records are therefore kept or dropped whole.
+    """
+    if len(needles) == 1:
+        needle = needles[0]
+
+        def hit(record):
+            return needle in record
+    else:
+        def hit(record):
+            return any(n in record for n in needles)
+
+    header_done = False
+    pending = None
+    quotes = 0
+    for line in fb:
+        if pending is not None:
+            pending.append(line)
+            quotes += line.count(b'"')
+            if quotes & 1:
+                continue
+            record = b''.join(pending)
+            pending = None
+        else:
+            quotes = line.count(b'"')
+            if quotes & 1:
+                pending = [line]
+                continue
+            record = line
+
+        if not header_done:
+            header_done = True
+            yield record.decode('utf-8', errors='replace')
+            continue
+
+        counts['total_rows'] += 1
+        _progress(counts, progress_every)
+        if hit(record):
+            yield record.decode('utf-8', errors='replace')
+
+    if pending is not None:
+        # Unterminated quote at EOF: let csv.reader see it as the full parse would
+        counts['total_rows'] += 1
+        record = b''.join(pending)
+        if hit(record):
+            yield record.decode('utf-8', errors='replace')
+
+
+def scan_pharmacies(f, counts=None, progress_every=500_000, prefilter=False, taxonomies=None,
+                    funnel=None):
+    """Yield active Type 2 community pharmacy rows from an NPPES CSV stream.
+
+    Applies the NPPES-intrinsic filters (entity type, deactivation,
+    taxonomy). Geography and chain filters are left to the caller.
+    If `counts` is given, it is updated in place with 'total_rows',
+    'pharmacy_rows' (first target, i.e. community) and 'other_taxonomy_rows'.
+
+    `taxonomies` is a code -> label mapping in priority order (default
+    TARGET_TAXONOMIES). Each emitted row carries taxonomy_match (the
+    code), taxonomy_label and taxonomy_slot (1-15, the slot it was in).
+
+    If `funnel` (a Counter) is given, every dropped row is counted under
+    (state, reason) with reason one of SCAN_DROP_REASONS. Rows rejected by
+    the byte prefilter are never parsed, so their state and the filter
+    that would have dropped them first are unknown: they are all counted
+    as (PREFILTERED_STATE, 'taxonomy'), and the per-state entity_type,
+    deactivated and taxonomy counts then cover only records that carry a
+    target code.
+
+    With prefilter=True, `f` must be opened in binary mode: records whose
+    raw bytes lack every target code are rejected before any decoding or
+    CSV parsing (>99% of NPPES). Output is identical.
+    """
+    if taxonomies is None:
+        taxonomies = TARGET_TAXONOMIES
+    ranks = taxonomy_ranks(taxonomies)
+    if counts is None:
+        counts = {}
+    if funnel is None:
+        funnel = Counter()
+    counts.setdefault('total_rows', 0)
+    counts.setdefault('pharmacy_rows', 0)
+    counts.setdefault('other_taxonomy_rows', 0)
+    start_total = counts['total_rows']
+
+    if prefilter:
+        needles = [code.encode('ascii') for code in taxonomies]
+        rows = csv.reader(_prefiltered_records(f, needles, counts, progress_every))
+    else:
+        rows = _csv_rows(f, counts, progress_every)
+
+    header = next(rows, None)
+    if header is None:
+        return
+    col_idx, taxonomy_idx = resolve_columns(header)
+    i_entity = col_idx['entity_type']
+    i_deact = col_idx['deactivation_code']
+    i_state = col_idx['state']
+    width = max(list(col_idx.values()) + taxonomy_idx) + 1
+
+    parsed = 0
+    for row in rows:
+        parsed += 1
+        if len(row) < width:
+            funnel['', 'malformed'] += 1
+            continue
+
+        # Filter 1: Organizations only (Entity Type Code = 2)
+        if row[i_entity] != '2':
+            funnel[row[i_state].strip(), 'entity_type'] += 1
+            continue
+
+        # Filter 2: Active only (no deactivation reason)
+        if row[i_deact].strip():
+            funnel[row[i_state].strip(), 'deactivated'] += 1
+            continue
+
+        # Filter 3: Has a target taxonomy (community/retail by default)
+        match = match_taxonomy(row, taxonomy_idx, ranks)
+        if match is None:
+            funnel[row[i_state].strip(), 'taxonomy'] += 1
+            continue
+        slot, code = match
+
+        if ranks[code] == 0:
+            counts['pharmacy_rows'] += 1
+        else:
+            counts['other_taxonomy_rows'] += 1
+        pharmacy = build_pharmacy(row, col_idx, taxonomy_idx)
+        pharmacy['taxonomy_match'] = code
+        pharmacy['taxonomy_label'] = taxonomies[code]
+        pharmacy['taxonomy_slot'] = slot
+        yield pharmacy
+
+    prefiltered_out = counts['total_rows'] - start_total - parsed
+    if prefiltered_out:
+        funnel[PREFILTERED_STATE, 'taxonomy'] += prefiltered_out
+
+
+def parse_nppes_date(value):
+    """Parse an NPPES MM/DD/YYYY date; None if blank or malformed."""
+    try:
+        month, day, year = value.strip().split('/')
+        return date(int(year), int(month), int(day))
+    except (ValueError, AttributeError):
+        return None
+
+
+def iter_updates(f):
+    """Yield (npi, effective_date, status, pharmacy) for each row of a delta file.
+
+    For the weekly/monthly NPPES incremental files, which share the full
+    file's layout. status is 'active' (pharmacy is the scanned row),
+    'deactivated' or 'not_pharmacy' (no longer Type 2 with the community
+    taxonomy); pharmacy is None for the latter two. effective_date is the
+    later of Last Update Date and NPI Deactivation Date, so callers can
+    ignore rows older than what they already hold.
+    """
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    col_idx, taxonomy_idx = resolve_columns(header)
+    width = max(list(col_idx.values()) + taxonomy_idx) + 1
+    ranks = taxonomy_ranks(TARGET_TAXONOMIES)
+
+    for row in reader:
+        if len(row) < width:
+            continue
+        npi = row[col_idx['npi']].strip()
+        if not npi:
+            continue
+        dates = [d for d in (parse_nppes_date(row[col_idx['last_updated']]),
+                             parse_nppes_date(row[col_idx['deactivation_date']])) if d]
+        effective = max(dates) if dates else None
+
+        if row[col_idx['deactivation_code']].strip():
+            yield npi, effective, 'deactivated', None
+        elif (row[col_idx['entity_type']] == '2'
+              and match_taxonomy(row, taxonomy_idx, ranks) is not None):
+            yield npi, effective, 'active', build_pharmacy(row, col_idx, taxonomy_idx)
+        else:
+            yield npi, effective, 'not_pharmacy', None
+
+
+def split_ranges(path, n_chunks):
+    """Split an NPPES CSV into byte ranges aligned to record starts.
+
+    Returns (header_bytes, [(start, end), ...]). Ranges are contiguous,
+    cover every data byte exactly once and are in file order, so scanning
+    them in order reproduces a serial scan.
+    """
+    size = os.path.getsize(path)
+    block = 1 << 20
+    with open(path, 'rb') as fb:
+        header = fb.readline()
+        data_start = fb.tell()
+        bounds = [data_start]
+        for k in range(1, n_chunks):
+            target = data_start + (size - data_start) * k // n_chunks
+            if target <= bounds[-1]:
+                continue
+            # Search from the byte before target so a record starting
+            # exactly at target is still found
+            pos = target - 1
+            start = size
+            while True:
+                fb.seek(pos)
+                buf = fb.read(block)
+                m = _RECORD_START.search(buf)
+                if m:
+                    start = pos + m.start() + 1
+                    break
+                if len(buf) < block:
+                    break
+                pos += len(buf) - 32  # overlap so a boundary spanning reads is seen
+            if bounds[-1] < start < size:
+                bounds.append(start)
+        bounds.append(size)
+    return header, [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def iter_range(path, start, end, header):
+    """Yield `header` then the raw lines of byte range [start, end)."""
+    yield header
+    with open(path, 'rb') as fb:
+        fb.seek(start)
+        pos = start
+        for line in fb:
+            yield line
+            pos += len(line)
+            if pos >= end:
+                break
+
+
+def write_scan(path, pharmacies):
+    """Persist scanned pharmacy rows (with owner fields) for enrichment."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=SCAN_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(pharmacies)
+
+
+def load_scan(path):
+    """Load a scan file into an NPI-keyed dict, preserving file order."""
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        return {row['npi'].strip(): row for row in csv.DictReader(f)}
+
+
+def load_owner_index(path, fields=OWNER_FIELDS):
+    """Load NPI -> {field: value} (owner fields by default) from a scan file."""
+    owners = {}
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            owners[row['npi'].strip()] = {k: row.get(k, '') for k in fields}
+    return owners
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+NPPES Pharmacy Snapshot
+========================
+Typed, columnar (Parquet) snapshot of the filtered NPPES pharmacy universe.
+
+Written by extract_independent_pharmacies.py next to the CSV outputs. Holds
+every active Type 2 community pharmacy seen in the scan (all states,
+before chain filtering) with:
+  - NPI as a string key (leading zeros and 10-digit width preserved)
+  - enumeration / last update / certification dates as date32
+  - taxonomy codes as list<string>
+  - Authorized Official (owner) fields, split and combined
+  - the extractor's classification and the matched exclusion rule
+
+Downstream stages can memory-map the file and read only the columns they
+need instead of re-parsing CSV text:
+  from nppes_snapshot import read_snapshot
+  table = read_snapshot(path, columns=['npi', 'owner_name'])
+  owners = lookup_npis(path, npi_set, ['owner_name', 'owner_title'])
+
+Dependencies: pyarrow (optional; without it the snapshot is skipped and
+the CSV outputs are unchanged)
+"""
+
+import os
+
+from nppes_scanner import parse_nppes_date
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pc = None
+    pq = None
+
+
+SNAPSHOT_FILENAME = 'nppes_pharmacy_snapshot.parquet'
+
+_STRING_FIELDS = [
+    'npi', 'display_name', 'legal_name', 'dba_name',
+    'address_1', 'address_2', 'city', 'state', 'zip', 'phone',
+    'owner_first', 'owner_last', 'owner_name', 'owner_title', 'owner_phone',
+    'matched_rule',
+]
+_DATE_FIELDS = ['enumeration_date', 'last_updated', 'certification_date']
+
+
+def available() -> bool:
+    """True if pyarrow is installed."""
+    return pa is not None
+
+
+def schema():
+    fields = [pa.field(name, pa.string()) for name in _STRING_FIELDS]
+    fields.append(pa.field('classification', pa.string()))
+    fields += [pa.field(name, pa.date32()) for name in _DATE_FIELDS]
+    fields.append(pa.field('taxonomy_codes', pa.list_(pa.string())))
+    return pa.schema(fields)
+
+
+class SnapshotWriter:
+    """Incremental Parquet writer; rows are buffered and flushed per batch.
+
+    Writes to a temporary file and renames on close, so an interrupted
+    run never leaves a truncated snapshot behind. Used as a context
+    manager, an error discards the temporary file instead.
+    """
+
+    def __init__(self, path, batch_rows: int = 50_000):
+        self.path = str(path)
+        self.tmp_path = self.path + '.tmp'
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self._schema = schema()
+        self._columns = {name: [] for name in self._schema.names}
+        self._writer = pq.ParquetWriter(self.tmp_path, self._schema, compression='zstd')
+
+    def write(self, pharmacy: dict, classification: str = '') -> None:
+        cols = self._columns
+        for name in _STRING_FIELDS:
+            cols[name].append(pharmacy.get(name, ''))
+        cols['classification'].append(classification)
+        for name in _DATE_FIELDS:
+            cols[name].append(parse_nppes_date(pharmacy.get(name, '')))
+        codes = pharmacy.get('taxonomy_codes', '')
+        cols['taxonomy_codes'].append(codes.split(';') if codes else [])
+        if len(cols['npi']) >= self.batch_rows:
+            self._flush()
+
+    def _flush(self) -> None:
+        n = len(self._columns['npi'])
+        if not n:
+            return
+        batch = pa.record_batch([self._columns[name] for name in self._schema.names], schema=self._schema)
+        self._writer.write_batch(batch)
+        self.rows += n
+        self._columns = {name: [] for name in self._schema.names}
+
+    def close(self) -> None:
+        self._flush()
+        self._writer.close()
+        os.replace(self.tmp_path, self.path)
+
+    def discard(self) -> None:
+        """Close the Parquet writer and remove the temporary file (used on error)."""
+        try:
+            self._writer.close()
+        finally:
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+        return False
+
+
+def open_writer(output_dir):
+    """SnapshotWriter in output_dir, or None (with a note) if pyarrow is missing."""
+    if not available():
+        print("  NOTE: pyarrow not installed; skipping columnar snapshot")
+        return None
+    return SnapshotWriter(os.path.join(output_dir, SNAPSHOT_FILENAME))
+
+
+def read_snapshot(path, columns=None, filters=None):
+    """Memory-map the snapshot and read only `columns` (pyarrow Table)."""
+    if not available():
+        raise ImportError("pyarrow is required to read the NPPES snapshot")
+    return pq.read_table(str(path), columns=columns, filters=filters, memory_map=True)
+
+
+def lookup_npis(path, npis, fields):
+    """Return NPI -> {field: value} for the NPIs in `npis` (hash join).
+
+    Reads only the npi column plus `fields`, keeps rows whose NPI is in
+    the set (pyarrow.compute.is_in builds a hash table of the set), and
+    converts just those rows to Python. Values match the scan file:
+    strings, with dates formatted MM/DD/YYYY and taxonomy codes
+    ';'-joined. NPIs absent from the snapshot are absent from the result.
+    """
+    table = read_snapshot(path, columns=['npi'] + list(fields))
+    wanted = pa.array(sorted(npis), type=pa.string())
+    table = table.filter(pc.is_in(table['npi'], value_set=wanted))
+    columns = table.to_pydict()
+    for field in fields:
+        if field in _DATE_FIELDS:
+            columns[field] = [d.strftime('%m/%d/%Y') if d else '' for d in columns[field]]
+        elif field == 'taxonomy_codes':
+            columns[field] = [';'.join(codes or []) for codes in columns[field]]
+    return {
+        npi: {field: columns[field][i] or '' for field in fields}
+        for i, npi in enumerate(columns['npi'])
+    }
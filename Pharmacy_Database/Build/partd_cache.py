@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Part D GLP-1 Record Cache
+==========================
+Typed, columnar cache of the GLP-1 rows filtered out of the CMS Part D
+Prescribers by Provider and Drug CSV (download_partd_prescribers.py).
+
+Only the fields the aggregations use are kept, already parsed:
+  npi, city, state, zip   string (zip is '' unless the source has one)
+  generic, brand          string
+  claims, benes           int64 (null when blank / suppressed)
+  cost                    float64 (null when blank)
+
+The cache is a Parquet file (pyarrow), read memory-mapped in a few
+milliseconds. Without pyarrow the same columns go to a .columns.csv
+next to it.
+Either way the source URL and its validator (ETag, else Last-Modified)
+are stored with the data -- Parquet schema metadata, or a .meta.json
+sidecar for the CSV -- and load() returns None when either no longer
+matches, so a new CMS release is downloaded again.
+
+Usage:
+  from partd_cache import load, save, to_columns
+  cols = load(path, url, current_validator)       # None -> stale/missing
+  save(path, to_columns(records), url, validator)
+  for state, claims in zip(cols['state'], cols['claims']): ...
+
+Dependencies: pyarrow (optional; without it the cache is a typed CSV)
+"""
+
+import csv
+import json
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+# Cache column -> Part D column(s); the first one present in the source is used
+SOURCE_FIELDS = {
+    'npi': ['Prscrbr_NPI'],
+    'city': ['Prscrbr_City'],
+    'state': ['Prscrbr_State_Abrvtn'],
+    'zip': ['Prscrbr_zip5', 'Prscrbr_Zip5', 'Prscrbr_Zip'],
+    'generic': ['Gnrc_Name'],
+    'brand': ['Brnd_Name'],
+    'claims': ['Tot_Clms'],
+    'cost': ['Tot_Drug_Cst'],
+    'benes': ['Tot_Benes'],
+}
+_STRING_FIELDS = ['npi', 'city', 'state', 'zip', 'generic', 'brand']
+_INT_FIELDS = ['claims', 'benes']
+_FLOAT_FIELDS = ['cost']
+COLUMNS = list(SOURCE_FIELDS)
+
+CACHE_VERSION = '1'
+
+
+def available() -> bool:
+    """True if pyarrow is installed (Parquet cache)."""
+    return pa is not None
+
+
+def schema():
+    fields = []
+    for name in COLUMNS:
+        if name in _INT_FIELDS:
+            fields.append(pa.field(name, pa.int64()))
+        elif name in _FLOAT_FIELDS:
+            fields.append(pa.field(name, pa.float64()))
+        else:
+            fields.append(pa.field(name, pa.string()))
+    return pa.schema(fields)
+
+
+def _number(value: str, cast):
+    """Parsed number, or None for blank / unparseable values."""
+    value = (value or '').strip()
+    if not value:
+        return None
+    try:
+        return cast(float(value))
+    except ValueError:
+        return None
+
+
+def to_columns(records: list[dict]) -> dict[str, list]:
+    """Part D rows (csv dicts) -> {column: typed values}."""
+    source = {}
+    if records:
+        for name, candidates in SOURCE_FIELDS.items():
+            source[name] = next((c for c in candidates if c in records[0]), None)
+    cols = {name: [] for name in COLUMNS}
+    for rec in records:
+        for name in _STRING_FIELDS:
+            cols[name].append((rec.get(source[name]) or '').strip() if source[name] else '')
+        for name in _INT_FIELDS:
+            cols[name].append(_number(rec.get(source[name], ''), int))
+        for name in _FLOAT_FIELDS:
+            cols[name].append(_number(rec.get(source[name], ''), float))
+    return cols
+
+
+def _csv_path(path) -> str:
+    return os.path.splitext(str(path))[0] + '.columns.csv'
+
+
+def _meta(url: str, validator: str | None) -> dict:
+    return {'version': CACHE_VERSION, 'source_url': url, 'source_validator': validator or ''}
+
+
+def save(path, cols: dict[str, list], url: str, validator: str | None) -> str:
+    """Write the cache (atomically) and return the file written."""
+    meta = _meta(url, validator)
+    if available():
+        path = str(path)
+        table = pa.table(cols, schema=schema().with_metadata({'partd_cache': json.dumps(meta)}))
+        tmp = path + '.tmp'
+        pq.write_table(table, tmp, compression='zstd')
+        os.replace(tmp, path)
+        return path
+
+    path = _csv_path(path)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(COLUMNS)
+        writer.writerows(zip(*(cols[name] for name in COLUMNS)))
+    os.replace(tmp, path)
+    with open(path + '.meta.json', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    return path
+
+
+def _read_meta(path) -> tuple[dict | None, str]:
+    """(metadata, file) of an existing cache, preferring Parquet; (None, '') if none."""
+    path = str(path)
+    if available() and os.path.exists(path):
+        raw = pq.read_schema(path).metadata or {}
+        return json.loads(raw.get(b'partd_cache', b'{}')), path
+    csv_path = _csv_path(path)
+    if os.path.exists(csv_path) and os.path.exists(csv_path + '.meta.json'):
+        with open(csv_path + '.meta.json', 'r', encoding='utf-8') as f:
+            return json.load(f), csv_path
+    return None, ''
+
+
+def exists(path) -> bool:
+    """True if a cache (Parquet or CSV) exists for `path`, current or not."""
+    return _read_meta(path)[0] is not None
+
+
+def is_current(meta: dict | None, url: str, validator: str | None) -> bool:
+    """True if cached metadata matches `url` and (when known) the current validator."""
+    if not meta or meta.get('version') != CACHE_VERSION or meta.get('source_url') != url:
+        return False
+    return validator is None or meta.get('source_validator') == validator
+
+
+def load(path, url: str, validator: str | None) -> dict[str, list] | None:
+    """Cached columns for `url`, or None if missing or stale.
+
+    `validator` is the source's current ETag / Last-Modified; pass None
+    when it could not be fetched, to accept any cache for the URL.
+    """
+    meta, cache_file = _read_meta(path)
+    if not is_current(meta, url, validator):
+        if meta:
+            print(f"  NOTE: {os.path.basename(cache_file)} is from another source version; re-downloading")
+        return None
+    if cache_file.endswith('.parquet'):
+        return pq.read_table(cache_file, memory_map=True).to_pydict()
+
+    cols = {name: [] for name in COLUMNS}
+    with open(cache_file, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader)
+        for row in reader:
+            for name, value in zip(COLUMNS, row):
+                if name in _INT_FIELDS:
+                    value = int(value) if value else None
+                elif name in _FLOAT_FIELDS:
+                    value = float(value) if value else None
+                cols[name].append(value)
+    return cols
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Resumable Part D Download
+==========================
+HTTP Range-request streaming with on-disk checkpoints for the ~5GB CMS
+Part D CSV (download_partd_prescribers.py).
+
+RangeStream yields the body of a URL from a byte offset, in chunks. When
+the connection drops (reset, truncated chunked body, read timeout) it
+reconnects with `Range: bytes=<next byte>-` and `If-Range: <validator>`
+(ETag, else Last-Modified), so the stream continues where it broke
+instead of at byte zero. HTTP 429 and 5xx replies (an overloaded or
+restarting server) are retried the same way; other 4xx replies fail at
+once. A 200 reply to a ranged request means the server
+ignored the range or the file changed; that raises SourceChanged.
+
+Checkpoint persists what the GLP-1 filter has fully processed:
+  <base>.ckpt.json    url, validator, total size, byte offset of the first
+                      unprocessed line, CSV header, data lines seen, and
+                      the number of GLP-1 rows saved
+  <base>.partial.csv  GLP-1 rows found so far (appended at each save)
+A later run against the same url + validator reloads the rows and
+resumes the download at the saved offset.
+
+Pipeline decouples the network from parsing: a download thread pulls
+chunks from the stream into a bounded queue while the caller filters the
+previous ones, so ingest runs at the slower of the two instead of their
+sum. A full queue blocks the download thread (back-pressure, memory stays
+at queue depth x chunk size); an empty one blocks the parser. Per-stage
+StageCounters record bytes, busy time and time spent blocked on the
+queue, which shows which side is the bottleneck.
+
+Usage:
+  ckpt = Checkpoint(REFERENCE_DIR / 'partd_glp1_raw_cache')
+  state, records = ckpt.load(url)
+  stream = RangeStream(url, start=state['offset'] if state else 0,
+                       validator=state['validator'] if state else None)
+  for chunk in stream:
+      ...
+      ckpt.save(url, stream, offset, header, lines, new_records)
+
+  pipe = Pipeline(stream)          # same chunks, downloaded in a thread
+  for chunk in pipe:
+      ...
+  print(pipe.summary())
+
+Dependencies: requests
+"""
+
+import csv
+import json
+import os
+import queue
+import threading
+import time
+
+import requests
+
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_MAX_RETRIES = 8
+# Chunks buffered between the download thread and the parser (x chunk size of memory)
+DEFAULT_QUEUE_DEPTH = 16
+
+# Errors after which the stream is reopened at the next byte
+RETRYABLE_ERRORS = (
+    requests.exceptions.ConnectionError,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.Timeout,
+)
+# HTTP statuses (besides 5xx) that are retried rather than raised
+RETRYABLE_STATUS = {408, 429}
+
+
+def is_retryable_status(status: int | None) -> bool:
+    """True for transient HTTP errors: 408, 429 and any 5xx."""
+    return status is not None and (status in RETRYABLE_STATUS or 500 <= status < 600)
+
+
+class SourceChanged(Exception):
+    """The server no longer serves the same bytes (validator or size changed)."""
+
+
+class RangeStream:
+    """Iterate over a URL's body from `start`, resuming dropped connections with Range requests.
+
+    After the first response `validator` (ETag or Last-Modified) and
+    `total` (full body size, if known) are set; `offset` is the absolute
+    position of the next byte and `reconnects` counts resumed connections.
+    """
+
+    def __init__(self, url, start=0, validator=None, total=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                 timeout=60, max_retries=DEFAULT_MAX_RETRIES, session=None):
+        self.url = url
+        self.offset = start
+        self.validator = validator
+        self.total = total
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.session = session or requests.Session()
+        self.reconnects = 0
+        self._resp = None
+
+    def _open(self):
+        headers = {}
+        if self.offset:
+            headers['Range'] = f'bytes={self.offset}-'
+            if self.validator:
+                headers['If-Range'] = self.validator
+        resp = self.session.get(self.url, headers=headers, stream=True, timeout=self.timeout)
+        if resp.status_code == 416 and self.total is not None and self.offset >= self.total:
+            resp.close()
+            return None
+        if not resp.ok:
+            resp.close()
+            resp.raise_for_status()
+
+        validator = resp.headers.get('ETag') or resp.headers.get('Last-Modified')
+        if self.offset:
+            if resp.status_code != 206:
+                resp.close()
+                raise SourceChanged(f"server answered {resp.status_code} to a range request at byte {self.offset:,}")
+            content_range = resp.headers.get('Content-Range', '')
+            if not content_range.startswith(f'bytes {self.offset}-'):
+                resp.close()
+                raise SourceChanged(f"unexpected Content-Range {content_range!r} for byte {self.offset:,}")
+            total = content_range.rpartition('/')[2]
+            total = int(total) if total.isdigit() else None
+        else:
+            length = resp.headers.get('Content-Length', '')
+            total = int(length) if length.isdigit() else None
+
+        if self.validator and validator and validator != self.validator:
+            resp.close()
+            raise SourceChanged(f"validator changed: {self.validator} -> {validator}")
+        if self.total is not None and total is not None and total != self.total:
+            resp.close()
+            raise SourceChanged(f"size changed: {self.total:,} -> {total:,} bytes")
+        self.validator = self.validator or validator
+        self.total = self.total if self.total is not None else total
+        return resp
+
+    def __iter__(self):
+        failures = 0
+        while True:
+            try:
+                self._resp = self._open()
+                if self._resp is None:
+                    return
+                for chunk in self._resp.iter_content(chunk_size=self.chunk_size):
+                    if chunk:
+                        self.offset += len(chunk)
+                        failures = 0
+                        yield chunk
+                if self.total is None or self.offset >= self.total:
+                    return
+                error = f"connection closed at byte {self.offset:,} of {self.total:,}"
+            except RETRYABLE_ERRORS as e:
+                error = f"{type(e).__name__} at byte {self.offset:,}"
+            except requests.exceptions.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if not is_retryable_status(status):
+                    raise
+                error = f"HTTP {status} at byte {self.offset:,}"
+            finally:
+                if self._resp is not None:
+                    self._resp.close()
+                    self._resp = None
+
+            failures += 1
+            if failures > self.max_retries:
+                raise requests.exceptions.ConnectionError(f"{error}; gave up after {self.max_retries} retries")
+            delay = min(2 ** (failures - 1), 30)
+            print(f"  {error}; resuming with a range request in {delay}s", flush=True)
+            time.sleep(delay)
+            self.reconnects += 1
+
+
+class Checkpoint:
+    """On-disk progress of a filtered download: <base>.ckpt.json + <base>.partial.csv."""
+
+    def __init__(self, base):
+        base = str(base)
+        self.json_path = base + '.ckpt.json'
+        self.rows_path = base + '.partial.csv'
+        self.rows = 0
+
+    def load(self, url):
+        """(state, records) saved for `url`, or (None, []) if there is no usable checkpoint."""
+        if not os.path.exists(self.json_path):
+            return None, []
+        with open(self.json_path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('url') != url:
+            print(f"  Ignoring checkpoint for a different URL: {state.get('url')}")
+            self.clear()
+            return None, []
+
+        records = []
+        if state['rows']:
+            with open(self.rows_path, 'r', newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    if len(records) == state['rows']:
+                        break
+                    records.append(row)
+            if len(records) != state['rows']:
+                print(f"  Checkpoint rows missing ({len(records):,} of {state['rows']:,}); starting over")
+                self.clear()
+                return None, []
+        # Drop rows appended after the last checkpoint was written
+        self._write_rows(records, state['header'], 'w')
+        self.rows = len(records)
+        return state, records
+
+    def _write_rows(self, records, header, mode):
+        with open(self.rows_path, mode, newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=header)
+            if mode == 'w':
+                writer.writeheader()
+            writer.writerows(records)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def save(self, url, stream, offset, header, lines, new_records):
+        """Append `new_records`, then atomically record `offset` as processed."""
+        if self.rows == 0 and not os.path.exists(self.rows_path):
+            self._write_rows([], header, 'w')
+        if new_records:
+            self._write_rows(new_records, header, 'a')
+        self.rows += len(new_records)
+        state = {
+            'url': url, 'validator': stream.validator, 'total': stream.total,
+            'offset': offset, 'header': header, 'lines': lines, 'rows': self.rows,
+        }
+        tmp = self.json_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.json_path)
+
+    def clear(self):
+        for path in (self.json_path, self.rows_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.rows = 0
+
+
+class StageCounter:
+    """Throughput of one pipeline stage.
+
+    `busy` is seconds spent doing the stage's own work and `blocked`
+    seconds spent waiting on the queue (download: queue full; parse:
+    queue empty).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.bytes = 0
+        self.chunks = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+
+    def rate(self) -> float:
+        """MB/s while busy."""
+        return self.bytes / self.busy / 1e6 if self.busy else 0.0
+
+    def __str__(self):
+        total = self.busy + self.blocked
+        blocked_pct = self.blocked / total * 100 if total else 0
+        return f"{self.name} {self.bytes / 1e6:,.0f} MB at {self.rate():.1f} MB/s, {blocked_pct:.0f}% blocked"
+
+
+_DONE = object()
+
+
+class Pipeline:
+    """Iterate over `chunks` (e.g. a RangeStream) produced by a background download thread.
+
+    The thread puts chunks into a queue of `depth`; iterating yields them
+    in order. An exception raised by the source is re-raised in the
+    consumer. Leaving the loop early stops the thread at its next put.
+    """
+
+    def __init__(self, chunks, depth=DEFAULT_QUEUE_DEPTH):
+        self.download = StageCounter('download')
+        self.parse = StageCounter('parse')
+        self._chunks = chunks
+        self._queue = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._produce, name='partd-download', daemon=True)
+
+    def _put(self, item) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self):
+        counter = self.download
+        try:
+            chunks = iter(self._chunks)
+            while True:
+                t0 = time.perf_counter()
+                chunk = next(chunks, _DONE)
+                t1 = time.perf_counter()
+                counter.busy += t1 - t0
+                if chunk is _DONE:
+                    break
+                counter.bytes += len(chunk)
+                counter.chunks += 1
+                if not self._put(chunk):
+                    return
+                counter.blocked += time.perf_counter() - t1
+        except Exception as e:
+            self._put(e)
+            return
+        self._put(_DONE)
+
+    def __iter__(self):
+        counter = self.parse
+        self._thread.start()
+        try:
+            while True:
+                t0 = time.perf_counter()
+                item = self._queue.get()
+                t1 = time.perf_counter()
+                counter.blocked += t1 - t0
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+                counter.busy += time.perf_counter() - t1
+                counter.bytes += len(item)
+                counter.chunks += 1
+        finally:
+            self._stop.set()
+
+    def summary(self) -> str:
+        return f"{self.download}; {self.parse}"
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Part D GLP-1 Line Filter
+=========================
+Byte-level GLP-1 prefilter for the CMS Part D Prescribers by Provider and
+Drug CSV (~5GB), used by download_partd_prescribers.py.
+
+Glp1LineFilter is fed raw response chunks and returns only the candidate
+records, still as bytes. Per chunk it:
+  1. finds the last record boundary -- a newline outside quoted fields,
+     tracked by quote parity with bytes.count
+  2. upper-cases the chunk once (bytes.upper, C speed)
+  3. runs bytes.find for each needle over the complete records --
+     'GLUTIDE' (semaglutide, liraglutide, dulaglutide), 'TIRZEPATIDE',
+     'EXENATIDE' and the ten brand names
+  4. slices out the records that contain a hit, including records whose
+     quoted fields span several physical lines
+so no per-line Python work happens for the ~99% of rows that are not
+GLP-1. Candidate records are a superset of the legacy per-line keyword
+test; parse_glp1_lines() CSV-parses each one and keeps the rows whose
+Gnrc_Name / Brnd_Name pass is_glp1().
+
+On a synthetic Part D-shaped file (bench_partd_filter.py) this runs at
+~70 MB/s against ~30 MB/s for the legacy decode + upper + `in` loop, i.e.
+faster than the CMS download itself.
+
+Usage:
+  flt = Glp1LineFilter()
+  for chunk in resp.iter_content(chunk_size=1 << 20):
+      records += parse_glp1_lines(flt.feed(chunk), flt.header)
+  records += parse_glp1_lines(flt.flush(), flt.header)
+"""
+
+import csv
+import io
+
+
+GLP1_GENERICS = {
+    'semaglutide', 'tirzepatide', 'liraglutide',
+    'dulaglutide', 'exenatide',
+}
+
+GLP1_BRANDS_UPPER = {
+    'OZEMPIC', 'WEGOVY', 'RYBELSUS',
+    'MOUNJARO', 'ZEPBOUND',
+    'VICTOZA', 'SAXENDA',
+    'TRULICITY',
+    'BYETTA', 'BYDUREON',
+}
+
+# Byte needles covering every generic and brand; GLUTIDE stands for three generics
+# (a bare TIDE would also pull in octreotide, teriparatide, linaclotide, ...)
+GLP1_NEEDLES = [b'GLUTIDE', b'TIRZEPATIDE', b'EXENATIDE'] + sorted(brand.encode() for brand in GLP1_BRANDS_UPPER)
+
+
+def drug_key(generic_name: str) -> str:
+    """GLP1_GENERICS member contained in a Gnrc_Name, or ''."""
+    gn = generic_name.strip().lower()
+    for drug in GLP1_GENERICS:
+        if drug in gn:
+            return drug
+    return ''
+
+
+def is_glp1(gnrc_name: str, brnd_name: str) -> bool:
+    """Fast check if a record is a GLP-1 drug."""
+    gn = gnrc_name.strip().lower()
+    for drug in GLP1_GENERICS:
+        if drug in gn:
+            return True
+    bn = brnd_name.strip().upper()
+    for brand in GLP1_BRANDS_UPPER:
+        if brand in bn:
+            return True
+    return False
+
+
+def record_end(buf: bytes, pos: int, end: int, quoted: bool = False) -> int:
+    """Index of the newline that ends the record continuing at buf[pos], or -1.
+
+    `quoted` is the quote state at `pos`; newlines inside a quoted field
+    are skipped.
+    """
+    while True:
+        nl = buf.find(b'\n', pos, end)
+        if nl < 0:
+            return -1
+        if buf.count(b'"', pos, nl) & 1:
+            quoted = not quoted
+        if not quoted:
+            return nl
+        pos = nl + 1
+
+
+def last_record_end(buf: bytes, pos: int, end: int) -> int:
+    """Offset just past the last record terminator in buf[pos:end] (pos starts a record), or pos."""
+    # Quote parity of buf[pos:nl] = parity of the whole span ^ parity after nl
+    quoted = bool(buf.count(b'"', pos, end) & 1)
+    right = end
+    nl = buf.rfind(b'\n', pos, end)
+    while nl >= 0:
+        if buf.count(b'"', nl, right) & 1:
+            quoted = not quoted
+        if not quoted:
+            return nl + 1
+        right = nl
+        nl = buf.rfind(b'\n', pos, nl)
+    return pos
+
+
+def candidate_records(buf: bytes, pos: int = 0, end: int | None = None,
+                      needles=GLP1_NEEDLES, upper: bytes | None = None) -> list[bytes]:
+    """Records of buf[pos:end] containing any needle, case-insensitive.
+
+    buf[pos:end] must hold complete records. Returned in file order,
+    without the terminating newline; a record may span physical lines.
+    `upper` is buf.upper() if the caller already has it.
+    """
+    end = len(buf) if end is None else end
+    if upper is None:
+        upper = buf.upper()
+    hits = set()
+    for needle in needles:
+        i = upper.find(needle, pos, end)
+        while i >= 0:
+            hits.add(i)
+            nl = upper.find(b'\n', i, end)
+            if nl < 0:
+                break
+            i = upper.find(needle, nl, end)
+
+    records = []
+    cursor = pos  # start of the first record not yet emitted or skipped
+    for i in sorted(hits):
+        if i < cursor:
+            continue
+        # Back up from the hit to the nearest newline outside quotes
+        start = buf.rfind(b'\n', cursor, i) + 1 or cursor
+        quoted = bool(buf.count(b'"', cursor, start) & 1)
+        while quoted:
+            prev = buf.rfind(b'\n', cursor, start - 1) + 1 or cursor
+            if buf.count(b'"', prev, start) & 1:
+                quoted = False
+            start = prev
+        nl = record_end(buf, start, end)
+        stop = nl if nl >= 0 else end
+        records.append(buf[start:stop])
+        cursor = stop + 1
+    return records
+
+
+class Glp1LineFilter:
+    """Stream of raw CSV byte chunks -> GLP-1 candidate records.
+
+    Records are split on bytes, RFC 4180 style: a newline ends a record
+    only outside a quoted field, and a quote toggles the quoted state (a
+    doubled quote toggles twice), so the state at any offset is the
+    parity of the quotes since the record start -- counted with
+    bytes.count rather than a per-character loop. Splitting on the ASCII
+    bytes '\n' and '"' never cuts a UTF-8 sequence, so each candidate
+    record is decoded whole by parse_glp1_lines().
+
+    The first record is taken as the header (decoded into `header`). A
+    partial last record is carried to the next chunk in a bytearray;
+    flush() tests it at end of stream. Each chunk is upper-cased once and
+    scanned in place by offset, without concatenating or slicing it.
+    `lines` counts physical data lines seen (a record with a quoted
+    newline counts twice) and `bytes` the input fed. To
+    resume mid-file pass the saved `header`, `lines` and `start` (a
+    record-start byte offset); `offset` is the absolute position of the
+    first byte not yet fully processed, i.e. the next resume point.
+    """
+
+    def __init__(self, needles=GLP1_NEEDLES, header=None, lines=0, start=0):
+        self.needles = needles
+        self.header = header
+        self.lines = lines
+        self.bytes = 0
+        self.start = start
+        self._tail = bytearray()
+
+    @property
+    def offset(self) -> int:
+        return self.start + self.bytes - len(self._tail)
+
+    def _take(self, record: bytes, out: list) -> None:
+        if self.header is None:
+            text = record.decode('utf-8', errors='replace').strip()
+            self.header = next(csv.reader(io.StringIO(text)))
+            return
+        self.lines += record.count(b'\n') + 1
+        out.extend(candidate_records(record, needles=self.needles))
+
+    def feed(self, chunk: bytes) -> list[bytes]:
+        self.bytes += len(chunk)
+        out = []
+        pos, size = 0, len(chunk)
+        if self._tail or self.header is None:
+            # Finish the record carried over from the previous chunk
+            nl = record_end(chunk, 0, size, quoted=bool(self._tail.count(b'"') & 1))
+            if nl < 0:
+                self._tail += chunk
+                return out
+            self._tail += chunk[:nl]
+            record, self._tail = bytes(self._tail), bytearray()
+            self._take(record, out)
+            pos = nl + 1
+
+        end = last_record_end(chunk, pos, size)
+        self._tail = bytearray(chunk[end:])
+        if end > pos:
+            self.lines += chunk.count(b'\n', pos, end)
+            out.extend(candidate_records(chunk, pos, end, self.needles, chunk.upper()))
+        return out
+
+    def flush(self) -> list[bytes]:
+        """Candidate from the final unterminated record, if any."""
+        tail, self._tail = bytes(self._tail), bytearray()
+        if self.header is None or not tail.strip():
+            return []
+        out = []
+        self._take(tail, out)
+        return out
+
+
+def parse_glp1_lines(lines: list[bytes], header: list[str] | None) -> list[dict]:
+    """CSV-parse candidate records and keep full-width GLP-1 rows as dicts.
+
+    A record may contain quoted newlines; csv.reader keeps them in the field.
+    """
+    if not lines or not header:
+        return []
+    gnrc_idx = header.index('Gnrc_Name')
+    brnd_idx = header.index('Brnd_Name') if 'Brnd_Name' in header else -1
+    records = []
+    for line in lines:
+        text = line.decode('utf-8', errors='replace').strip()
+        if not text:
+            continue
+        row_vals = next(csv.reader([text]))
+        if len(row_vals) < len(header):
+            continue
+        brnd = row_vals[brnd_idx] if brnd_idx >= 0 else ''
+        if is_glp1(row_vals[gnrc_idx], brnd):
+            records.append(dict(zip(header, row_vals)))
+    return records
@@ -16,6 +16,8 @@ import re
 from collections import defaultdict
 from pathlib import Path
 
+from usps_address import normalize_city
+
 
 # --- CSV path ---
 
@@ -48,6 +50,8 @@ def _strip_dollar(val: str) -> str:
 _by_npi: dict[str, dict] = {}
 _by_state: dict[str, list[dict]] = defaultdict(list)
 _all_rows: list[dict] = []
+# ' ' + normalize_city(row['city']) + ' ' per row of _all_rows, for whole-word city search
+_city_keys: list[str] = []
 
 
 def _load() -> None:
@@ -72,6 +76,7 @@ def _load() -> None:
                 _by_state[state].append(row)
 
             _all_rows.append(row)
+            _city_keys.append(f" {normalize_city(row.get('city', ''))} ")
 
 
 _load()
@@ -194,9 +199,10 @@ def search(query: str, limit: int = 20) -> list[dict]:
     """Combined search across NPI, name, owner, city, ZIP.
 
     Priority: NPI exact match first (10-digit).
-    Then scans pharmacy_name, owner_name, city (substring)
-    and zip (prefix). Deduplicates by NPI, sorts by
-    rmm_score descending.
+    Then scans pharmacy_name, owner_name, city (substring,
+    or whole words of the USPS-normalized city so "Saint
+    Louis" finds "ST LOUIS") and zip (prefix). Deduplicates by NPI,
+    sorts by rmm_score descending.
     """
     q = query.strip()
     if not q:
@@ -209,6 +215,7 @@ def search(query: str, limit: int = 20) -> list[dict]:
             return [row]
 
     q_lower = q.lower()
+    q_city = f' {normalize_city(q)} '
     seen: set[str] = set()
     results: list[dict] = []
 
@@ -219,13 +226,15 @@ def search(query: str, limit: int = 20) -> list[dict]:
             results.append(row)
 
     # 2. Name, owner, city substring + ZIP prefix
-    for row in _all_rows:
+    for row, city_key in zip(_all_rows, _city_keys):
         if q_lower in row.get('pharmacy_name', '').lower():
             _add(row)
         elif q_lower in row.get('owner_name', '').lower():
             _add(row)
         elif q_lower in row.get('city', '').lower():
             _add(row)
+        elif q_city.strip() and q_city in city_key:
+            _add(row)
         elif row.get('zip', '').startswith(q):
             _add(row)
 
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Pharmacy Status Engine
+=======================
+Vectorized estimated_status classification for NPPES pharmacy records.
+
+A pharmacy's activity date is the latest of its NPPES dates:
+  - last_updated        (Last Update Date)
+  - certification_date  (Certification Date: the org re-attested its data)
+  - enumeration_date    (Provider Enumeration Date: a new NPI is live)
+
+Status is assigned from the activity year relative to an as-of date
+(default: the NPPES file date), using year offsets rather than hardcoded
+years:
+  Active          activity year >= as_of.year - 2
+  Likely Active   activity year >= as_of.year - 6
+  Uncertain       activity year >= as_of.year - 11
+  Likely Closed   older, or no parseable date
+With the default as-of date (2026-02-09) these are the original
+2024 / 2020 / 2015 cutoffs.
+
+transitions() compares a new status column with a prior one by NPI, so
+each enrichment run can report churn (e.g. Active -> Uncertain, New,
+Dropped).
+
+Usage:
+  from pharmacy_status import classify_status, transitions
+  df['estimated_status'] = classify_status(df)
+  churn = transitions(prior_status, df.set_index('npi')['estimated_status'])
+
+Dependencies: pandas, numpy
+"""
+
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+
+STATUS_ORDER = ['Active', 'Likely Active', 'Uncertain', 'Likely Closed']
+
+# Status -> max years between activity year and as-of year (last status is the default)
+DEFAULT_CUTOFFS = {'Active': 2, 'Likely Active': 6, 'Uncertain': 11}
+
+# NPPES dissemination file date the base CSVs were built from
+DEFAULT_AS_OF = date(2026, 2, 9)
+
+DATE_COLUMNS = ['last_updated', 'certification_date', 'enumeration_date']
+NPPES_DATE_FORMAT = '%m/%d/%Y'
+
+
+def parse_cutoffs(text):
+    """Parse 'A,B,C' (years for Active, Likely Active, Uncertain) into a cutoffs dict."""
+    years = [int(part) for part in text.split(',')]
+    if len(years) != len(DEFAULT_CUTOFFS) or years != sorted(years):
+        raise ValueError(f"expected {len(DEFAULT_CUTOFFS)} ascending year offsets, got {text!r}")
+    return dict(zip(DEFAULT_CUTOFFS, years))
+
+
+def activity_date(df):
+    """Latest parseable NPPES date per row (NaT if none)."""
+    columns = [c for c in DATE_COLUMNS if c in df.columns]
+    if not columns:
+        return pd.Series(pd.NaT, index=df.index)
+    dates = pd.concat(
+        [pd.to_datetime(df[c], format=NPPES_DATE_FORMAT, errors='coerce') for c in columns],
+        axis=1,
+    )
+    return dates.max(axis=1)
+
+
+def classify_status(df, as_of=DEFAULT_AS_OF, cutoffs=None):
+    """Return a Series of STATUS_ORDER labels for every row of `df`.
+
+    `df` needs any of DATE_COLUMNS as NPPES MM/DD/YYYY strings; missing
+    columns and blank or malformed dates are ignored.
+    """
+    if cutoffs is None:
+        cutoffs = DEFAULT_CUTOFFS
+    years = activity_date(df).dt.year.to_numpy(dtype='float64')
+    conditions = [years >= as_of.year - cutoffs[status] for status in DEFAULT_CUTOFFS]
+    labels = np.select(conditions, list(DEFAULT_CUTOFFS), default=STATUS_ORDER[-1])
+    return pd.Series(labels, index=df.index, name='estimated_status')
+
+
+def transitions(prior, current):
+    """Count status changes between two NPI-indexed status Series.
+
+    Returns a DataFrame with columns from_status, to_status, count. NPIs
+    only in `current` come from 'New'; NPIs only in `prior` go to 'Dropped'.
+    Unchanged statuses are included so the table sums to the union of NPIs.
+    """
+    both = pd.concat([prior.rename('from_status'), current.rename('to_status')], axis=1)
+    both['from_status'] = both['from_status'].fillna('New')
+    both['to_status'] = both['to_status'].fillna('Dropped')
+    table = both.groupby(['from_status', 'to_status']).size().reset_index(name='count')
+
+    order = {s: i for i, s in enumerate(['New'] + STATUS_ORDER + ['Dropped'])}
+    return table.sort_values(
+        ['from_status', 'to_status'],
+        key=lambda col: col.map(lambda s: order.get(s, len(order))),
+    ).reset_index(drop=True)
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+USPS Address Normalizer
+========================
+Table-driven street address and city normalization (USPS Publication 28
+conventions), shared by the dedup pipeline, Part D city matching and the
+lookup search.
+
+  parse_address     raw address -> ParsedAddress (house, predirectional,
+                    street name, suffix, postdirectional, unit, PO box)
+  normalize_address standardized address including the secondary unit
+  normalize_street  standardized address without the secondary unit
+                    (the dedup grouping key)
+  normalize_city    standardized city name ("SAINT LOUIS" -> "ST LOUIS")
+
+Rules, in order:
+  - uppercase, drop periods/apostrophes, commas and hyphens to spaces
+    (house-number ranges like 123-125 keep their hyphen)
+  - PO boxes ("P.O. Box", "Post Office Box", "POB") -> PO BOX n;
+    rural routes / highway contracts -> RR n BOX m / HC n BOX m
+  - highways: US / state / county highways and routes, farm-to-market
+    roads and interstates -> US HWY n, STATE HWY n, STATE RTE n,
+    COUNTY RD n, COUNTY HWY n, FM n, INTERSTATE n; bare HIGHWAY -> HWY
+  - secondary unit (Pub 28 C2 table: SUITE -> STE, APARTMENT -> APT, ...)
+    and everything after it is split off; "STE4B" is split to "STE 4B"
+  - house number, then pre/post-directionals (NORTH -> N) when a street
+    name remains, then the trailing street suffix (Pub 28 C1 table:
+    AVENUE/AVEN/AV -> AVE, ...)
+  - word ordinals in the street name -> numbers (FIRST -> 1ST)
+
+Every public function is cached with functools.lru_cache keyed on the raw
+string; pharmacy files repeat the same addresses and cities heavily.
+
+Usage:
+  from usps_address import normalize_street, normalize_city, parse_address
+  normalize_street('123 North Main Street, Suite 4B')   # '123 N MAIN ST'
+  parse_address('P.O. Box 77').po_box                     # '77'
+"""
+
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+
+CACHE_SIZE = 1 << 16
+
+
+# --- Tables ---
+
+# USPS Pub 28 Appendix C1: standard suffix abbreviation -> accepted spellings
+_SUFFIX_VARIANTS = {
+    'ALY': ['ALLEE', 'ALLEY', 'ALLY'],
+    'ANX': ['ANEX', 'ANNEX', 'ANNX'],
+    'ARC': ['ARCADE'],
+    'AVE': ['AV', 'AVEN', 'AVENU', 'AVENUE', 'AVN', 'AVNUE'],
+    'BYU': ['BAYOO', 'BAYOU'],
+    'BCH': ['BEACH'],
+    'BND': ['BEND'],
+    'BLF': ['BLUF', 'BLUFF'],
+    'BLFS': ['BLUFFS'],
+    'BTM': ['BOT', 'BOTTM', 'BOTTOM'],
+    'BLVD': ['BOUL', 'BOULEVARD', 'BOULV'],
+    'BR': ['BRNCH', 'BRANCH'],
+    'BRG': ['BRDGE', 'BRIDGE'],
+    'BRK': ['BROOK'],
+    'BRKS': ['BROOKS'],
+    'BG': ['BURG'],
+    'BGS': ['BURGS'],
+    'BYP': ['BYPA', 'BYPAS', 'BYPASS', 'BYPS'],
+    'CP': ['CAMP', 'CMP'],
+    'CYN': ['CANYN', 'CANYON', 'CNYN'],
+    'CPE': ['CAPE'],
+    'CSWY': ['CAUSEWAY', 'CAUSWA'],
+    'CTR': ['CEN', 'CENT', 'CENTER', 'CENTR', 'CENTRE', 'CNTER', 'CNTR'],
+    'CTRS': ['CENTERS'],
+    'CIR': ['CIRC', 'CIRCL', 'CIRCLE', 'CRCL', 'CRCLE'],
+    'CIRS': ['CIRCLES'],
+    'CLF': ['CLIFF'],
+    'CLFS': ['CLIFFS'],
+    'CLB': ['CLUB'],
+    'CMN': ['COMMON'],
+    'CMNS': ['COMMONS'],
+    'COR': ['CORNER'],
+    'CORS': ['CORNERS'],
+    'CRSE': ['COURSE'],
+    'CT': ['COURT'],
+    'CTS': ['COURTS'],
+    'CV': ['COVE'],
+    'CVS': ['COVES'],
+    'CRK': ['CREEK'],
+    'CRES': ['CRESCENT', 'CRSENT', 'CRSNT'],
+    'CRST': ['CREST'],
+    'XING': ['CROSSING', 'CRSSNG'],
+    'XRD': ['CROSSROAD'],
+    'XRDS': ['CROSSROADS'],
+    'CURV': ['CURVE'],
+    'DL': ['DALE'],
+    'DM': ['DAM'],
+    'DV': ['DIV', 'DIVIDE', 'DVD'],
+    'DR': ['DRIV', 'DRIVE', 'DRV'],
+    'DRS': ['DRIVES'],
+    'EST': ['ESTATE'],
+    'ESTS': ['ESTATES'],
+    'EXPY': ['EXP', 'EXPR', 'EXPRESS', 'EXPRESSWAY', 'EXPW'],
+    'EXT': ['EXTENSION', 'EXTN', 'EXTNSN'],
+    'EXTS': ['EXTENSIONS'],
+    'FALL': [],
+    'FLS': ['FALLS'],
+    'FRY': ['FERRY', 'FRRY'],
+    'FLD': ['FIELD'],
+    'FLDS': ['FIELDS'],
+    'FLT': ['FLAT'],
+    'FLTS': ['FLATS'],
+    'FRD': ['FORD'],
+    'FRDS': ['FORDS'],
+    'FRST': ['FOREST', 'FORESTS'],
+    'FRG': ['FORG', 'FORGE'],
+    'FRGS': ['FORGES'],
+    'FRK': ['FORK'],
+    'FRKS': ['FORKS'],
+    'FT': ['FORT', 'FRT'],
+    'FWY': ['FREEWAY', 'FREEWY', 'FRWAY', 'FRWY'],
+    'GDN': ['GARDEN', 'GARDN', 'GRDEN', 'GRDN'],
+    'GDNS': ['GARDENS', 'GRDNS'],
+    'GTWY': ['GATEWAY', 'GATEWY', 'GATWAY', 'GTWAY'],
+    'GLN': ['GLEN'],
+    'GLNS': ['GLENS'],
+    'GRN': ['GREEN'],
+    'GRNS': ['GREENS'],
+    'GRV': ['GROV', 'GROVE'],
+    'GRVS': ['GROVES'],
+    'HBR': ['HARB', 'HARBOR', 'HARBR', 'HRBOR'],
+    'HBRS': ['HARBORS'],
+    'HVN': ['HAVEN'],
+    'HTS': ['HT', 'HEIGHTS'],
+    'HWY': ['HIGHWAY', 'HIGHWY', 'HIWAY', 'HIWY', 'HWAY'],
+    'HL': ['HILL'],
+    'HLS': ['HILLS'],
+    'HOLW': ['HLLW', 'HOLLOW', 'HOLLOWS', 'HOLWS'],
+    'INLT': ['INLET'],
+    'IS': ['ISLAND', 'ISLND'],
+    'ISS': ['ISLANDS', 'ISLNDS'],
+    'ISLE': ['ISLES'],
+    'JCT': ['JCTION', 'JCTN', 'JUNCTION', 'JUNCTN', 'JUNCTON'],
+    'JCTS': ['JCTNS', 'JUNCTIONS'],
+    'KY': ['KEY'],
+    'KYS': ['KEYS'],
+    'KNL': ['KNOL', 'KNOLL'],
+    'KNLS': ['KNOLLS'],
+    'LK': ['LAKE'],
+    'LKS': ['LAKES'],
+    'LAND': [],
+    'LNDG': ['LANDING', 'LNDNG'],
+    'LN': ['LANE'],
+    'LGT': ['LIGHT'],
+    'LGTS': ['LIGHTS'],
+    'LF': ['LOAF'],
+    'LCK': ['LOCK'],
+    'LCKS': ['LOCKS'],
+    'LDG': ['LDGE', 'LODG', 'LODGE'],
+    'LOOP': ['LOOPS'],
+    'MALL': [],
+    'MNR': ['MANOR'],
+    'MNRS': ['MANORS'],
+    'MDW': ['MEADOW'],
+    'MDWS': ['MEADOWS', 'MEDOWS'],
+    'MEWS': [],
+    'ML': ['MILL'],
+    'MLS': ['MILLS'],
+    'MSN': ['MISSN', 'MSSN', 'MISSION'],
+    'MTWY': ['MOTORWAY'],
+    'MT': ['MNT', 'MOUNT'],
+    'MTN': ['MNTAIN', 'MNTN', 'MOUNTAIN', 'MOUNTIN', 'MTIN'],
+    'MTNS': ['MNTNS', 'MOUNTAINS'],
+    'NCK': ['NECK'],
+    'ORCH': ['ORCHARD', 'ORCHRD'],
+    'OVAL': ['OVL'],
+    'OPAS': ['OVERPASS'],
+    'PARK': ['PRK', 'PARKS'],
+    'PKWY': ['PARKWAY', 'PARKWY', 'PKWAY', 'PKY', 'PARKWAYS', 'PKWYS'],
+    'PASS': [],
+    'PSGE': ['PASSAGE'],
+    'PATH': ['PATHS'],
+    'PIKE': ['PIKES'],
+    'PNE': ['PINE'],
+    'PNES': ['PINES'],
+    'PL': ['PLACE'],
+    'PLN': ['PLAIN'],
+    'PLNS': ['PLAINS'],
+    'PLZ': ['PLAZA', 'PLZA'],
+    'PT': ['POINT'],
+    'PTS': ['POINTS'],
+    'PRT': ['PORT'],
+    'PRTS': ['PORTS'],
+    'PR': ['PRAIRIE', 'PRR'],
+    'RADL': ['RAD', 'RADIAL', 'RADIEL'],
+    'RAMP': [],
+    'RNCH': ['RANCH', 'RANCHES', 'RNCHS'],
+    'RPD': ['RAPID'],
+    'RPDS': ['RAPIDS'],
+    'RST': ['REST'],
+    'RDG': ['RDGE', 'RIDGE'],
+    'RDGS': ['RIDGES'],
+    'RIV': ['RIVER', 'RVR', 'RIVR'],
+    'RD': ['ROAD'],
+    'RDS': ['ROADS'],
+    'RTE': ['ROUTE'],
+    'ROW': [],
+    'RUE': [],
+    'RUN': [],
+    'SHL': ['SHOAL'],
+    'SHLS': ['SHOALS'],
+    'SHR': ['SHOAR', 'SHORE'],
+    'SHRS': ['SHOARS', 'SHORES'],
+    'SKWY': ['SKYWAY'],
+    'SPG': ['SPNG', 'SPRING', 'SPRNG'],
+    'SPGS': ['SPNGS', 'SPRINGS', 'SPRNGS'],
+    'SPUR': ['SPURS'],
+    'SQ': ['SQR', 'SQRE', 'SQU', 'SQUARE'],
+    'SQS': ['SQRS', 'SQUARES'],
+    'STA': ['STATION', 'STATN', 'STN'],
+    'STRA': ['STRAV', 'STRAVEN', 'STRAVENUE', 'STRAVN', 'STRVN', 'STRVNUE'],
+    'STRM': ['STREAM', 'STREME'],
+    'ST': ['STREET', 'STRT', 'STR'],
+    'STS': ['STREETS'],
+    'SMT': ['SUMIT', 'SUMITT', 'SUMMIT'],
+    'TER': ['TERR', 'TERRACE'],
+    'TRWY': ['THROUGHWAY'],
+    'TRCE': ['TRACE', 'TRACES'],
+    'TRAK': ['TRACK', 'TRACKS', 'TRK', 'TRKS'],
+    'TRFY': ['TRAFFICWAY'],
+    'TRL': ['TRAIL', 'TRAILS', 'TRLS'],
+    'TRLR': ['TRAILER', 'TRLRS'],
+    'TUNL': ['TUNEL', 'TUNLS', 'TUNNEL', 'TUNNELS', 'TUNNL'],
+    'TPKE': ['TRNPK', 'TURNPIKE', 'TURNPK'],
+    'UPAS': ['UNDERPASS'],
+    'UN': ['UNION'],
+    'UNS': ['UNIONS'],
+    'VLY': ['VALLEY', 'VALLY', 'VLLY'],
+    'VLYS': ['VALLEYS'],
+    'VIA': ['VDCT', 'VIADCT', 'VIADUCT'],
+    'VW': ['VIEW'],
+    'VWS': ['VIEWS'],
+    'VLG': ['VILL', 'VILLAG', 'VILLAGE', 'VILLG', 'VILLIAGE'],
+    'VLGS': ['VILLAGES'],
+    'VL': ['VILLE'],
+    'VIS': ['VIST', 'VISTA', 'VST', 'VSTA'],
+    'WALK': ['WALKS'],
+    'WALL': [],
+    'WAY': ['WY'],
+    'WAYS': [],
+    'WL': ['WELL'],
+    'WLS': ['WELLS'],
+}
+STREET_SUFFIXES = {
+    variant: std for std, variants in _SUFFIX_VARIANTS.items() for variant in [std, *variants]
+}
+
+# USPS Pub 28 Appendix C2: secondary unit designators
+SECONDARY_UNITS = {
+    'APARTMENT': 'APT', 'APT': 'APT',
+    'BUILDING': 'BLDG', 'BLDG': 'BLDG',
+    'DEPARTMENT': 'DEPT', 'DEPT': 'DEPT',
+    'FLOOR': 'FL', 'FL': 'FL',
+    'HANGAR': 'HNGR', 'HNGR': 'HNGR',
+    'LOT': 'LOT',
+    'PIER': 'PIER',
+    'ROOM': 'RM', 'RM': 'RM',
+    'SLIP': 'SLIP',
+    'SPACE': 'SPC', 'SPC': 'SPC',
+    'STOP': 'STOP',
+    'SUITE': 'STE', 'STE': 'STE',
+    'TRAILER': 'TRLR', 'TRLR': 'TRLR',
+    'UNIT': 'UNIT',
+    '#': '#',
+}
+# Designators that take no unit number; recognized only as the last token
+SECONDARY_UNITS_NO_ID = {
+    'BASEMENT': 'BSMT', 'BSMT': 'BSMT',
+    'FRONT': 'FRNT', 'FRNT': 'FRNT',
+    'LOBBY': 'LBBY', 'LBBY': 'LBBY',
+    'LOWER': 'LOWR', 'LOWR': 'LOWR',
+    'OFFICE': 'OFC', 'OFC': 'OFC',
+    'PENTHOUSE': 'PH', 'PH': 'PH',
+    'REAR': 'REAR',
+    'SIDE': 'SIDE',
+    'UPPER': 'UPPR', 'UPPR': 'UPPR',
+}
+
+DIRECTIONALS = {
+    'NORTH': 'N', 'SOUTH': 'S', 'EAST': 'E', 'WEST': 'W',
+    'NORTHEAST': 'NE', 'NORTHWEST': 'NW', 'SOUTHEAST': 'SE', 'SOUTHWEST': 'SW',
+    'N': 'N', 'S': 'S', 'E': 'E', 'W': 'W', 'NE': 'NE', 'NW': 'NW', 'SE': 'SE', 'SW': 'SW',
+}
+
+ORDINALS = {
+    'FIRST': '1ST', 'SECOND': '2ND', 'THIRD': '3RD', 'FOURTH': '4TH', 'FIFTH': '5TH',
+    'SIXTH': '6TH', 'SEVENTH': '7TH', 'EIGHTH': '8TH', 'NINTH': '9TH', 'TENTH': '10TH',
+    'ELEVENTH': '11TH', 'TWELFTH': '12TH', 'THIRTEENTH': '13TH', 'FOURTEENTH': '14TH',
+    'FIFTEENTH': '15TH', 'SIXTEENTH': '16TH', 'SEVENTEENTH': '17TH', 'EIGHTEENTH': '18TH',
+    'NINETEENTH': '19TH', 'TWENTIETH': '20TH',
+}
+
+# City words standardized for matching across sources (NPPES vs Part D)
+CITY_WORDS = {
+    'SAINT': 'ST', 'SAINTE': 'STE', 'FORT': 'FT', 'MOUNT': 'MT', 'MOUNTAIN': 'MTN',
+    'HEIGHTS': 'HTS', 'SPRINGS': 'SPGS', 'TOWNSHIP': 'TWP', 'VILLAGE': 'VLG',
+    'JUNCTION': 'JCT', 'CENTER': 'CTR', 'CENTRE': 'CTR', 'BEACH': 'BCH',
+    **{word: abbr for word, abbr in DIRECTIONALS.items() if len(word) > 2},
+}
+
+
+# --- Compiled patterns ---
+
+_HWY = r'(?:HIGHWAY|HIGHWY|HIWAY|HIWY|HWAY|HWY)'
+_RTE = r'(?:ROUTE|RTE|RT)'
+# "ST" means STATE only right after the house number ("12 ST RT 9", not "MAIN ST HWY")
+_ST_AT_START = r'(?:(?<=^)|(?<=\d ))ST'
+
+# PO box / rural route / highway contract at the start of the address
+_PO_BOX_RE = re.compile(r'^(?:(?:POST OFFICE|POST OFF|P ?O) ?(?:BOX|BX)|POB)\s*(\w+)\b\s*(.*)$')
+_ROUTE_BOX_RE = re.compile(
+    r'^(?:(?P<rr>RURAL ROUTE|RURAL RTE|RURAL RT|R ?R)|(?P<hc>HIGHWAY CONTRACT|HWY CONTRACT|H ?C|STAR ROUTE))'
+    r'\s*(?P<route>\d+)\s*(?:BOX|BX)\s*(?P<box>\w+)\b\s*(?P<rest>.*)$'
+)
+
+# Highway / route phrases, applied in order (longest forms first)
+HIGHWAY_PATTERNS = [
+    (re.compile(rf'\b(?:U ?S|UNITED STATES) (?:{_HWY}|{_RTE})\b'), 'US HWY'),
+    (re.compile(rf'\b(?:STATE|{_ST_AT_START}) {_HWY}\b'), 'STATE HWY'),
+    (re.compile(rf'\b(?:STATE|{_ST_AT_START}) {_RTE}\b'), 'STATE RTE'),
+    (re.compile(rf'\b(?:COUNTY|CNTY|CO) {_HWY}\b'), 'COUNTY HWY'),
+    (re.compile(r'\b(?:COUNTY|CNTY|CO) (?:ROAD|RD)\b'), 'COUNTY RD'),
+    (re.compile(r'\b(?:FARM TO MARKET|F ?M)(?: ROAD| RD)?(?= \d)'), 'FM'),
+    (re.compile(rf'\b(?:INTERSTATE(?: {_HWY})?|IH|I)(?: |(?=\d))(?=\d)'), 'INTERSTATE '),
+    (re.compile(rf'\b{_HWY}\b'), 'HWY'),
+]
+
+_HOUSE_RE = re.compile(r'^\d+[A-Z]?(?:-\d+[A-Z]?)?$')
+_FRACTION_RE = re.compile(r'^(\d+[A-Z]?) (\d/\d)\b')
+# "STE4B", "APT12" -> designator + id
+_JOINED_UNIT_RE = re.compile(r'^(STE|SUITE|APT|UNIT|RM|BLDG|FL|SPC|LOT|TRLR)(\d\w*)$')
+# Hyphens between digits (house ranges, unit ids) survive; other hyphens split words
+_HYPHEN_RE = re.compile(r'(?<!\d)-|-(?!\d)')
+_PUNCT_RE = re.compile(r"[.'`]")
+_SPACE_RE = re.compile(r'[,;\s]+')
+
+
+class ParsedAddress(NamedTuple):
+    house: str = ''
+    predirectional: str = ''
+    street: tuple[str, ...] = ()
+    suffix: str = ''
+    postdirectional: str = ''
+    unit_type: str = ''
+    unit_id: str = ''
+    po_box: str = ''
+
+    def street_line(self) -> str:
+        """Standardized address without the secondary unit."""
+        if self.po_box:
+            parts = ['PO BOX', self.po_box]
+        else:
+            parts = [self.house, self.predirectional, *self.street, self.suffix, self.postdirectional]
+        return ' '.join(p for p in parts if p)
+
+    def full_line(self) -> str:
+        """Standardized address including the secondary unit."""
+        return ' '.join(p for p in [self.street_line(), self.unit_type, self.unit_id] if p)
+
+
+def _clean(raw: str) -> str:
+    text = _PUNCT_RE.sub('', raw.upper())
+    text = _HYPHEN_RE.sub(' ', text.replace('#', ' # '))
+    return _SPACE_RE.sub(' ', text).strip()
+
+
+def _split_unit(tokens: list[str]) -> tuple[list[str], str, str]:
+    """Split a secondary unit (and anything after it) off the street tokens."""
+    for i in range(1, len(tokens)):
+        joined = _JOINED_UNIT_RE.match(tokens[i])
+        if joined:
+            return tokens[:i], SECONDARY_UNITS[joined.group(1)], ' '.join([joined.group(2), *tokens[i + 1:]])
+        unit = SECONDARY_UNITS.get(tokens[i])
+        if unit and (i + 1 < len(tokens) or unit == '#'):
+            return tokens[:i], unit, ' '.join(tokens[i + 1:])
+    if len(tokens) > 1 and tokens[-1] in SECONDARY_UNITS_NO_ID:
+        return tokens[:-1], SECONDARY_UNITS_NO_ID[tokens[-1]], ''
+    return tokens, '', ''
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_address(raw: str) -> ParsedAddress:
+    """Parse a street address line into standardized USPS components."""
+    text = _clean(raw or '')
+    if not text:
+        return ParsedAddress()
+
+    m = _PO_BOX_RE.match(text)
+    if m:
+        _, unit_type, unit_id = _split_unit(['PO BOX', *m.group(2).split()])
+        return ParsedAddress(po_box=m.group(1), unit_type=unit_type, unit_id=unit_id)
+
+    m = _ROUTE_BOX_RE.match(text)
+    if m:
+        kind = 'RR' if m.group('rr') else 'HC'
+        _, unit_type, unit_id = _split_unit([kind, *m.group('rest').split()])
+        return ParsedAddress(street=(kind, m.group('route'), 'BOX', m.group('box')),
+                             unit_type=unit_type, unit_id=unit_id)
+
+    for pattern, replacement in HIGHWAY_PATTERNS:
+        text = pattern.sub(replacement, text)
+
+    house = ''
+    fraction = _FRACTION_RE.match(text)
+    if fraction:
+        house = f'{fraction.group(1)} {fraction.group(2)}'
+        text = text[fraction.end():].strip()
+    tokens = text.split()
+    if not house and tokens and _HOUSE_RE.match(tokens[0]):
+        house = tokens.pop(0)
+
+    tokens, unit_type, unit_id = _split_unit(tokens)
+
+    # Outside in; each component needs a street name left over, so in
+    # "NORTH ST" or "AVENUE B" the directional / suffix word is the name
+    predir = postdir = suffix = ''
+    if len(tokens) > 1 and tokens[-1] in DIRECTIONALS:
+        postdir = DIRECTIONALS[tokens.pop()]
+    if len(tokens) > 1 and tokens[-1] in STREET_SUFFIXES:
+        suffix = STREET_SUFFIXES[tokens.pop()]
+    if len(tokens) > 1 and tokens[0] in DIRECTIONALS:
+        predir = DIRECTIONALS[tokens.pop(0)]
+
+    street = tuple(ORDINALS.get(t, t) for t in tokens)
+    return ParsedAddress(house, predir, street, suffix, postdir, unit_type, unit_id)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_address(raw: str) -> str:
+    """Standardized address line including the secondary unit."""
+    return parse_address(raw).full_line()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_street(raw: str) -> str:
+    """Standardized address line without the secondary unit ('' if blank)."""
+    return parse_address(raw).street_line()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_city(raw: str) -> str:
+    """Standardized city name for cross-source matching ("Ft. Worth" -> "FT WORTH")."""
+    words = _SPACE_RE.sub(' ', _PUNCT_RE.sub('', (raw or '').upper()).replace('-', ' ')).split()
+    return ' '.join(CITY_WORDS.get(w, w) for w in words)
+
+
+def cache_info() -> dict:
+    """lru_cache statistics per public function."""
+    return {fn.__name__: fn.cache_info() for fn in (parse_address, normalize_address, normalize_street, normalize_city)}